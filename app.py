@@ -1,31 +1,38 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, abort
 from datetime import datetime
-import mysql.connector
-from apscheduler.schedulers.background import BackgroundScheduler
-import atexit
-from calculate_metrics import calculate_and_store_metrics
+import horizon_metrics
+from db import run_query, pool_stats
+import benchmark_map
+import history
+import search
+import jobs
+import portfolio
+import returns
+import screener
+import instrumentation
+import http_cache
+import data_quality
+from catalog import get_catalog, refresh_catalog, catalog_stats
+from scheme_summary import split_summary
+from events import DATA_UPDATED, METRICS_UPDATED, subscribe
 
 app = Flask(__name__)
+instrumentation.init_app(app)
+http_cache.init_app(app)
 
-# Database connection
-def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="kakabapa12",
-        database="mf_database"
-    )
+def catalog_response(payload, catalog):
+    """JSON response that browsers can revalidate against the catalog version"""
+    response = jsonify(payload)
+    response.set_etag(catalog.etag)
+    response.last_modified = catalog.last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 # Routes
 @app.route("/")
 def home():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT MAX(last_updated) as last_update FROM mutual_funds")
-    last_update = cursor.fetchone()['last_update']
+    last_update = run_query("last_update", fetch="one")['last_update']
     last_update_str = last_update.strftime('%d %b %Y, %I:%M %p') if last_update else "Never"
-    cursor.close()
-    conn.close()
     return render_template("index.html", last_updated=last_update_str)
 
 @app.route("/schemes/<amc>")
@@ -34,68 +41,43 @@ def schemes(amc):
 
 @app.route("/scheme-details/<scheme>")
 def scheme_details(scheme):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    cursor.execute("""
-        SELECT scheme_code, isin_growth, isin_div_reinvestment, 
-               scheme_name, net_asset_value, amc_name 
-        FROM mutual_funds 
-        WHERE scheme_name = %s
-    """, (scheme,))
-    
-    details = cursor.fetchone()
-
-    cursor.execute("SELECT * FROM scheme_metrics WHERE scheme_code = %s", (details['scheme_code'],))
-    metrics = cursor.fetchone() or {}
-    
-    if details:
-        cursor.execute("""
-            SELECT MAX(last_updated) as last_update FROM mutual_funds 
-            WHERE scheme_code = %s
-        """, (details['scheme_code'],))
-        last_update = cursor.fetchone()['last_update']
-        details['last_updated'] = last_update.strftime('%d %b %Y, %I:%M %p') if last_update else "Unknown"
-    
-    cursor.close()
-    conn.close()
+    # One primary-key lookup in the precomputed summary (name -> code from the catalog)
+    scheme_code = get_catalog().code_by_name.get(scheme)
+    summary = run_query("scheme_summary", (scheme_code,), fetch="one") if scheme_code is not None else None
+    if summary is None:
+        abort(404, description=f"Scheme not found: {scheme}")
+
+    details, metrics = split_summary(summary)
+    last_update = details['last_updated']
+    details['last_updated'] = last_update.strftime('%d %b %Y, %I:%M %p') if last_update else "Unknown"
     return render_template("scheme_details.html", details=details, metrics=metrics)
 
 # API Endpoints
 @app.route("/get_amc")
 def get_amc():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT amc_name FROM mutual_funds")
-    amcs = [row[0] for row in cursor.fetchall()]
-    cursor.close()
-    conn.close()
-    return jsonify({"data": amcs})
+    catalog = get_catalog()
+    return catalog_response({"data": catalog.amcs}, catalog)
 
 @app.route("/get_schemes/<amc>")
 def get_schemes(amc):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT scheme_name FROM mutual_funds WHERE amc_name = %s", (amc,))
-    schemes = [row[0] for row in cursor.fetchall()]
-    cursor.close()
-    conn.close()
-    return jsonify({"data": schemes})
+    catalog = get_catalog()
+    return catalog_response({"data": catalog.schemes_by_amc.get(amc, [])}, catalog)
+
+@app.route("/search")
+@http_cache.conditional
+def search_schemes():
+    query = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', search.DEFAULT_LIMIT)), 1), search.MAX_LIMIT)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({"query": query, "results": search.search(query, limit)})
 
 @app.route("/get_nifty50_history")
+@http_cache.conditional
 def get_nifty50_history():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        cursor.execute("""
-            SELECT date, close 
-            FROM nifty50_data 
-            ORDER BY date DESC 
-            LIMIT 30
-        """)
-        
-        history = cursor.fetchall()
+        history = run_query("nifty_recent")
         formatted_history = [{
             'date': row['date'].strftime('%Y-%m-%d'),
             'close': float(row['close'])
@@ -104,76 +86,167 @@ def get_nifty50_history():
         return jsonify(formatted_history)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.route("/get_historical_nav/<scheme_code>")
+@http_cache.conditional
 def get_historical_nav(scheme_code):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
+    """Aligned scheme / Nifty 50 series.
+
+    Query parameters: range (1M, 3M, 6M, 1Y, 3Y, 5Y, max; default 1M) or
+    start/end (YYYY-MM-DD), and points (max points returned, default 500).
+    """
     try:
-        # Get scheme history
-        cursor.execute("""
-            SELECT nav_date, nav_value 
-            FROM historical_nav 
-            WHERE scheme_code = %s 
-            ORDER BY nav_date DESC 
-            LIMIT 30
-        """, (scheme_code,))
-        
-        scheme_history = cursor.fetchall()
-        dates = [row['nav_date'] for row in scheme_history]
-        
-        # Get matching Nifty 50 data for the same dates
-        placeholders = ','.join(['%s'] * len(dates))
-        cursor.execute(f"""
-            SELECT date, close 
-            FROM nifty50_data 
-            WHERE date IN ({placeholders})
-            ORDER BY date DESC
-        """, dates)
-        
-        nifty_history = cursor.fetchall()
-        
-        # Format the response
-        result = {
-            'scheme': [{
-                'date': row['nav_date'].strftime('%Y-%m-%d'),
-                'nav': float(row['nav_value'])
-            } for row in scheme_history],
-            'nifty50': [{
-                'date': row['date'].strftime('%Y-%m-%d'),
-                'close': float(row['close'])
-            } for row in nifty_history]
-        }
-        
+        result = history.get_history(
+            scheme_code,
+            range_key=request.args.get('range'),
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            points=request.args.get('points'),
+        )
         return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/returns/<scheme_code>")
+@http_cache.conditional
+def scheme_returns(scheme_code):
+    """Point-to-point returns, CAGR and SIP XIRR.
+
+    Query parameters: end (YYYY-MM-DD valuation date, default latest NAV),
+    start (adds a lumpsum and a monthly SIP from that date), amount (lumpsum,
+    default 100000) and sip_amount (monthly installment, default 10000).
+    """
+    try:
+        return jsonify(returns.get_returns(
+            scheme_code,
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            sip_amount=request.args.get('sip_amount'),
+            amount=request.args.get('amount'),
+        ))
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
+@app.route("/portfolio", methods=["POST"])
+def portfolio_analytics():
+    """Aggregate risk for a basket.
 
-# Scheduled Updates
-scheduler = BackgroundScheduler()
+    Body: {"holdings": [{"scheme_code": 119551, "weight": 0.25}, ...], "range": "3Y"}
+    (weights default to equal; range as for /get_historical_nav, default max).
+    """
+    try:
+        return jsonify(portfolio.analyze_request(request.get_json(silent=True)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/screener")
+@http_cache.conditional
+def screen_schemes():
+    """Filter and rank schemes by stored metrics.
+
+    Query parameters: min_<metric>/max_<metric> (inclusive bounds on alpha,
+    beta, sharpe_ratio, sortino_ratio, std_dev), amc, sort ([-]metric,
+    default -sharpe_ratio), limit (default 20) and offset.
+    """
+    try:
+        return jsonify(screener.screen_request(request.args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-def scheduled_update():
-    from data_updater import update_database
-    update_database()
-    calculate_and_store_metrics()
+@app.route("/get_metrics/<scheme_code>")
+@http_cache.conditional
+def get_metrics(scheme_code):
+    try:
+        return jsonify(horizon_metrics.get_scheme_horizon_metrics(scheme_code))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-scheduler.add_job(
-    func=scheduled_update,
-    trigger='cron',
-    hour=6,
-    minute=0
-)
-scheduler.start()
+@app.route("/admin/db-pool")
+def db_pool_status():
+    return jsonify(pool_stats())
 
-atexit.register(lambda: scheduler.shutdown())
+@app.route("/admin/jobs")
+def job_status():
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({"runs": jobs.recent_runs(limit)})
+
+@app.route("/admin/quarantine")
+def quarantine_status():
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({"rows": data_quality.recent_quarantine(limit)})
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(instrumentation.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/admin/cache-stats")
+def cache_stats():
+    return jsonify({
+        "catalog": catalog_stats(),
+        "history": history.cache_stats(),
+        "horizon": horizon_metrics.cache_stats(),
+        "returns": returns.cache_stats(),
+        "search": search.search_stats(),
+        "portfolio": portfolio.matrix_stats(),
+        "screener": screener.screener_stats(),
+    })
+
+
+# In-memory caches: build at startup, rebuild whenever the daily update commits
+subscribe(DATA_UPDATED, refresh_catalog)
+subscribe(DATA_UPDATED, benchmark_map.invalidate)
+subscribe(DATA_UPDATED, history.invalidate)
+subscribe(DATA_UPDATED, horizon_metrics.invalidate)
+subscribe(DATA_UPDATED, returns.invalidate)
+subscribe(DATA_UPDATED, search.refresh_search_index)
+subscribe(DATA_UPDATED, portfolio.refresh)
+subscribe(DATA_UPDATED, screener.refresh)
+subscribe(METRICS_UPDATED, screener.refresh)
+subscribe(DATA_UPDATED, http_cache.refresh_data_version)
+subscribe(METRICS_UPDATED, http_cache.refresh_data_version)
+try:
+    refresh_catalog()
+    search.refresh_search_index()
+except Exception as e:
+    print(f"Catalog/search index not built at startup (will build on first request): {e}")
+portfolio.start_background_build()
+
+def pool_metrics():
+    stats = pool_stats()
+    return [
+        ("mf_db_pool_connections", "Pooled database connections by state",
+         [({"state": "in_use"}, stats["in_use"]), ({"state": "idle"}, stats["idle"])]),
+        ("mf_db_pool_wait_seconds", "Cumulative time spent waiting for a pooled connection",
+         [({}, stats["wait_time"])]),
+    ]
+
+instrumentation.register_collector(pool_metrics)
+instrumentation.register_collector(jobs.pipeline_metrics)
+
+# The daily pipeline runs in worker.py; notice its runs from here
+data_version = jobs.DataVersionPoller()
+
+@app.before_request
+def check_data_version():
+    data_version.check()
 
 if __name__ == "__main__":
     app.run(debug=True)
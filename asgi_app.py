@@ -0,0 +1,303 @@
+"""Async (ASGI) serving mode for the read API.
+
+    uvicorn asgi_app:app --workers 4 --port 8001
+
+Serves /get_amc, /get_schemes/<amc>, /get_historical_nav/<scheme_code> and
+/get_nifty50_history with the same JSON bodies, status codes and caching
+headers (catalog / data-version ETags, 304s, gzip) as the Flask routes in
+app.py. Database reads go through async_db.AsyncPool, so during a traffic
+spike requests queue on the pool as coroutines instead of each holding a
+WSGI worker thread. The in-memory catalog and history LRU are shared with the
+Flask code; everything else (pages, admin, POST /portfolio ...) stays on the
+WSGI app - route these four paths here at the reverse proxy.
+
+Finished pipeline runs are noticed by the same DataVersionPoller as app.py,
+checked from a background task instead of per request.
+"""
+import asyncio
+import json
+import re
+import time
+from datetime import timedelta
+from urllib.parse import parse_qsl
+
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+import benchmark_map
+import history
+import http_cache
+import instrumentation
+import jobs
+import nav_store
+from async_db import AsyncPool
+from catalog import get_catalog, refresh_catalog
+from events import DATA_UPDATED, METRICS_UPDATED, subscribe
+
+pool = None
+_poller = None
+_poll_task = None
+_start_lock = asyncio.Lock()
+
+
+class Request:
+    """The parts of an ASGI http scope the handlers read"""
+
+    def __init__(self, scope):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        query_string = scope.get("query_string", b"").decode("latin-1")
+        self.full_path = f"{self.path}?{query_string}"
+        self.args = {}
+        for key, value in parse_qsl(query_string, keep_blank_values=True):
+            self.args.setdefault(key, value)
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1")
+                        for name, value in scope.get("headers", [])}
+
+
+class Response:
+    def __init__(self, body=b"", status=200, content_type="application/json"):
+        self.body = body
+        self.status = status
+        self.headers = {"Content-Type": content_type}
+
+
+def json_response(payload, status=200):
+    # Same bytes as Flask's jsonify outside debug mode
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")) + "\n"
+    return Response(body.encode(), status)
+
+
+def not_modified(response):
+    response.status = 304
+    response.body = b""
+    return response
+
+
+def catalog_response(request, payload, catalog):
+    """Mirror of app.catalog_response: strong catalog ETag, Last-Modified, make_conditional"""
+    response = json_response(payload)
+    response.headers["ETag"] = quote_etag(catalog.etag)
+    response.headers["Last-Modified"] = http_date(catalog.last_modified)
+    response.headers["Cache-Control"] = "no-cache"
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if parse_etags(if_none_match).contains_weak(catalog.etag):
+            return not_modified(response)
+    else:
+        since = parse_date(request.headers.get("if-modified-since"))
+        if since is not None and catalog.last_modified.replace(microsecond=0) <= since.replace(tzinfo=None):
+            return not_modified(response)
+    return response
+
+
+async def data_response(request, view, *args):
+    """Mirror of http_cache.conditional: data-version weak ETag, 304 before the view runs"""
+    etag, last_modified = http_cache.data_etag(request.full_path)
+    if parse_etags(request.headers.get("if-none-match")).contains_weak(etag):
+        response = not_modified(Response())
+    else:
+        response = await view(request, *args)
+        if response.status != 200:
+            return response
+    response.headers["ETag"] = quote_etag(etag, weak=True)
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def compress_response(request, response):
+    """Same rules as http_cache's after_request compression"""
+    mimetype = response.headers["Content-Type"].split(";")[0]
+    if (response.status != 200 or mimetype not in http_cache.COMPRESSIBLE_TYPES
+            or len(response.body) < http_cache.MIN_COMPRESS_SIZE):
+        return response
+    response.headers["Vary"] = "Accept-Encoding"
+    encoding = http_cache.accepted_encoding(request.headers.get("accept-encoding"))
+    if encoding is None:
+        return response
+    response.body = http_cache.compress(response.body, encoding)
+    response.headers["Content-Encoding"] = encoding
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        response.headers["ETag"] = "W/" + etag
+    return response
+
+
+# Routes
+async def get_amc(request):
+    catalog = get_catalog()
+    return catalog_response(request, {"data": catalog.amcs}, catalog)
+
+
+async def get_schemes(request, amc):
+    catalog = get_catalog()
+    return catalog_response(request, {"data": catalog.schemes_by_amc.get(amc, [])}, catalog)
+
+
+async def _nifty50_history(request):
+    try:
+        rows = await pool.run_query("nifty_recent")
+        return json_response([{
+            'date': row['date'].strftime('%Y-%m-%d'),
+            'close': float(row['close'])
+        } for row in rows])
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+
+async def get_nifty50_history(request):
+    return await data_response(request, _nifty50_history)
+
+
+async def load_history(scheme_code, args):
+    """history.get_history with the cache-miss queries awaited on the async pool"""
+    key, start_date, end_date, days, points = history.parse_request(
+        scheme_code,
+        range_key=args.get('range'),
+        start=args.get('start'),
+        end=args.get('end'),
+        points=args.get('points'),
+    )
+    payload = history.cached(key)
+    if payload is not None:
+        return payload
+    if nav_store.enabled():
+        # Memory-mapped reads, no database round trip
+        return await asyncio.to_thread(history.get_history, scheme_code, args.get('range'),
+                                       args.get('start'), args.get('end'), args.get('points'))
+
+    if days:
+        row = await pool.fetch(history.LATEST_NAV_SQL, (scheme_code,), fetch="one")
+        latest = row[0] if row else None
+        start_date = latest - timedelta(days=days) if latest else None
+    rows = await pool.fetch(*history.aligned_history_query(scheme_code, start_date, end_date))
+    dates, navs, closes = history.aligned_arrays(rows)
+    # Benchmark mapping and index closes are cached per data version, so this is rarely a query
+    benchmark = await asyncio.to_thread(history.benchmark_closes, scheme_code, dates, closes)
+    return history.remember(key, history.history_payload(dates, navs, closes, points, benchmark))
+
+
+async def _historical_nav(request, scheme_code):
+    try:
+        return json_response(await load_history(scheme_code, request.args))
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+
+
+async def get_historical_nav(request, scheme_code):
+    return await data_response(request, _historical_nav, scheme_code)
+
+
+async def prometheus_metrics(request):
+    return Response(instrumentation.render().encode(), content_type="text/plain; version=0.0.4")
+
+
+# (rule label used in metrics, pattern, handler); path segments match Flask's default converter
+ROUTES = [
+    ("/get_amc", re.compile(r"/get_amc"), get_amc),
+    ("/get_schemes/<amc>", re.compile(r"/get_schemes/([^/]+)"), get_schemes),
+    ("/get_historical_nav/<scheme_code>", re.compile(r"/get_historical_nav/([^/]+)"), get_historical_nav),
+    ("/get_nifty50_history", re.compile(r"/get_nifty50_history"), get_nifty50_history),
+    ("/metrics", re.compile(r"/metrics"), prometheus_metrics),
+]
+
+
+def pool_metrics():
+    stats = pool.stats() if pool is not None else {"in_use": 0, "idle": 0, "wait_time": 0.0}
+    return [
+        ("mf_db_pool_connections", "Pooled database connections by state",
+         [({"state": "in_use"}, stats["in_use"]), ({"state": "idle"}, stats["idle"])]),
+        ("mf_db_pool_wait_seconds", "Cumulative time spent waiting for a pooled connection",
+         [({}, stats["wait_time"])]),
+    ]
+
+
+def _warm_caches():
+    try:
+        refresh_catalog()
+        http_cache.data_version.refresh()
+    except Exception as e:
+        print(f"Catalog/data version not built at startup (will build on first request): {e}")
+
+
+async def _poll_data_version():
+    while True:
+        await asyncio.sleep(_poller.interval)
+        await asyncio.to_thread(_poller.check)
+
+
+async def startup():
+    global pool, _poller, _poll_task
+    async with _start_lock:
+        if pool is not None:
+            return
+        pool = AsyncPool()
+        subscribe(DATA_UPDATED, refresh_catalog)
+        subscribe(DATA_UPDATED, benchmark_map.invalidate)
+        subscribe(DATA_UPDATED, history.invalidate)
+        subscribe(DATA_UPDATED, http_cache.refresh_data_version)
+        subscribe(METRICS_UPDATED, http_cache.refresh_data_version)
+        instrumentation.register_collector(pool_metrics)
+        await asyncio.to_thread(_warm_caches)
+        _poller = jobs.DataVersionPoller()
+        _poll_task = asyncio.create_task(_poll_data_version())
+
+
+async def shutdown():
+    global pool
+    if _poll_task is not None:
+        _poll_task.cancel()
+    if pool is not None:
+        await pool.close_all()
+        pool = None
+
+
+async def dispatch(request):
+    for rule, pattern, handler in ROUTES:
+        match = pattern.fullmatch(request.path)
+        if match is None:
+            continue
+        if request.method not in ("GET", "HEAD"):
+            return rule, Response(b"Method Not Allowed", 405, "text/plain")
+        return rule, await handler(request, *match.groups())
+    return "<unmatched>", Response(b"Not Found", 404, "text/plain")
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    started = time.perf_counter()
+    if pool is None:
+        await startup()
+    request = Request(scope)
+    rule, response = await dispatch(request)
+    response = compress_response(request, response)
+    instrumentation.REQUEST_LATENCY.observe(time.perf_counter() - started, rule, request.method,
+                                            str(response.status))
+
+    response.headers["Content-Length"] = str(len(response.body))
+    await send({
+        "type": "http.response.start",
+        "status": response.status,
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in response.headers.items()],
+    })
+    await send({"type": "http.response.body", "body": b"" if request.method == "HEAD" else response.body})
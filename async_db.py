@@ -0,0 +1,155 @@
+"""Async counterpart of db.py for the ASGI read API (asgi_app.py).
+
+AsyncPool is a bounded pool of aiomysql connections (or aiosqlite ones with
+MF_DB_BACKEND=sqlite), so a request waiting on the database parks a coroutine
+instead of a worker thread. It takes the same MF_DB_* settings as the sync
+pool, keeps the MySQL `%s` placeholder style (translated for SQLite), returns
+rows with the same Python types and times run_query() in the same
+mf_db_query_duration_seconds histogram. Both drivers are optional imports,
+only needed by the process that serves asgi_app.
+"""
+import asyncio
+import sqlite3
+import time
+
+import db
+from instrumentation import QUERY_LATENCY
+
+
+class AsyncPool:
+    """At most `size` live connections; coroutines wait up to `timeout` for a free one"""
+
+    def __init__(self, backend=None, size=None, timeout=None):
+        self.backend = backend or db.DB_BACKEND
+        self.size = size or db.POOL_SIZE
+        self.timeout = timeout or db.POOL_TIMEOUT
+        self._idle = asyncio.LifoQueue()
+        self._created = 0
+        self._in_use = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._acquired = 0
+
+    async def _connect(self):
+        if self.backend == "sqlite":
+            import aiosqlite
+            conn = await aiosqlite.connect(
+                db.SQLITE_PATH,
+                timeout=self.timeout,
+                detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            )
+            await conn.executescript(db.SQLITE_SCHEMA)
+            return conn
+        import aiomysql
+        # Autocommit so a pooled connection never reads from a stale REPEATABLE READ snapshot
+        return await aiomysql.connect(
+            host=db.DB_CONFIG["host"],
+            user=db.DB_CONFIG["user"],
+            password=db.DB_CONFIG["password"],
+            db=db.DB_CONFIG["database"],
+            connect_timeout=db.DB_CONFIG["connection_timeout"],
+            autocommit=True,
+        )
+
+    async def _alive(self, raw):
+        if self.backend == "sqlite":
+            return True
+        try:
+            await raw.ping(reconnect=True)
+            return True
+        except Exception:
+            return False
+
+    async def acquire(self):
+        if self._idle.empty() and self._created < self.size:
+            self._created += 1
+            try:
+                raw = await self._connect()
+            except Exception:
+                self._created -= 1
+                raise
+        else:
+            try:
+                raw = self._idle.get_nowait()
+            except asyncio.QueueEmpty:
+                started = time.perf_counter()
+                try:
+                    raw = await asyncio.wait_for(self._idle.get(), self.timeout)
+                except asyncio.TimeoutError:
+                    raise db.PoolTimeout(f"No database connection free after {self.timeout}s")
+                finally:
+                    self._waits += 1
+                    self._wait_time += time.perf_counter() - started
+            if not await self._alive(raw):
+                # Drop the dead connection; if the replacement fails too, give its slot back
+                await self._discard(raw)
+                try:
+                    raw = await self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        self._in_use += 1
+        self._acquired += 1
+        return raw
+
+    def release(self, raw):
+        self._in_use -= 1
+        self._idle.put_nowait(raw)
+
+    async def fetch(self, sql, params=(), dictionary=False, fetch="all"):
+        """Run one SELECT; rows as tuples (or dicts), one row or None with fetch="one" """
+        raw = await self.acquire()
+        try:
+            if self.backend == "sqlite":
+                async with raw.execute(db._translate_sql(sql), tuple(params or ())) as cursor:
+                    rows = [await cursor.fetchone()] if fetch == "one" else await cursor.fetchall()
+                    description = cursor.description
+                rows = [tuple(db._parse_sqlite_value(value) for value in row) for row in rows if row is not None]
+            else:
+                async with raw.cursor() as cursor:
+                    await cursor.execute(sql, tuple(params or ()))
+                    rows = [await cursor.fetchone()] if fetch == "one" else list(await cursor.fetchall())
+                    description = cursor.description
+                rows = [row for row in rows if row is not None]
+        finally:
+            self.release(raw)
+
+        if dictionary:
+            columns = [col[0] for col in description]
+            rows = [dict(zip(columns, row)) for row in rows]
+        if fetch == "one":
+            return rows[0] if rows else None
+        return rows
+
+    async def run_query(self, name, params=(), dictionary=True, fetch="all"):
+        """Execute one of the named hot db.QUERIES (timed per query name, like db.run_query)"""
+        started = time.perf_counter()
+        try:
+            return await self.fetch(db.QUERIES[name], params, dictionary=dictionary, fetch=fetch)
+        finally:
+            QUERY_LATENCY.observe(time.perf_counter() - started, name)
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "size": self.size,
+            "created": self._created,
+            "in_use": self._in_use,
+            "idle": self._idle.qsize(),
+            "acquired": self._acquired,
+            "waits": self._waits,
+            "wait_time": round(self._wait_time, 6),
+        }
+
+    async def _discard(self, raw):
+        try:
+            result = raw.close()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception:
+            pass
+
+    async def close_all(self):
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
+            self._created -= 1
@@ -1,56 +1,72 @@
+import argparse
+import os
+import random
 import requests
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-import mysql.connector
+from db import get_db_connection, configure_pool
+from instrumentation import StageTimer
+import nav_store
 import time
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="kakabapa12",
-        database="mf_database"
-    )
+MFAPI_BASE_URL = os.environ.get("MFAPI_BASE_URL", "https://api.mfapi.in")
 
-def get_historical_nav_from_api(scheme_code):
+# Concurrent backfill defaults
+CONCURRENCY = 8
+RATE_LIMIT = 5.0        # requests per second across all workers
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0      # seconds; doubled on each retry
+
+UPSERT_HISTORY_SQL = """
+    INSERT INTO historical_nav
+    (scheme_code, nav_date, nav_value)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE nav_value = VALUES(nav_value)
+"""
+
+def get_historical_nav_from_api(scheme_code, session=None, base_url=None):
     """Fetch historical NAV from MFAPI.in"""
     try:
-        url = f"https://api.mfapi.in/mf/{scheme_code}"
-        response = requests.get(url, timeout=10)
+        url = f"{base_url or MFAPI_BASE_URL}/mf/{scheme_code}"
+        response = (session or requests).get(url, timeout=10)
         response.raise_for_status()
         return response.json()
     except Exception as e:
         print(f"Error fetching data for scheme {scheme_code}: {e}")
         return None
 
+def parse_history_rows(scheme_code, data):
+    """Convert an MFAPI payload into (scheme_code, nav_date, nav_value) tuples"""
+    rows = []
+    for entry in data['data']:
+        try:
+            nav_date = datetime.strptime(entry['date'], '%d-%m-%Y').date()
+            nav_value = float(entry['nav'])
+            rows.append((scheme_code, nav_date, nav_value))
+        except Exception as e:
+            print(f"Error processing entry for {scheme_code}: {e}")
+            continue
+    return rows
+
 def backfill_scheme_history(scheme_code):
     conn = get_db_connection()
     cursor = conn.cursor()
-    
+
     try:
         data = get_historical_nav_from_api(scheme_code)
         if not data or 'data' not in data:
             print(f"No data found for scheme {scheme_code}")
             return
-        
-        for entry in data['data']:
-            try:
-                nav_date = datetime.strptime(entry['date'], '%d-%m-%Y').date()
-                nav_value = float(entry['nav'])
-                
-                cursor.execute("""
-                    INSERT INTO historical_nav 
-                    (scheme_code, nav_date, nav_value)
-                    VALUES (%s, %s, %s)
-                    ON DUPLICATE KEY UPDATE nav_value = VALUES(nav_value)
-                """, (scheme_code, nav_date, nav_value))
-                
-            except Exception as e:
-                print(f"Error processing entry for {scheme_code}: {e}")
-                continue
-        
+
+        rows = parse_history_rows(scheme_code, data)
+        if rows:
+            cursor.executemany(UPSERT_HISTORY_SQL, rows)
+
         conn.commit()
-        print(f"Added {len(data['data'])} records for scheme {scheme_code}")
-        
+        print(f"Added {len(rows)} records for scheme {scheme_code}")
+
     finally:
         cursor.close()
         conn.close()
@@ -58,22 +74,262 @@ def backfill_scheme_history(scheme_code):
 def backfill_historical():
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
-    
+
     try:
         # Get all scheme codes from your database
         cursor.execute("SELECT DISTINCT scheme_code FROM mutual_funds")
         scheme_codes = [row['scheme_code'] for row in cursor.fetchall()]
-        
+
         for scheme_code in scheme_codes:
             print(f"\nProcessing scheme {scheme_code}...")
             backfill_scheme_history(scheme_code)
             time.sleep(1)  # Be polite to the API
-            
+
+        from metrics_state import invalidate_metric_state
+        invalidate_metric_state(scheme_codes)
+        nav_store.rebuild()
+
+    finally:
+        cursor.close()
+        conn.close()
+
+# Concurrent, resumable backfill
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def create_progress_table():
+    """Checkpoint table recording which schemes have been backfilled"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_progress (
+            scheme_code INT PRIMARY KEY,
+            status VARCHAR(16) NOT NULL,
+            rows_loaded INT DEFAULT 0,
+            attempts INT DEFAULT 0,
+            last_error VARCHAR(255),
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def pending_scheme_codes(restart=False):
+    """Scheme codes not yet marked done in backfill_progress"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if restart:
+            cursor.execute("DELETE FROM backfill_progress")
+            conn.commit()
+        cursor.execute("""
+            SELECT DISTINCT m.scheme_code
+            FROM mutual_funds m
+            LEFT JOIN backfill_progress p ON p.scheme_code = m.scheme_code
+            WHERE p.status IS NULL OR p.status <> 'done'
+        """)
+        return [row[0] for row in cursor.fetchall()]
     finally:
         cursor.close()
         conn.close()
 
+def _record_progress(cursor, scheme_code, status, rows_loaded=0, error=None):
+    cursor.execute("""
+        INSERT INTO backfill_progress
+            (scheme_code, status, rows_loaded, attempts, last_error, updated_at)
+        VALUES (%s, %s, %s, 1, %s, CURRENT_TIMESTAMP)
+        ON DUPLICATE KEY UPDATE
+            status = VALUES(status),
+            rows_loaded = VALUES(rows_loaded),
+            attempts = attempts + 1,
+            last_error = VALUES(last_error),
+            updated_at = CURRENT_TIMESTAMP
+    """, (scheme_code, status, rows_loaded, error[:255] if error else None))
+
+_sessions = threading.local()
+
+def _session():
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    return _sessions.session
+
+def fetch_with_retry(scheme_code, limiter, base_url=None, max_retries=MAX_RETRIES, backoff=BACKOFF_BASE):
+    """Rate-limited MFAPI fetch; retries errors, 429 and 5xx with exponential backoff"""
+    url = f"{base_url or MFAPI_BASE_URL}/mf/{scheme_code}"
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            response = _session().get(url, timeout=10)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            response.raise_for_status()
+            return response.json()
+        except requests.RequestException as e:
+            status = e.response.status_code if e.response is not None else None
+            if attempt == max_retries or (status is not None and 400 <= status < 500 and status != 429):
+                raise
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.25))
+
+def _record_failure(scheme_code, error):
+    """Best-effort 'failed' checkpoint; a DB error here is reported, not raised, so the run goes on"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            _record_progress(cursor, scheme_code, 'failed', error=error)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+    except Exception as e:
+        print(f"Could not record backfill failure for scheme {scheme_code}: {e}")
+
+def _store_history(scheme_code, data):
+    """Upsert the fetched history and mark the scheme done; returns the row count"""
+    rows = parse_history_rows(scheme_code, data) if data and 'data' in data else []
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if rows:
+            cursor.executemany(UPSERT_HISTORY_SQL, rows)
+        _record_progress(cursor, scheme_code, 'done', rows_loaded=len(rows))
+        conn.commit()
+        return len(rows)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def _backfill_one(scheme_code, limiter, base_url):
+    """Returns (scheme_code, status, rows loaded, {'fetch': s, 'store': s})
+
+    The pooled connection is only taken after the fetch, so rate-limit waits,
+    the HTTP request and retry backoff never hold one.
+    """
+    clock = StageTimer()
+    try:
+        data = fetch_with_retry(scheme_code, limiter, base_url)
+    except Exception as e:
+        clock.lap('fetch')
+        _record_failure(scheme_code, str(e))
+        clock.lap('store')
+        return scheme_code, 'failed', 0, clock.timings
+    clock.lap('fetch')
+
+    try:
+        rows = _store_history(scheme_code, data)
+    except Exception as e:
+        _record_failure(scheme_code, str(e))
+        clock.lap('store')
+        return scheme_code, 'failed', 0, clock.timings
+    clock.lap('store')
+    return scheme_code, 'done', rows, clock.timings
+
+def backfill_concurrent(concurrency=CONCURRENCY, rate=RATE_LIMIT, base_url=None, restart=False, timings=None):
+    """Backfill all pending schemes with a bounded thread pool.
+
+    Progress is checkpointed per scheme in backfill_progress, so rerunning
+    after a crash only fetches schemes that are not yet done. Returns a
+    (done, failed, rows_loaded) summary. A `timings` dict receives wall-clock
+    seconds for 'pending', 'backfill' and 'refresh' (state invalidation and
+    NAV store rebuild), plus 'fetch' and 'store' summed over worker threads.
+    """
+    clock = StageTimer(timings)
+    create_progress_table()
+    scheme_codes = pending_scheme_codes(restart=restart)
+    clock.lap('pending')
+    print(f"{len(scheme_codes)} schemes pending backfill "
+          f"(concurrency={concurrency}, rate={rate}/s)")
+
+    limiter = TokenBucket(rate)
+    done = failed = total_rows = 0
+    backfilled = []
+    started = time.perf_counter()
+    worker_seconds = {'fetch': 0.0, 'store': 0.0}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(_backfill_one, code, limiter, base_url) for code in scheme_codes]
+        for future in as_completed(futures):
+            scheme_code, status, rows, spent = future.result()
+            for stage, seconds in spent.items():
+                worker_seconds[stage] += seconds
+            if status == 'done':
+                done += 1
+                total_rows += rows
+                if rows:
+                    backfilled.append(scheme_code)
+            else:
+                failed += 1
+                print(f"  ✘ Scheme {scheme_code} failed (will retry on next run)")
+            if (done + failed) % 500 == 0:
+                print(f"  {done + failed}/{len(scheme_codes)} schemes processed")
+
+    print(f"Backfilled {done} schemes ({total_rows} rows), {failed} failed "
+          f"in {time.perf_counter() - started:.1f}s")
+    clock.lap('backfill')
+
+    # Older NAVs change the running sums retroactively; reseed those schemes next metrics run
+    from metrics_state import invalidate_metric_state
+    invalidate_metric_state(backfilled)
+    if backfilled:
+        nav_store.rebuild()
+    clock.lap('refresh')
+    clock.timings.update(worker_seconds)
+    return done, failed, total_rows
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill historical NAVs from MFAPI")
+    parser.add_argument("--sequential", action="store_true", help="one scheme at a time, 1s apart")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT, help="max requests per second")
+    parser.add_argument("--base-url", default=None, help="MFAPI base URL (e.g. a local stub)")
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress")
+    args = parser.parse_args()
+
     print("Starting historical data backfill...")
-    backfill_historical()
-    print("\nBackfill completed")
\ No newline at end of file
+    if not args.sequential:
+        # One connection per worker, one for the main thread and one held by the pipeline lock
+        configure_pool(size=args.concurrency + 2)
+
+    # Recorded in job_runs: stage timings show up on /metrics and web processes refresh their caches.
+    # Runs under the pipeline lock so it never writes history while the worker ingests.
+    from jobs import exclusive_run
+    with exclusive_run("backfill") as run:
+        timings = {}
+        try:
+            if args.sequential:
+                with run.stage("backfill"):
+                    backfill_historical()
+            else:
+                try:
+                    backfill_concurrent(args.concurrency, args.rate, args.base_url, args.restart, timings)
+                finally:
+                    run.record_stages(timings)
+            run.finish("success")
+        except Exception:
+            run.finish("failed", error=traceback.format_exc())
+            raise
+    print("\nBackfill completed")
@@ -0,0 +1,224 @@
+"""Benchmark index per scheme.
+
+Each scheme is measured against the index that matches its category instead
+of Nifty 50 for everything. RULES are (pattern, index) pairs tried in order
+against the lower-cased scheme_name; the first match wins and anything
+unmatched stays on Nifty 50. Rows in `benchmark_overrides` take precedence
+over the rules. A mapped index with no prices loaded falls back to Nifty 50,
+so the scheme still gets metrics; assign() returns the benchmark actually used.
+
+Nifty 50 comes from `nifty50_data`, every other index from `index_prices`
+(`python load_nifty50.py <csv> --index "NIFTY MIDCAP 150"`). The benchmark
+each scheme's metrics were computed against is kept in `scheme_benchmark`,
+so an incremental run reseeds schemes whose benchmark has changed.
+
+    python benchmark_map.py                      # schemes per benchmark
+    python benchmark_map.py --set 119551 "NIFTY MIDCAP 150"
+    python benchmark_map.py --clear 119551
+"""
+import argparse
+import re
+import threading
+import traceback
+from collections import Counter
+from functools import lru_cache
+
+from db import get_db_connection
+
+DEFAULT_BENCHMARK = "NIFTY 50"
+
+RULES = [
+    (r"\b(overnight|liquid|money market)\b", "NIFTY LIQUID INDEX"),
+    (r"\b(gilt|g-sec|gsec|constant maturity)\b", "NIFTY ALL DURATION G-SEC INDEX"),
+    (r"\barbitrage\b", "NIFTY 50 ARBITRAGE INDEX"),
+    (r"\b(hybrid|balanced|equity (and|&) debt|equity savings|asset allocation|multi asset)\b",
+     "NIFTY 50 HYBRID COMPOSITE DEBT 65:35 INDEX"),
+    (r"\b(debt|bond|income|duration|credit risk|banking (and|&) psu|floater|accrual|savings|"
+     r"fixed (term|maturity|horizon)|fmp|ftif|interval|target maturity|corporate|sdl|crisil ibx|"
+     r"capital protection)\b", "NIFTY COMPOSITE DEBT INDEX"),
+    (r"\bnext 50\b", "NIFTY NEXT 50"),
+    (r"\bsmall\s?cap\b", "NIFTY SMALLCAP 250"),
+    (r"\blarge (and|&) mid\s?cap\b", "NIFTY LARGEMIDCAP 250"),
+    (r"\bmid\s?cap\b", "NIFTY MIDCAP 150"),
+    (r"\b(flexi\s?cap|multi\s?cap|elss|tax saver|value|contra|focus(ed)?|dividend yield)\b", "NIFTY 500"),
+]
+_RULES = [(re.compile(pattern), index) for pattern, index in RULES]
+
+
+def create_benchmark_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS benchmark_overrides (
+            scheme_code INT PRIMARY KEY,
+            index_name VARCHAR(64) NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scheme_benchmark (
+            scheme_code INT PRIMARY KEY,
+            index_name VARCHAR(64) NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS index_prices (
+            index_name VARCHAR(64) NOT NULL,
+            date DATE NOT NULL,
+            close DECIMAL(12, 2),
+            open DECIMAL(12, 2),
+            high DECIMAL(12, 2),
+            low DECIMAL(12, 2),
+            volume BIGINT,
+            PRIMARY KEY (index_name, date)
+        )
+    """)
+
+
+@lru_cache(maxsize=65536)
+def benchmark_for_name(scheme_name):
+    """Index named by the first matching rule (DEFAULT_BENCHMARK if none)"""
+    name = (scheme_name or "").lower()
+    for pattern, index in _RULES:
+        if pattern.search(name):
+            return index
+    return DEFAULT_BENCHMARK
+
+
+def assign(fund_rows, overrides=None, available=None):
+    """{scheme_code: benchmark} from (scheme_code, scheme_name) rows.
+
+    `overrides` maps scheme codes to an index; with `available` (index names
+    that have prices) any other mapping falls back to DEFAULT_BENCHMARK.
+    """
+    overrides = overrides or {}
+    assignment = {}
+    for scheme_code, scheme_name in fund_rows:
+        index = overrides.get(scheme_code) or benchmark_for_name(scheme_name)
+        if available is not None and index not in available:
+            index = DEFAULT_BENCHMARK
+        assignment[scheme_code] = index
+    return assignment
+
+
+def available_indexes(cursor):
+    """Index names with price history: Nifty 50 plus everything in index_prices"""
+    cursor.execute("SELECT DISTINCT index_name FROM index_prices")
+    return {DEFAULT_BENCHMARK} | {row[0] for row in cursor.fetchall()}
+
+
+def load_assignment(cursor):
+    """Current {scheme_code: benchmark} for every scheme in mutual_funds"""
+    create_benchmark_tables(cursor)
+    cursor.execute("SELECT scheme_code, index_name FROM benchmark_overrides")
+    overrides = dict(cursor.fetchall())
+    available = available_indexes(cursor)
+    cursor.execute("SELECT scheme_code, scheme_name FROM mutual_funds")
+    return assign(cursor.fetchall(), overrides, available)
+
+
+def group_codes(assignment, scheme_codes):
+    """{benchmark: [scheme codes]}, default benchmark first, codes in input order"""
+    groups = {DEFAULT_BENCHMARK: []}
+    for code in scheme_codes:
+        groups.setdefault(assignment.get(code, DEFAULT_BENCHMARK), []).append(code)
+    return {index: codes for index, codes in groups.items() if codes}
+
+
+def load_scheme_benchmarks(cursor):
+    """{scheme_code: benchmark} the stored metrics were computed against"""
+    create_benchmark_tables(cursor)
+    cursor.execute("SELECT scheme_code, index_name FROM scheme_benchmark")
+    return dict(cursor.fetchall())
+
+
+def store_scheme_benchmarks(cursor, assignment, replace=False):
+    create_benchmark_tables(cursor)
+    if replace:
+        cursor.execute("DELETE FROM scheme_benchmark")
+    if assignment:
+        cursor.executemany("""
+            INSERT INTO scheme_benchmark (scheme_code, index_name) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE index_name = VALUES(index_name)
+        """, list(assignment.items()))
+
+
+_assignment = None
+_assignment_lock = threading.Lock()
+
+
+def scheme_benchmark(scheme_code):
+    """Benchmark for one scheme, from an assignment cached until the next data update"""
+    global _assignment
+    with _assignment_lock:
+        if _assignment is None:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                _assignment = load_assignment(cursor)
+                conn.commit()
+            finally:
+                cursor.close()
+                conn.close()
+        return _assignment.get(int(scheme_code), DEFAULT_BENCHMARK)
+
+
+def invalidate():
+    global _assignment
+    with _assignment_lock:
+        _assignment = None
+
+
+def set_override(scheme_code, index_name=None):
+    """Pin a scheme to `index_name`, or drop its override when index_name is None"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        create_benchmark_tables(cursor)
+        if index_name:
+            cursor.execute("""
+                INSERT INTO benchmark_overrides (scheme_code, index_name) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE index_name = VALUES(index_name)
+            """, (scheme_code, index_name))
+        else:
+            cursor.execute("DELETE FROM benchmark_overrides WHERE scheme_code = %s", (scheme_code,))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show or override scheme benchmark assignments")
+    parser.add_argument("--set", nargs=2, metavar=("SCHEME_CODE", "INDEX"), help="pin a scheme to an index")
+    parser.add_argument("--clear", type=int, metavar="SCHEME_CODE", help="drop a scheme's override")
+    args = parser.parse_args()
+
+    if args.set or args.clear:
+        # Recorded in job_runs so web processes reload the assignment (under the pipeline lock,
+        # so the override cannot change halfway through the worker's metrics run)
+        from jobs import exclusive_run
+        with exclusive_run("benchmark_override") as run:
+            try:
+                if args.set:
+                    set_override(int(args.set[0]), args.set[1])
+                else:
+                    set_override(args.clear)
+                run.finish("success")
+            except Exception:
+                run.finish("failed", error=traceback.format_exc())
+                raise
+        print("Override saved; rerun python calculate_metrics.py --incremental to recompute that scheme")
+    else:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            assignment = load_assignment(cursor)
+            available = available_indexes(cursor)
+            cursor.execute("SELECT scheme_code, scheme_name FROM mutual_funds")
+            wanted = Counter(benchmark_for_name(name) for _, name in cursor.fetchall())
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        used = Counter(assignment.values())
+        for index in sorted(set(wanted) | set(used), key=lambda name: -wanted.get(name, 0)):
+            note = "" if index in available else "  (no prices loaded - on NIFTY 50)"
+            print(f"{index:<45} {wanted.get(index, 0):>6} mapped {used.get(index, 0):>6} used{note}")
@@ -0,0 +1,37 @@
+"""Render the bundled AMFI_NAV_data_txt.csv snapshot in NAVAll.txt format"""
+import csv
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AMFI_CSV = os.path.join(ROOT, "AMFI_NAV_data_txt.csv")
+
+HEADER = "Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;Net Asset Value;Date"
+
+
+# The snapshot has no scheme categories; one section line exercises that path
+CATEGORY = "Open Ended Schemes(Debt Scheme - Banking and PSU Fund)"
+
+
+def navall_lines(nav_date="25-Mar-2025", csv_path=AMFI_CSV):
+    """Return NAVAll.txt-style lines (category/AMC section lines + ';'-separated scheme rows).
+
+    Schemes without a NAV in the snapshot are written as "N.A.", as AMFI does.
+    """
+    lines = [HEADER, "", CATEGORY, ""]
+    current_amc = None
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            nav = row["Net Asset Value"] or "N.A."
+            if row["AMC Name"] != current_amc:
+                current_amc = row["AMC Name"]
+                lines += ["", current_amc, ""]
+            isin_reinvest = "" if row["ISIN Div Reinvestment"] == "-" else row["ISIN Div Reinvestment"]
+            lines.append(";".join([
+                row["Scheme Code"],
+                row["ISIN Div Payout/ISIN Growth"],
+                isin_reinvest,
+                row["Scheme Name"],
+                nav,
+                nav_date,
+            ]))
+    return lines
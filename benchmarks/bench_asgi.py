@@ -0,0 +1,265 @@
+"""Load test: the Flask (WSGI) read API vs. asgi_app under concurrent clients.
+
+    python -m benchmarks.bench_asgi --schemes 2000 --years 5 --concurrency 64 --duration 10
+    python -m benchmarks.bench_asgi --backend mysql --workers 4
+
+With the default --backend sqlite a throwaway SQLite database is seeded from a
+SyntheticDataset; --backend mysql uses the database configured by MF_DB_*
+as it is. The script then starts app:app under gunicorn (--workers x
+--threads; `flask run` when gunicorn is not installed) and asgi_app:app under
+uvicorn (--workers), checks that every read endpoint returns the same status
+and byte-identical JSON from both, and drives each server with
+--concurrency keep-alive connections for --duration seconds over a mix of
+/get_amc, /get_schemes, /get_historical_nav (random schemes and ranges, so
+most requests miss the history cache) and /get_nifty50_history. Prints
+requests/sec and p50/p99 latency per server and per route, and writes them as
+JSON to benchmarks/results/.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from urllib.parse import quote
+
+import numpy as np
+
+import db
+from benchmarks.bench_pipeline import RESULTS_DIR, ingest, load_history, load_nifty
+from benchmarks.synthetic import SyntheticDataset
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RANGES = ["1M", "6M", "1Y", "3Y", "max"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def seed_sqlite(path, schemes, years):
+    db.configure_pool(backend="sqlite", sqlite_path=path)
+    dataset = SyntheticDataset(schemes, years)
+    ingest(dataset.navall_lines(-1))
+    load_nifty(dataset)
+    load_history(dataset, -1)
+    db.get_pool().close_all()
+
+
+def sample_targets():
+    """(scheme codes, AMC names) to build request paths from"""
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT scheme_code, amc_name FROM mutual_funds")
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return [row[0] for row in rows], sorted({row[1] for row in rows})
+
+
+def request_paths(codes, amcs, count, seed=0):
+    """Deterministic request mix: (route label, path)"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        kind = i % 10
+        if kind == 0:
+            paths.append(("/get_amc", "/get_amc"))
+        elif kind < 3:
+            paths.append(("/get_schemes", f"/get_schemes/{quote(rng.choice(amcs))}"))
+        elif kind == 3:
+            paths.append(("/get_nifty50_history", "/get_nifty50_history"))
+        else:
+            paths.append(("/get_historical_nav",
+                          f"/get_historical_nav/{rng.choice(codes)}?range={rng.choice(RANGES)}"))
+    return paths
+
+
+def start_server(kind, port, args, env):
+    if kind == "wsgi":
+        if importlib.util.find_spec("gunicorn"):
+            cmd = [sys.executable, "-m", "gunicorn", "--workers", str(args.workers), "--threads", str(args.threads),
+                   "--bind", f"127.0.0.1:{port}", "--log-level", "warning", "app:app"]
+        else:
+            cmd = [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port), "--with-threads"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "asgi_app:app", "--workers", str(args.workers),
+               "--port", str(port), "--no-access-log", "--log-level", "warning"]
+    process = subprocess.Popen(cmd, cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{kind} server exited: {' '.join(cmd)}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/get_amc", timeout=5).read()
+            return process, cmd
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{kind} server did not come up on port {port}")
+
+
+def fetch(port, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def check_identical(wsgi_port, asgi_port, paths):
+    mismatches = []
+    for _, path in paths:
+        wsgi, asgi = fetch(wsgi_port, path), fetch(asgi_port, path)
+        if wsgi != asgi:
+            mismatches.append((path, wsgi[0], asgi[0]))
+    return mismatches
+
+
+async def read_response(reader):
+    """(status, keep_alive) after consuming one HTTP/1.x response"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    version, status = lines[0].split(" ", 2)[:2]
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+    return int(status), keep_alive
+
+
+async def client(port, paths, offset, deadline, results):
+    reader = writer = None
+    i = offset
+    while time.perf_counter() < deadline:
+        label, path = paths[i % len(paths)]
+        i += 1
+        if writer is None:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        started = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept-Encoding: gzip\r\n\r\n".encode())
+        try:
+            status, keep_alive = await read_response(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            status, keep_alive = 0, False
+        results.append((label, status, time.perf_counter() - started))
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port, paths, concurrency, duration):
+    results = []
+    started = time.perf_counter()
+    deadline = started + duration
+    stride = max(1, len(paths) // concurrency)
+    await asyncio.gather(*(client(port, paths, n * stride, deadline, results) for n in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    def stats(rows):
+        latencies = np.array([row[2] for row in rows]) * 1000
+        errors = sum(1 for row in rows if row[1] not in (200, 304))
+        p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (float("nan"), float("nan"))
+        return {"requests": len(rows), "errors": errors, "rps": round(len(rows) / elapsed, 1),
+                "p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3)}
+
+    summary = {"all": stats(results)}
+    for label in sorted({row[0] for row in results}):
+        summary[label] = stats([row for row in results if row[0] == label])
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WSGI vs. ASGI read API load test")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--schemes", type=int, default=2000, help="synthetic schemes (sqlite backend)")
+    parser.add_argument("--years", type=float, default=5, help="years of synthetic history (sqlite backend)")
+    parser.add_argument("--workers", type=int, default=2, help="server processes for both servers")
+    parser.add_argument("--threads", type=int, default=8, help="threads per gunicorn worker")
+    parser.add_argument("--concurrency", type=int, default=64, help="concurrent keep-alive connections")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load per server")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/asgi-<timestamp>.json)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.backend == "sqlite":
+            path = os.path.join(tmp, "bench.sqlite3")
+            started = time.perf_counter()
+            seed_sqlite(path, args.schemes, args.years)
+            print(f"Seeded {args.schemes} schemes x {args.years:g}y in {time.perf_counter() - started:.1f}s")
+            env.update(MF_DB_BACKEND="sqlite", MF_SQLITE_PATH=path)
+        codes, amcs = sample_targets()
+        db.get_pool().close_all()
+        paths = request_paths(codes, amcs, 20000)
+
+        servers = {}
+        try:
+            for kind in ("wsgi", "asgi"):
+                port = free_port()
+                process, cmd = start_server(kind, port, args, env)
+                servers[kind] = (process, port, cmd)
+
+            mismatches = check_identical(servers["wsgi"][1], servers["asgi"][1], paths[:50])
+            print(f"Identical responses: {50 - len(mismatches)}/50")
+            for path, wsgi_status, asgi_status in mismatches[:5]:
+                print(f"  differs: {path} (wsgi {wsgi_status}, asgi {asgi_status})")
+
+            results = {}
+            for kind, (process, port, cmd) in servers.items():
+                load, elapsed = asyncio.run(drive(port, paths, args.concurrency, args.duration))
+                results[kind] = {"command": " ".join(cmd[1:]), **summarize(load, elapsed)}
+        finally:
+            for process, _, _ in servers.values():
+                process.terminate()
+                process.wait(timeout=30)
+
+    print(f"\n{'':<30}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for label in results["wsgi"]:
+        if label == "command":
+            continue
+        for kind in ("wsgi", "asgi"):
+            row = results[kind].get(label)
+            if row:
+                print(f"{kind + ' ' + label:<30}{row['rps']:>10.1f}{row['p50_ms']:>10.2f}"
+                      f"{row['p99_ms']:>10.2f}{row['errors']:>8}")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"asgi-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump({"created_at": datetime.now().isoformat(timespec="seconds"), "config": vars(args),
+                   "identical": not mismatches, "results": results}, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
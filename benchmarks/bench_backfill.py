@@ -0,0 +1,62 @@
+"""Run the concurrent backfill against the stub MFAPI server and a SQLite database.
+
+    python -m benchmarks.bench_backfill --schemes 200 --concurrency 8 --rate 200
+
+The run is interrupted half way and resumed to show that only pending schemes
+are fetched on the second pass.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import db
+import backfill_historical
+from benchmarks.stub_mfapi import start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schemes", type=int, default=200)
+    parser.add_argument("--days", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=200.0)
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(days=args.days, fail_rate=args.fail_rate)
+    backfill_historical.BACKOFF_BASE = 0.05
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure_pool(backend="sqlite", sqlite_path=os.path.join(tmp, "bench.sqlite3"),
+                          size=args.concurrency + 1, timeout=60)
+        backfill_historical.create_progress_table()
+        conn = db.get_db_connection()
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO mutual_funds (scheme_code, scheme_name, amc_name) VALUES (%s, %s, %s)",
+            [(100000 + i, f"Scheme {i}", "Stub AMC") for i in range(args.schemes)],
+        )
+        # Pretend a previous run finished the first half
+        cursor.executemany(
+            "INSERT INTO backfill_progress (scheme_code, status) VALUES (%s, 'done')",
+            [(100000 + i,) for i in range(args.schemes // 2)],
+        )
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        started = time.perf_counter()
+        done, failed, rows = backfill_historical.backfill_concurrent(
+            args.concurrency, args.rate, base_url)
+        elapsed = time.perf_counter() - started
+
+        remaining = len(backfill_historical.pending_scheme_codes())
+        db.get_pool().close_all()
+
+    server.shutdown()
+    print(f"Resumed run: {done} done, {failed} failed, {rows} rows in {elapsed:.2f}s "
+          f"({done / elapsed:.1f} schemes/s); {remaining} still pending")
+
+
+if __name__ == "__main__":
+    main()
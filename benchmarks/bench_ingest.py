@@ -0,0 +1,68 @@
+"""Time the AMFI ingest: row-at-a-time INSERTs vs. batched staging-table load.
+
+Runs against a throwaway SQLite database using the bundled
+AMFI_NAV_data_txt.csv snapshot (~13.8k schemes):
+
+    python -m benchmarks.bench_ingest
+"""
+import os
+import tempfile
+import time
+
+import db
+from data_updater import ingest_schemes, parse_amfi_data
+from benchmarks.amfi_sample import navall_lines
+
+
+def row_at_a_time(conn, schemes):
+    """The previous update path: TRUNCATE, then two single-row INSERTs per scheme"""
+    cursor = conn.cursor()
+    cursor.execute("TRUNCATE TABLE mutual_funds")
+    for scheme in schemes:
+        cursor.execute("""
+            INSERT INTO mutual_funds
+            (scheme_code, isin_growth, isin_div_reinvestment,
+             scheme_name, net_asset_value, amc_name, last_updated)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (scheme.scheme_code, scheme.isin_growth, scheme.isin_div_reinvestment,
+              scheme.scheme_name, scheme.net_asset_value, scheme.amc_name, scheme.nav_date))
+        cursor.execute("""
+            INSERT INTO historical_nav
+            (scheme_code, nav_date, nav_value)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE nav_value = VALUES(nav_value)
+        """, (scheme.scheme_code, scheme.nav_date.date(), scheme.net_asset_value))
+    conn.commit()
+    cursor.close()
+    return len(schemes)
+
+
+def main():
+    lines = navall_lines()
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure_pool(backend="sqlite", sqlite_path=os.path.join(tmp, "bench.sqlite3"))
+        conn = db.get_db_connection()
+
+        started = time.perf_counter()
+        schemes = list(parse_amfi_data(lines))
+        parse_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        count = row_at_a_time(conn, schemes)
+        legacy_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        bulk_count = ingest_schemes(conn, parse_amfi_data(iter(lines)))
+        bulk_time = time.perf_counter() - started
+
+        conn.close()
+        db.get_pool().close_all()
+
+    print(f"Parsed {len(schemes)} schemes in {parse_time:.3f}s")
+    print(f"Row-at-a-time ingest: {count} schemes in {legacy_time:.3f}s")
+    print(f"Bulk staging ingest:  {bulk_count} schemes in {bulk_time:.3f}s "
+          f"({legacy_time / bulk_time:.1f}x faster, includes streaming parse)")
+
+
+if __name__ == "__main__":
+    main()
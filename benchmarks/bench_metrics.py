@@ -0,0 +1,70 @@
+"""Batch metrics engine vs. the per-scheme reference on synthetic data.
+
+    python -m benchmarks.bench_metrics --schemes 1000 --days 1500
+
+Times compute_all_metrics against the original per-scheme loop
+(calculate_scheme_metrics) and runs check_parity over the same history. The
+history includes the cases the batch engine has to reproduce: null and zero
+NAVs, missing dates, flat NAVs (no volatility) and schemes too short to get
+metrics. Exits non-zero on any mismatch.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_metrics_parallel import synthetic_history
+from calculate_metrics import MIN_OBSERVATIONS, calculate_scheme_metrics, check_parity, compute_all_metrics
+
+
+def with_edge_cases(nav_df, codes, seed=1):
+    """Copy of nav_df with null/zero NAVs, gaps, a flat scheme and short schemes mixed in"""
+    rng = np.random.default_rng(seed)
+    nav_df = nav_df.copy()
+    navs = nav_df['nav_value'].to_numpy(dtype=object)
+    navs[rng.random(len(navs)) < 0.002] = None
+    navs[rng.random(len(navs)) < 0.002] = 0.0
+    nav_df['nav_value'] = navs
+    nav_df = nav_df[rng.random(len(nav_df)) >= 0.01]
+
+    flat = nav_df['scheme_code'] == codes[0]
+    nav_df.loc[flat, 'nav_value'] = 10.0
+    for code in codes[1:4]:
+        rows = nav_df.index[nav_df['scheme_code'] == code]
+        nav_df = nav_df.drop(rows[MIN_OBSERVATIONS - 2:])
+    return nav_df.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schemes", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=1500)
+    args = parser.parse_args()
+
+    nav_df, nifty_returns, codes = synthetic_history(args.schemes, args.days)
+    nav_df = with_edge_cases(nav_df, codes)
+    print(f"Synthetic history: {len(nav_df)} rows for {len(codes)} schemes")
+
+    started = time.perf_counter()
+    batch = compute_all_metrics(nav_df, nifty_returns, codes)
+    batch_seconds = time.perf_counter() - started
+
+    nifty_df = nifty_returns.rename('return').rename_axis('date').reset_index()
+    started = time.perf_counter()
+    for _, group in nav_df.groupby('scheme_code'):
+        calculate_scheme_metrics(group[['nav_date', 'nav_value']].to_numpy().tolist(), nifty_df)
+    reference_seconds = time.perf_counter() - started
+
+    print(f"batch engine          {batch_seconds:.2f}s ({len(batch)} schemes with metrics)")
+    print(f"per-scheme reference  {reference_seconds:.2f}s ({reference_seconds / batch_seconds:.0f}x slower)")
+
+    mismatches = check_parity(nav_df, nifty_returns, codes)
+    for scheme_code, metric, expected, actual in mismatches[:20]:
+        print(f"  mismatch {scheme_code} {metric}: reference={expected} batch={actual}")
+    if mismatches:
+        raise SystemExit(f"Parity check failed: {len(mismatches)} mismatches")
+    print(f"Parity check passed for {len(codes)} schemes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Single-process vs. process-pool full metrics rebuild on synthetic data.
+
+    python -m benchmarks.bench_metrics_parallel --schemes 4000 --days 1500 --workers 1 2 4 8
+
+Times compute_all_metrics + compute_state (what a full rebuild runs) against
+parallel_metrics.compute_metrics_parallel for each worker count, and checks
+that the parallel results match.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import metrics_state
+import parallel_metrics
+from benchmark_map import DEFAULT_BENCHMARK
+from calculate_metrics import METRIC_COLUMNS, compute_all_metrics
+
+
+def synthetic_history(schemes, days, seed=0):
+    """(nav_df, nifty_returns, scheme_codes) with uneven history lengths"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2025-03-25", periods=days)
+    nifty = pd.Series(rng.normal(0.0004, 0.01, days), index=dates, name='return')
+
+    frames = []
+    codes = list(range(100000, 100000 + schemes))
+    for code in codes:
+        length = int(rng.integers(days // 10, days + 1))
+        navs = 10 * np.cumprod(1 + 0.8 * nifty.to_numpy()[-length:] + rng.normal(0.0001, 0.005, length))
+        frames.append(pd.DataFrame({'scheme_code': code, 'nav_date': dates[-length:], 'nav_value': navs}))
+    return pd.concat(frames, ignore_index=True), nifty, codes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schemes", type=int, default=4000)
+    parser.add_argument("--days", type=int, default=1500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, parallel_metrics.default_workers()])
+    parser.add_argument("--chunk-size", type=int, default=parallel_metrics.PARALLEL_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    nav_df, nifty_returns, codes = synthetic_history(args.schemes, args.days)
+    print(f"Synthetic history: {len(nav_df)} rows for {len(codes)} schemes")
+
+    started = time.perf_counter()
+    expected = compute_all_metrics(nav_df, nifty_returns, codes)
+    metrics_state.compute_state(nav_df, nifty_returns, codes)
+    serial = time.perf_counter() - started
+    print(f"single process        {serial:.2f}s")
+
+    for workers in sorted(set(args.workers)):
+        started = time.perf_counter()
+        metrics_df, _, timings = parallel_metrics.compute_metrics_parallel(
+            nav_df, {DEFAULT_BENCHMARK: nifty_returns}, {DEFAULT_BENCHMARK: codes}, workers, args.chunk_size)
+        elapsed = time.perf_counter() - started
+        slowest = max(timing['seconds'] for timing in timings)
+        matches = np.allclose(metrics_df.loc[expected.index, METRIC_COLUMNS].to_numpy(dtype=float),
+                              expected[METRIC_COLUMNS].to_numpy(dtype=float), equal_nan=True)
+        print(f"{workers:>2} workers            {elapsed:.2f}s ({serial / elapsed:.1f}x)  "
+              f"{len(timings)} chunks, slowest {slowest:.2f}s  results match: {matches}")
+
+
+if __name__ == "__main__":
+    main()
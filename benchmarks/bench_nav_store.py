@@ -0,0 +1,109 @@
+"""Compare NAV history reads: SQL (dict rows) vs. the memory-mapped columnar store.
+
+    python -m benchmarks.bench_nav_store --schemes 2000 --days 1500
+
+Builds a synthetic SQLite database, dumps it into a NAV store and times
+(a) single-scheme history reads as done by /get_historical_nav and
+(b) the all-schemes load used by the metrics job.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+import db
+import nav_store
+import calculate_metrics
+
+
+def populate(schemes, days):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    start = date(2025, 3, 25) - timedelta(days=days)
+    dates = [start + timedelta(days=i) for i in range(days)]
+    rng = np.random.default_rng(0)
+    for code in range(100000, 100000 + schemes):
+        navs = 10 * np.cumprod(1 + rng.normal(0.0004, 0.01, days))
+        cursor.executemany(
+            "INSERT INTO historical_nav (scheme_code, nav_date, nav_value) VALUES (%s, %s, %s)",
+            list(zip([code] * days, dates, navs.tolist())),
+        )
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def time_sql_reads(codes):
+    started = time.perf_counter()
+    conn = db.get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    for code in codes:
+        cursor.execute("""
+            SELECT nav_date, nav_value FROM historical_nav
+            WHERE scheme_code = %s ORDER BY nav_date ASC
+        """, (code,))
+        rows = cursor.fetchall()
+        [float(row['nav_value']) for row in rows]
+    cursor.close()
+    conn.close()
+    return time.perf_counter() - started
+
+
+def time_store_reads(store, codes):
+    started = time.perf_counter()
+    for code in codes:
+        dates, navs = store.series(code)
+        navs.sum()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schemes", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=1500)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure_pool(backend="sqlite", sqlite_path=os.path.join(tmp, "bench.sqlite3"))
+        populate(args.schemes, args.days)
+        print(f"Synthetic history: {args.schemes * args.days} rows")
+
+        store_dir = os.path.join(tmp, "nav_store")
+        started = time.perf_counter()
+        nav_store.build_nav_store(store_dir)
+        build_time = time.perf_counter() - started
+
+        store = nav_store.NavStore(os.path.join(store_dir, open(os.path.join(store_dir, "CURRENT")).read()))
+        codes = random.Random(1).sample(range(100000, 100000 + args.schemes), args.reads)
+
+        sql_reads = time_sql_reads(codes)
+        store_reads = time_store_reads(store, codes)
+
+        conn = db.get_db_connection()
+        cursor = conn.cursor()
+        started = time.perf_counter()
+        calculate_metrics.load_nav_history(cursor)
+        sql_load = time.perf_counter() - started
+        cursor.close()
+        conn.close()
+
+        started = time.perf_counter()
+        store.to_frame()
+        store_load = time.perf_counter() - started
+        del store
+        db.get_pool().close_all()
+
+    print(f"Store build:                    {build_time:.3f}s")
+    print(f"{args.reads} single-scheme reads  SQL: {sql_reads:.3f}s   store: {store_reads:.4f}s "
+          f"({sql_reads / store_reads:.0f}x)")
+    print(f"Full history load               SQL: {sql_load:.3f}s   store: {store_load:.4f}s "
+          f"({sql_load / store_load:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
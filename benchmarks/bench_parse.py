@@ -0,0 +1,84 @@
+"""Time NAVAll.txt parsing: the previous regex/dict parser vs. AmfiParser.
+
+Parses the bundled AMFI_NAV_data_txt.csv snapshot (~13.8k schemes) rendered
+as NAVAll.txt, `--repeat` times each, and reports the best run. The legacy
+timing includes the per-row strptime the old insert loop did:
+
+    python -m benchmarks.bench_parse [--repeat 5]
+"""
+import argparse
+import re
+import time
+from datetime import datetime
+
+from data_updater import AmfiParser
+from benchmarks.amfi_sample import navall_lines
+
+
+def legacy_parse(lines):
+    """The previous parse_amfi_data plus the strptime ingest_schemes used to do per scheme"""
+    current_amc = None
+    for line in lines:
+        amc_match = re.match(r'Mutual Fund Name:\s*(.+)', line)
+        if amc_match:
+            current_amc = amc_match.group(1).strip()
+            continue
+
+        if not line or ';' not in line or current_amc is None:
+            continue
+
+        parts = line.split(';')
+        if len(parts) >= 6:
+            try:
+                nav = float(parts[4].strip())
+            except ValueError:
+                continue
+            scheme = {
+                'scheme_code': parts[0].strip(),
+                'scheme_name': parts[1].strip(),
+                'isin_growth': parts[2].strip() if parts[2].strip() else None,
+                'isin_div_reinvestment': parts[3].strip() if parts[3].strip() else None,
+                'net_asset_value': nav,
+                'amc_name': current_amc,
+                'date': parts[5].strip(),
+            }
+            scheme['last_updated'] = datetime.strptime(scheme['date'], '%d-%b-%Y')
+            yield scheme
+
+
+def best_of(repeat, fn):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # The legacy parser only understood "Mutual Fund Name:" headers
+    lines = navall_lines()
+    legacy_lines = [line if ';' in line or not line or line.startswith('Open Ended')
+                    else f"Mutual Fund Name: {line}" for line in lines]
+
+    legacy_time, legacy = best_of(args.repeat, lambda: list(legacy_parse(legacy_lines)))
+
+    def fast():
+        amfi = AmfiParser()
+        return amfi, list(amfi.parse(iter(lines)))
+    fast_time, (amfi, records) = best_of(args.repeat, fast)
+
+    assert len(records) == len(legacy), (len(records), len(legacy))
+    print(f"{len(lines)} lines, {len(records)} schemes, {amfi.rejected} rejected, best of {args.repeat}")
+    print(f"Legacy regex/dict parser: {legacy_time * 1000:7.1f} ms ({len(legacy) / legacy_time:,.0f} rows/s)")
+    print(f"AmfiParser:               {fast_time * 1000:7.1f} ms ({len(records) / fast_time:,.0f} rows/s, "
+          f"{legacy_time / fast_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
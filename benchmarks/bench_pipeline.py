@@ -0,0 +1,287 @@
+"""End-to-end pipeline benchmark on a synthetic dataset, with JSON results.
+
+    python -m benchmarks.bench_pipeline --schemes 1000 --years 5
+    python -m benchmarks.bench_pipeline --schemes 20000 --years 10 --compare benchmarks/results/<earlier>.json
+
+Generates a SyntheticDataset (benchmarks/synthetic.py) and runs the whole
+pipeline against a throwaway SQLite database through the shared pool:
+
+    generate            synthetic NAVAll.txt for the previous trading day
+    parse               AmfiParser over those lines
+    ingest              ingest_schemes (staging table + history upsert) and the Nifty 50 load
+    history_load        bulk insert of every scheme's history (what a finished backfill leaves)
+    backfill            backfill_concurrent for --backfill-schemes schemes against the stub MFAPI
+    metrics_full        calculate_and_store_metrics(mode="full")
+    horizon_metrics     calculate_and_store_horizon_metrics
+    daily_ingest        next day's NAVAll.txt through parse + ingest_schemes
+    metrics_incremental calculate_and_store_metrics(mode="incremental")
+    scheme_summary      refresh_scheme_summary
+
+then times the hot Flask endpoints through the test client. Results (config,
+environment, per-stage seconds with sub-stage timings, endpoint latency
+percentiles) are written as JSON; --compare prints the change against an
+earlier result file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+import db
+import nav_store
+from benchmarks.stub_mfapi import start_stub_server
+from benchmarks.synthetic import SyntheticDataset
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+class Stages:
+    """Collects {stage: {"seconds": s, ...details}} and prints each stage as it finishes"""
+
+    def __init__(self):
+        self.results = {}
+
+    def run(self, name, fn, *args, **kwargs):
+        started = time.perf_counter()
+        details = fn(*args, **kwargs) or {}
+        seconds = time.perf_counter() - started
+        self.results[name] = dict(seconds=round(seconds, 4), **details)
+        extra = "  ".join(f"{key}={value}" for key, value in details.items() if not isinstance(value, dict))
+        print(f"{name:<20} {seconds:8.3f}s  {extra}")
+
+
+def load_nifty(dataset):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO nifty50_data (date, close, open, high, low, volume) VALUES (%s, %s, %s, %s, %s, %s)",
+        dataset.nifty_rows(),
+    )
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def ingest(lines):
+    from data_updater import AmfiParser, ingest_schemes
+    parser = AmfiParser()
+    conn = db.get_db_connection()
+    try:
+        count = ingest_schemes(conn, parser.parse(lines))
+    finally:
+        conn.close()
+    return {"schemes": count, "rejected": parser.rejected}
+
+
+def load_history(dataset, upto):
+    from backfill_historical import UPSERT_HISTORY_SQL
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    rows = 0
+    for scheme_rows in dataset.history_rows(upto=upto):
+        cursor.executemany(UPSERT_HISTORY_SQL, scheme_rows)
+        rows += len(scheme_rows)
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return {"rows": rows}
+
+
+def backfill(dataset, count, concurrency, rate, upto):
+    """Re-fetch `count` schemes from the stub; the rest are marked done as after an earlier run"""
+    import backfill_historical
+    server, base_url = start_stub_server(history=lambda code: dataset.mfapi_payload(code, upto=upto))
+    try:
+        backfill_historical.create_progress_table()
+        conn = db.get_db_connection()
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO backfill_progress (scheme_code, status) VALUES (%s, 'done')",
+            [(code,) for code in dataset.codes[count:].tolist()],
+        )
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        timings = {}
+        done, failed, rows = backfill_historical.backfill_concurrent(concurrency, rate, base_url, timings=timings)
+    finally:
+        server.shutdown()
+    return {"schemes": done, "failed": failed, "rows": rows,
+            "timings": {stage: round(seconds, 4) for stage, seconds in timings.items()}}
+
+
+def metrics(mode):
+    from calculate_metrics import calculate_and_store_metrics
+    timings = {}
+    calculate_and_store_metrics(mode=mode, timings=timings)
+    return {"timings": {stage: round(seconds, 4) for stage, seconds in timings.items()}}
+
+
+def endpoint_requests(dataset):
+    """(label, method, path, json body) for the hot read endpoints"""
+    code = int(dataset.codes[0])
+    amc = dataset.amcs[0]
+    basket = [{"scheme_code": int(c)} for c in dataset.codes[:min(20, len(dataset))]]
+    return [
+        ("home", "GET", "/", None),
+        ("get_amc", "GET", "/get_amc", None),
+        ("get_schemes", "GET", f"/get_schemes/{amc}", None),
+        ("scheme_details", "GET", f"/scheme-details/{dataset.scheme_name(0)}", None),
+        ("search", "GET", "/search?q=synthetic scheme 1", None),
+        ("get_historical_nav_1y", "GET", f"/get_historical_nav/{code}?range=1Y", None),
+        ("get_historical_nav_max", "GET", f"/get_historical_nav/{code}?range=max&points=500", None),
+        ("get_metrics", "GET", f"/get_metrics/{code}", None),
+        ("get_nifty50_history", "GET", "/get_nifty50_history", None),
+        ("screener", "GET", "/screener?max_beta=0.8&sort=-sharpe_ratio", None),
+        ("portfolio", "POST", "/portfolio", {"holdings": basket, "range": "3Y"}),
+    ]
+
+
+def time_endpoints(dataset, rounds):
+    started = time.perf_counter()
+    import app as web
+    startup = time.perf_counter() - started
+    client = web.app.test_client()
+
+    results = {}
+    for label, method, path, body in endpoint_requests(dataset):
+        timings = []
+        statuses = set()
+        for _ in range(rounds):
+            started = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            timings.append((time.perf_counter() - started) * 1000)
+            statuses.add(response.status_code)
+        first, p50, p95 = timings[0], *np.percentile(timings[1:] or timings, [50, 95])
+        results[label] = {"first_ms": round(first, 3), "p50_ms": round(p50, 3), "p95_ms": round(p95, 3),
+                          "status": sorted(statuses)}
+        print(f"{label:<24} first {first:8.2f}ms  p50 {p50:7.3f}ms  p95 {p95:7.3f}ms  status {sorted(statuses)}")
+    return round(startup, 4), results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(RESULTS_DIR), timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    import pandas
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pandas.__version__,
+        "git_commit": commit,
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nChange vs. {baseline_path} ({baseline['environment'].get('git_commit')}):")
+    for name, stage in current["stages"].items():
+        before = baseline["stages"].get(name)
+        if before and before["seconds"]:
+            print(f"  {name:<24} {before['seconds']:8.3f}s -> {stage['seconds']:8.3f}s "
+                  f"({stage['seconds'] / before['seconds']:.2f}x)")
+    for label, timing in current["endpoints"].items():
+        before = baseline["endpoints"].get(label)
+        if before and before["p50_ms"]:
+            print(f"  {label:<24} p50 {before['p50_ms']:8.3f}ms -> {timing['p50_ms']:8.3f}ms "
+                  f"({timing['p50_ms'] / before['p50_ms']:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic end-to-end pipeline benchmark")
+    parser.add_argument("--schemes", type=int, default=1000, help="number of schemes (1k-50k)")
+    parser.add_argument("--years", type=float, default=5, help="years of NAV / Nifty history (1-20)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backfill-schemes", type=int, default=200, help="schemes fetched through the stub MFAPI")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=1000.0, help="backfill requests per second")
+    parser.add_argument("--rounds", type=int, default=20, help="requests per endpoint")
+    parser.add_argument("--nav-store", action="store_true", help="enable the memory-mapped NAV store")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<timestamp>-<scale>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    stages = Stages()
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure_pool(backend="sqlite", sqlite_path=os.path.join(tmp, "bench.sqlite3"),
+                          size=args.concurrency + 2, timeout=120)
+        if args.nav_store:
+            nav_store.NAV_STORE_DIR = os.path.join(tmp, "nav_store")
+
+        dataset = SyntheticDataset(args.schemes, args.years, args.seed)
+        print(f"Synthetic dataset: {len(dataset)} schemes, {len(dataset.amcs)} AMCs, "
+              f"{len(dataset.dates)} trading days\n")
+
+        # The stored history ends the day before the newest NAVAll.txt, which the daily stages ingest
+        previous_day = len(dataset.dates) - 2
+        lines = []
+        stages.run("generate", lambda: lines.extend(dataset.navall_lines(previous_day)) or {"lines": len(lines)})
+
+        def parse():
+            from data_updater import AmfiParser
+            parser = AmfiParser()
+            return {"schemes": sum(1 for _ in parser.parse(lines)), "rejected": parser.rejected}
+
+        stages.run("parse", parse)
+        stages.run("ingest", ingest, lines)
+        stages.run("nifty_load", lambda: load_nifty(dataset) or {"rows": len(dataset.dates)})
+        stages.run("history_load", load_history, dataset, previous_day)
+        stages.run("backfill", backfill, dataset, min(args.backfill_schemes, len(dataset)),
+                   args.concurrency, args.rate, previous_day)
+        if args.nav_store:
+            stages.run("nav_store_build", lambda: {"rows": nav_store.build_nav_store()})
+        stages.run("metrics_full", metrics, "full")
+
+        from horizon_metrics import calculate_and_store_horizon_metrics
+        stages.run("horizon_metrics", calculate_and_store_horizon_metrics)
+
+        daily_lines = dataset.navall_lines(len(dataset.dates) - 1)
+        stages.run("daily_ingest", ingest, daily_lines)
+        if args.nav_store:
+            stages.run("nav_store_rebuild", lambda: {"rows": nav_store.build_nav_store()})
+        stages.run("metrics_incremental", metrics, "incremental")
+
+        from scheme_summary import refresh_scheme_summary
+        stages.run("scheme_summary", lambda: {"rows": refresh_scheme_summary()})
+
+        print()
+        startup, endpoints = time_endpoints(dataset, args.rounds)
+        stages.results["app_startup"] = {"seconds": startup}
+        db.get_pool().close_all()
+
+    result = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": config,
+        "environment": environment(),
+        "stages": stages.results,
+        "endpoints": endpoints,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        scale = f"{args.schemes}x{args.years:g}y"
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{scale}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
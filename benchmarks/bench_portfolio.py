@@ -0,0 +1,56 @@
+"""/portfolio latency on a production-sized return matrix.
+
+    python -m benchmarks.bench_portfolio --schemes 14000 --days 1250
+
+Builds a synthetic ReturnMatrix (random daily returns, 10% of the schemes
+starting partway through the window) and times portfolio.analyze for random
+baskets of 10, 50 and 200 schemes, including the JSON encoding of the result.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from portfolio import ReturnMatrix, analyze
+
+
+def synthetic_matrix(schemes, days, seed=0):
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0004, 0.01, days)
+    betas = rng.uniform(0.2, 1.2, schemes)[:, None]
+    returns = betas * market + rng.normal(0, 0.006, (schemes, days))
+    late = rng.choice(schemes, schemes // 10, replace=False)
+    for row, start in zip(late, rng.integers(1, days // 2, len(late))):
+        returns[row, :start] = np.nan
+    dates = np.arange(np.datetime64('2020-01-01'), np.datetime64('2020-01-01') + days)
+    return ReturnMatrix(np.arange(100000, 100000 + schemes), dates, returns, market)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schemes", type=int, default=14000)
+    parser.add_argument("--days", type=int, default=1250)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    matrix = synthetic_matrix(args.schemes, args.days)
+    print(f"Matrix: {args.schemes} schemes x {args.days} days, {matrix.nbytes() / 1e6:.0f} MB "
+          f"(built in {time.perf_counter() - started:.2f}s)")
+
+    rng = np.random.default_rng(1)
+    for size in (10, 50, 200):
+        timings = []
+        for _ in range(args.rounds):
+            codes = rng.choice(matrix.codes, size, replace=False)
+            weights = rng.dirichlet(np.ones(size))
+            started = time.perf_counter()
+            json.dumps(analyze(codes, weights, matrix=matrix))
+            timings.append((time.perf_counter() - started) * 1000)
+        p50, p95 = np.percentile(timings, [50, 95])
+        print(f"{size:>3} schemes: p50 {p50:.2f}ms  p95 {p95:.2f}ms  max {max(timings):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
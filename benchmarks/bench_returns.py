@@ -0,0 +1,68 @@
+"""/returns latency and batched SIP XIRR throughput on synthetic NAV histories.
+
+    python -m benchmarks.bench_returns --schemes 2000 --years 10
+
+Builds SchemeSeries for a SyntheticDataset and primes the returns cache with
+them, then times returns.get_returns (standard periods, SIP horizons and a
+custom start date, including JSON encoding) for random schemes, and one
+batch_sip_xirr solve over every scheme x yearly start date. Exits non-zero if
+a custom start before a scheme's inception is not rejected.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+import returns
+from benchmarks.synthetic import SyntheticDataset
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schemes", type=int, default=2000)
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset(args.schemes, args.years)
+    started = time.perf_counter()
+    series = []
+    for i, code in enumerate(dataset.codes.tolist()):
+        scheme = returns.SchemeSeries(code, *dataset.nav_history(i))
+        returns._cache.put(str(code), scheme)
+        series.append(scheme)
+    print(f"{len(series)} schemes x {len(dataset.dates)} days prepared in {time.perf_counter() - started:.2f}s")
+
+    rng = np.random.default_rng(1)
+    timings = []
+    for i in rng.choice(len(dataset), args.requests):
+        custom_start = str(dataset.dates[max(len(dataset.dates) // 2, dataset.starts[i])])
+        started = time.perf_counter()
+        json.dumps(returns.get_returns(int(dataset.codes[i]), start=custom_start))
+        timings.append((time.perf_counter() - started) * 1000)
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    print(f"get_returns: p50 {p50:.2f}ms  p95 {p95:.2f}ms  p99 {p99:.2f}ms  max {max(timings):.2f}ms")
+
+    late = np.flatnonzero(dataset.starts > 0)
+    if len(late):
+        code = int(dataset.codes[late[0]])
+        try:
+            returns.get_returns(code, start=str(dataset.dates[0]))
+        except ValueError as e:
+            print(f"pre-inception start rejected: {e}")
+        else:
+            raise SystemExit(f"get_returns accepted a start before scheme {code}'s first NAV")
+
+    end_day = int(dataset.dates[-1].astype(np.int64))
+    starts = returns.shift_months(end_day, np.arange(11, int(args.years * 12), 12))
+    started = time.perf_counter()
+    rates = returns.batch_sip_xirr(series, starts, end_day)
+    elapsed = time.perf_counter() - started
+    solved = np.count_nonzero(~np.isnan(rates))
+    print(f"batch_sip_xirr: {len(series)} schemes x {len(starts)} start dates ({solved} solvable) "
+          f"in {elapsed * 1000:.0f}ms ({elapsed / max(solved, 1) * 1e6:.1f}us per SIP)")
+
+
+if __name__ == "__main__":
+    main()
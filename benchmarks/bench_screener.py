@@ -0,0 +1,84 @@
+"""/screener latency on a production-sized metrics snapshot.
+
+    python -m benchmarks.bench_screener --schemes 14000 --rounds 200
+
+Builds a synthetic ScreenerSnapshot (random metrics spread over 45 AMCs, 5% of
+the schemes without metrics) and times typical screens next to a pandas
+filter-and-sort over the same rows.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from calculate_metrics import METRIC_COLUMNS
+from screener import ScreenerSnapshot
+
+SCREENS = [
+    ("top 20 Sharpe", {}),
+    ("top 20 Sharpe in one AMC", {"amc": "AMC 7"}),
+    ("beta <= 0.8 and Sortino >= 1", {"filters": [("beta", None, 0.8), ("sortino_ratio", 1.0, None)]}),
+    ("lowest std_dev, alpha >= 0, page 5", {"filters": [("alpha", 0.0, None)], "sort": "std_dev", "offset": 80}),
+]
+
+
+def synthetic_rows(schemes, seed=0):
+    rng = np.random.default_rng(seed)
+    metrics = np.column_stack([
+        rng.normal(0, 0.0002, schemes),
+        rng.uniform(0, 1.4, schemes),
+        rng.normal(0.5, 0.8, schemes),
+        rng.normal(0.8, 1.2, schemes),
+        rng.uniform(0.001, 0.02, schemes),
+    ])
+    metrics[rng.choice(schemes, schemes // 20, replace=False)] = np.nan
+    amcs = rng.integers(0, 45, schemes)
+    return [
+        (100000 + i, f"Scheme {i}", f"AMC {amcs[i]}", *metrics[i])
+        for i in range(schemes)
+    ]
+
+
+def pandas_screen(frame, filters=(), amc=None, sort="-sharpe_ratio", limit=20, offset=0):
+    mask = np.ones(len(frame), dtype=bool)
+    if amc is not None:
+        mask &= (frame["amc_name"] == amc).to_numpy()
+    for metric, low, high in filters:
+        if low is not None:
+            mask &= (frame[metric] >= low).to_numpy()
+        if high is not None:
+            mask &= (frame[metric] <= high).to_numpy()
+    matches = frame[mask].sort_values(sort.lstrip("-"), ascending=not sort.startswith("-"), na_position="last")
+    return matches.iloc[offset:offset + limit]
+
+
+def time_screen(fn, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return np.percentile(timings, [50, 95])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schemes", type=int, default=14000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.schemes)
+    started = time.perf_counter()
+    snapshot = ScreenerSnapshot(rows)
+    print(f"Snapshot build: {time.perf_counter() - started:.3f}s ({len(snapshot)} schemes)")
+    frame = pd.DataFrame(rows, columns=["scheme_code", "scheme_name", "amc_name"] + METRIC_COLUMNS)
+
+    for label, params in SCREENS:
+        p50, p95 = time_screen(lambda: snapshot.screen(**params), args.rounds)
+        pd50, pd95 = time_screen(lambda: pandas_screen(frame, **params), args.rounds)
+        print(f"{label:<36} snapshot p50 {p50:.3f}ms p95 {p95:.3f}ms   pandas p50 {pd50:.3f}ms p95 {pd95:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
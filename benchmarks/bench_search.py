@@ -0,0 +1,72 @@
+"""Search latency over the bundled AMFI snapshot (~14k schemes).
+
+    python -m benchmarks.bench_search --rounds 20
+
+Builds a SearchIndex from AMFI_NAV_data_txt.csv and times a mix of prefix,
+multi-word, typo, code and ISIN queries, reporting p50/p95/p99/max latency
+next to a naive substring scan over all names.
+"""
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from benchmarks.amfi_sample import AMFI_CSV
+from search import SearchIndex
+
+QUERIES = [
+    "h", "hd", "hdfc", "hdfc flexi", "axis blue", "sbi small cap direct",
+    "parag parikh flexi", "paragh flexy", "icici pru tecnology", "liquid",
+    "nippon india index", "kotak emerging", "quant", "gilt", "elss tax",
+    "119551", "INF209KA12Z1", "direct growth", "mirae", "zzzz",
+]
+
+
+def load_rows(csv_path=AMFI_CSV):
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return [
+            (int(row["Scheme Code"]), row["Scheme Name"], row["AMC Name"],
+             row["ISIN Div Payout/ISIN Growth"], row["ISIN Div Reinvestment"])
+            for row in csv.DictReader(f)
+        ]
+
+
+def naive_search(rows, query, limit):
+    query = query.lower()
+    return [row for row in rows if query in row[1].lower()][:limit]
+
+
+def time_queries(fn, rounds):
+    timings = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            started = time.perf_counter()
+            fn(query)
+            timings.append((time.perf_counter() - started) * 1000)
+    return np.array(timings)
+
+
+def describe(label, timings):
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    print(f"{label:<16} p50 {p50:.3f}ms  p95 {p95:.3f}ms  p99 {p99:.3f}ms  max {timings.max():.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = load_rows()
+    started = time.perf_counter()
+    index = SearchIndex(rows)
+    print(f"Index build: {time.perf_counter() - started:.3f}s "
+          f"({len(index)} schemes, {len(index.vocabulary)} tokens)")
+
+    describe("SearchIndex", time_queries(lambda q: index.search(q, args.limit), args.rounds))
+    describe("substring scan", time_queries(lambda q: naive_search(rows, q, args.limit), args.rounds))
+
+
+if __name__ == "__main__":
+    main()
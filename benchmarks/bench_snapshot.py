@@ -0,0 +1,104 @@
+"""Snapshot export/import: time and file size vs. dataset size.
+
+    python -m benchmarks.bench_snapshot --schemes 2000 --years 5
+
+Seeds a throwaway SQLite database from a SyntheticDataset (schemes, Nifty 50,
+a second index with one scheme overridden onto it and the full NAV history),
+exports a full snapshot and a --delta-days delta,
+restores both into an empty database and checks every table matches the
+source. Prints export/import seconds per stage, NAV rows/sec and bytes per
+NAV row; the full history re-ingest through the normal upsert path
+(bench_pipeline's history_load) is timed alongside for comparison.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import benchmark_map
+import db
+import snapshot
+from benchmarks.bench_pipeline import ingest, load_history, load_nifty
+from benchmarks.synthetic import SyntheticDataset
+
+
+def table_rows():
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        rows = {}
+        for table in ("mutual_funds", "historical_nav", *snapshot.TABLES):
+            cursor.execute(f"SELECT * FROM {table}")
+            rows[table] = sorted(map(tuple, cursor.fetchall()), key=repr)
+        return rows
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def load_second_index(dataset, index_name="NIFTY 500"):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        benchmark_map.create_benchmark_tables(cursor)
+        cursor.executemany(
+            "INSERT INTO index_prices (index_name, date, close, open, high, low, volume) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [(index_name, *row) for row in dataset.nifty_rows()])
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    benchmark_map.set_override(int(dataset.codes[0]), index_name)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schemes", type=int, default=2000)
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--delta-days", type=int, default=30, help="trading days in the delta snapshot")
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset(args.schemes, args.years)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure_pool(backend="sqlite", sqlite_path=os.path.join(tmp, "source.sqlite3"))
+        ingest(dataset.navall_lines(-1))
+        load_nifty(dataset)
+        load_second_index(dataset)
+        started = time.perf_counter()
+        load_history(dataset, -1)
+        reingest = time.perf_counter() - started
+        source = table_rows()
+
+        full_path, delta_path = os.path.join(tmp, "full.npz"), os.path.join(tmp, "delta.npz")
+        export_timings = {}
+        started = time.perf_counter()
+        manifest = snapshot.export_snapshot(full_path, timings=export_timings)
+        exported = time.perf_counter() - started
+        delta = snapshot.export_snapshot(delta_path, since=str(dataset.dates[-args.delta_days]))
+        db.get_pool().close_all()
+
+        db.configure_pool(backend="sqlite", sqlite_path=os.path.join(tmp, "restored.sqlite3"))
+        import_timings = {}
+        started = time.perf_counter()
+        snapshot.import_snapshots([full_path, delta_path], import_timings)
+        imported = time.perf_counter() - started
+        identical = table_rows() == source
+        db.get_pool().close_all()
+
+        nav_rows = manifest["rows"]["historical_nav"]
+        full_size, delta_size = os.path.getsize(full_path), os.path.getsize(delta_path)
+
+    print(f"\n{args.schemes} schemes x {args.years:g}y: {nav_rows} NAV rows")
+    print(f"  full snapshot   {full_size / 1e6:8.2f} MB  ({full_size / max(nav_rows, 1):.2f} bytes/NAV row)")
+    print(f"  delta snapshot  {delta_size / 1e6:8.2f} MB  ({delta['rows']['historical_nav']} NAV rows)")
+    print(f"  export          {exported:8.2f} s   ({nav_rows / exported:,.0f} rows/s)  "
+          + ", ".join(f"{k} {v:.2f}s" for k, v in export_timings.items()))
+    print(f"  import          {imported:8.2f} s   ({nav_rows / imported:,.0f} rows/s)  "
+          + ", ".join(f"{k} {v:.2f}s" for k, v in import_timings.items()))
+    print(f"  history re-ingest {reingest:6.2f} s")
+    print(f"  restored tables identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Local stand-in for api.mfapi.in serving canned, deterministic NAV history.
+
+    python -m benchmarks.stub_mfapi --port 8765 --days 1000 --fail-rate 0.05
+
+`/mf/<scheme_code>` returns MFAPI-shaped JSON; with --fail-rate a fraction of
+requests answer 503 so retry/backoff paths get exercised.
+"""
+import argparse
+import json
+import random
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def canned_history(scheme_code, days, end=date(2025, 3, 25)):
+    rng = random.Random(int(scheme_code))
+    nav = 10.0 + rng.random() * 90
+    entries = []
+    current = end - timedelta(days=days)
+    while current <= end:
+        if current.weekday() < 5:
+            nav *= 1 + rng.gauss(0.0004, 0.01)
+            entries.append({"date": current.strftime("%d-%m-%Y"), "nav": f"{nav:.4f}"})
+        current += timedelta(days=1)
+    entries.reverse()  # MFAPI lists newest first
+    return {"meta": {"scheme_code": int(scheme_code)}, "data": entries, "status": "SUCCESS"}
+
+
+def make_handler(days, fail_rate, history=None):
+    history = history or (lambda scheme_code: canned_history(scheme_code, days))
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if len(parts) != 2 or parts[0] != "mf" or not parts[1].isdigit():
+                self.send_error(404)
+                return
+            if fail_rate and random.random() < fail_rate:
+                self.send_error(503)
+                return
+            body = json.dumps(history(int(parts[1]))).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_stub_server(port=0, days=1000, fail_rate=0.0, history=None):
+    """Start the stub in a daemon thread; returns (server, base_url).
+
+    `history(scheme_code)` may replace the canned payload (see benchmarks.synthetic).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(days, fail_rate, history))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--days", type=int, default=1000)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server, url = start_stub_server(args.port, args.days, args.fail_rate)
+    print(f"Stub MFAPI serving on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,101 @@
+"""Deterministic synthetic dataset for the pipeline benchmarks.
+
+SyntheticDataset(schemes, years) describes a market of `schemes` schemes over
+`years` years of weekday trading dates ending on END_DATE: a Nifty 50 close
+series, AMCs, scheme master rows and one NAV history per scheme (a noisy
+multiple of the market return; a fifth of the schemes list partway through
+the window). Histories are generated per scheme from (seed, scheme_code), so
+the same scheme looks the same whether it comes from navall_lines(), an
+MFAPI payload served by the stub or history_rows(), and nothing larger than
+one scheme's history is ever held in memory.
+"""
+from datetime import date
+
+import numpy as np
+
+from benchmarks.amfi_sample import HEADER, CATEGORY
+
+END_DATE = date(2025, 3, 25)
+FIRST_CODE = 100000
+SCHEMES_PER_AMC = 300
+
+
+class SyntheticDataset:
+    def __init__(self, schemes=1000, years=5, seed=0, end=END_DATE):
+        self.seed = seed
+        end = np.datetime64(end, 'D')
+        days = np.arange(end - np.timedelta64(int(years * 365.25), 'D'), end + 1)
+        self.dates = days[np.is_busday(days)]
+
+        rng = np.random.default_rng(seed)
+        self.market_returns = rng.normal(0.0004, 0.01, len(self.dates))
+        self.market_returns[0] = 0.0
+        self.nifty_close = 10000 * np.cumprod(1 + self.market_returns)
+
+        self.codes = np.arange(FIRST_CODE, FIRST_CODE + schemes, dtype=np.int64)
+        self.amcs = [f"Synthetic {i:02d} Mutual Fund" for i in range(max(1, -(-schemes // SCHEMES_PER_AMC)))]
+        self.scheme_amc = rng.integers(0, len(self.amcs), schemes)
+        self.betas = rng.uniform(0.2, 1.3, schemes)
+        late = rng.random(schemes) < 0.2
+        self.starts = np.where(late, rng.integers(0, len(self.dates) - 60, schemes), 0)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def scheme_name(self, i):
+        plan = "Direct" if i % 2 else "Regular"
+        return f"{self.amcs[self.scheme_amc[i]].replace(' Mutual Fund', '')} Scheme {i} Fund - {plan} Plan - Growth"
+
+    def isins(self, i):
+        return f"INF{FIRST_CODE + i:07d}G1", f"INF{FIRST_CODE + i:07d}R1"
+
+    def nav_history(self, i, upto=None):
+        """(dates, navs) for scheme row i, up to and including date index `upto` (default: all)"""
+        rng = np.random.default_rng((self.seed, int(self.codes[i])))
+        noise = rng.normal(0.0001, 0.005, len(self.dates))
+        navs = (10 + 90 * rng.random()) * np.cumprod(1 + self.betas[i] * self.market_returns + noise)
+        stop = len(self.dates) if upto is None else (upto % len(self.dates)) + 1
+        return self.dates[self.starts[i]:stop], navs[self.starts[i]:stop]
+
+    def navall_lines(self, day=-1):
+        """NAVAll.txt lines for trading date index `day` (schemes not yet listed are left out)"""
+        day = day % len(self.dates)
+        nav_date = self.dates[day].astype(object).strftime("%d-%b-%Y")
+        lines = [HEADER, "", CATEGORY, ""]
+        for amc_id, amc in enumerate(self.amcs):
+            rows = np.flatnonzero((self.scheme_amc == amc_id) & (self.starts <= day))
+            if not len(rows):
+                continue
+            lines += ["", amc, ""]
+            for i in rows:
+                navs = self.nav_history(i, upto=day)[1]
+                isin_growth, isin_reinvest = self.isins(i)
+                lines.append(f"{self.codes[i]};{isin_growth};{isin_reinvest};{self.scheme_name(i)};"
+                             f"{navs[-1]:.4f};{nav_date}")
+        return lines
+
+    def mfapi_payload(self, scheme_code, upto=-1):
+        """MFAPI /mf/<code> JSON (newest first) for the history up to date index `upto`"""
+        i = int(scheme_code) - FIRST_CODE
+        if not 0 <= i < len(self):
+            return {"meta": {}, "data": [], "status": "ERROR"}
+        dates, navs = self.nav_history(i, upto=upto)
+        labels = [d.strftime("%d-%m-%Y") for d in dates.astype(object)]
+        data = [{"date": label, "nav": f"{nav:.4f}"} for label, nav in zip(reversed(labels), navs[::-1])]
+        return {"meta": {"scheme_code": int(scheme_code)}, "data": data, "status": "SUCCESS"}
+
+    def history_rows(self, upto=-1):
+        """Yield one list of (scheme_code, nav_date, nav_value) rows per scheme, for executemany"""
+        for i, code in enumerate(self.codes.tolist()):
+            dates, navs = self.nav_history(i, upto=upto)
+            yield list(zip([code] * len(dates), dates.astype(object).tolist(), np.round(navs, 4).tolist()))
+
+    def nifty_rows(self):
+        """(date, close, open, high, low, volume) rows for nifty50_data"""
+        close = np.round(self.nifty_close, 2)
+        previous = np.concatenate(([close[0]], close[:-1]))
+        high = np.maximum(close, previous) * 1.003
+        low = np.minimum(close, previous) * 0.997
+        return list(zip(self.dates.astype(object).tolist(), close.tolist(), previous.tolist(),
+                        np.round(high, 2).tolist(), np.round(low, 2).tolist(),
+                        [250_000_000] * len(close)))
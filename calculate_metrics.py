@@ -1,4 +1,13 @@
-import mysql.connector
+import argparse
+import sys
+import time
+import traceback
+from db import get_db_connection
+import benchmark_map
+import nav_store
+import scheme_summary
+from events import METRICS_UPDATED, publish
+from instrumentation import StageTimer
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -6,115 +15,487 @@ from datetime import datetime
 # Approximate daily risk-free rate (6% annual)
 RISK_FREE_RATE = 0.06 / 252
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="kakabapa12",
-        database="mf_database"
-    )
+# Minimum number of NAV rows / aligned returns required to compute metrics
+MIN_OBSERVATIONS = 20
 
-def calculate_and_store_metrics():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+# Number of scheme columns processed per matrix block (bounds peak memory)
+CHUNK_SIZE = 2000
+
+METRIC_COLUMNS = ['alpha', 'beta', 'sharpe_ratio', 'sortino_ratio', 'std_dev']
+
+UPSERT_METRICS_SQL = """
+    INSERT INTO scheme_metrics
+        (scheme_code, alpha, beta, sharpe_ratio, sortino_ratio, std_dev)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        alpha=VALUES(alpha),
+        beta=VALUES(beta),
+        sharpe_ratio=VALUES(sharpe_ratio),
+        sortino_ratio=VALUES(sortino_ratio),
+        std_dev=VALUES(std_dev),
+        calculated_on=CURRENT_TIMESTAMP
+"""
 
-    # Fetch all Nifty 50 data once (for efficiency)
+def _daily_returns(rows):
+    """(date, close) rows -> date-indexed daily return series"""
+    prices = pd.DataFrame(rows, columns=['date', 'close'])
+    prices['date'] = pd.to_datetime(prices['date'])
+    prices['close'] = prices['close'].astype(float)
+    prices['return'] = prices['close'].pct_change()
+    prices.dropna(inplace=True)
+    return prices.set_index('date')['return']
+
+def load_nifty_returns(cursor):
+    """Fetch all Nifty 50 closes once and return a date-indexed daily return series"""
     cursor.execute("SELECT date, close FROM nifty50_data ORDER BY date ASC")
-    nifty_rows = cursor.fetchall()
-    nifty_df = pd.DataFrame(nifty_rows)
-    nifty_df['date'] = pd.to_datetime(nifty_df['date'])
-    nifty_df['close'] = nifty_df['close'].astype(float)
-    nifty_df['return'] = nifty_df['close'].pct_change()
-    nifty_df.dropna(inplace=True)
-
-    # Get all scheme codes
-    cursor.execute("SELECT DISTINCT scheme_code FROM mutual_funds")
-    scheme_codes = [row['scheme_code'] for row in cursor.fetchall()]
+    return _daily_returns(cursor.fetchall())
+
+def load_index_returns(cursor, index_name):
+    """Daily returns of a benchmark: Nifty 50 from nifty50_data, anything else from index_prices"""
+    if index_name == benchmark_map.DEFAULT_BENCHMARK:
+        return load_nifty_returns(cursor)
+    cursor.execute("SELECT date, close FROM index_prices WHERE index_name = %s ORDER BY date ASC", (index_name,))
+    return _daily_returns(cursor.fetchall())
+
+def load_benchmark_returns(cursor, index_names):
+    """{index_name: daily return series}, each benchmark read once"""
+    return {name: load_index_returns(cursor, name) for name in index_names}
+
+def load_nav_history(cursor, scheme_codes=None, where_in=False, since=None):
+    """Fetch NAV history as a long DataFrame.
+
+    By default all schemes are read in a single query and filtered in memory;
+    `where_in=True` instead pushes the scheme list into the query (in blocks),
+    which is cheaper when only a handful of schemes are needed. `since`
+    limits the read to NAVs on or after that date. When the columnar NAV
+    store is enabled the frame is built from its memory-mapped arrays instead.
+    """
+    store = nav_store.get_nav_store()
+    if store is not None:
+        return store.to_frame(scheme_codes, since)
 
-    for scheme_code in scheme_codes:
-        print(f"\nProcessing scheme: {scheme_code}")
+    columns = ['scheme_code', 'nav_date', 'nav_value']
+    if where_in and scheme_codes is not None:
+        rows = []
+        codes = list(scheme_codes)
+        for start in range(0, len(codes), 1000):
+            block = codes[start:start + 1000]
+            placeholders = ','.join(['%s'] * len(block))
+            cursor.execute(f"""
+                SELECT scheme_code, nav_date, nav_value FROM historical_nav
+                WHERE scheme_code IN ({placeholders})
+                ORDER BY scheme_code, nav_date ASC
+            """, block)
+            rows.extend(cursor.fetchall())
+        return pd.DataFrame(rows, columns=columns)
 
-        # Fetch NAV history
+    if since is not None:
         cursor.execute("""
-            SELECT nav_date, nav_value FROM historical_nav
-            WHERE scheme_code = %s ORDER BY nav_date ASC
-        """, (scheme_code,))
-        nav_rows = cursor.fetchall()
+            SELECT scheme_code, nav_date, nav_value FROM historical_nav
+            WHERE nav_date >= %s
+            ORDER BY scheme_code, nav_date ASC
+        """, (since,))
+    else:
+        cursor.execute("""
+            SELECT scheme_code, nav_date, nav_value FROM historical_nav
+            ORDER BY scheme_code, nav_date ASC
+        """)
+    nav_df = pd.DataFrame(cursor.fetchall(), columns=columns)
+    if scheme_codes is not None:
+        nav_df = nav_df[nav_df['scheme_code'].isin(scheme_codes)]
+    return nav_df
+
+def nav_returns(nav_df):
+    """Per-scheme NAV returns in long form.
+
+    Mirrors the per-scheme rules: null and zero NAVs are dropped before the
+    percentage change, so each return is measured against the previous valid NAV.
+    Also returns the raw row count per scheme for the minimum-history check.
+    """
+    nav_df = nav_df.copy()
+    nav_df['nav_date'] = pd.to_datetime(nav_df['nav_date'])
+    nav_df['nav_value'] = nav_df['nav_value'].astype(float)
+    row_counts = nav_df.groupby('scheme_code').size()
+
+    nav_df = nav_df[nav_df['nav_value'].notnull() & (nav_df['nav_value'] != 0)]
+    nav_df = nav_df.sort_values(['scheme_code', 'nav_date'])
+    nav_df['return'] = nav_df.groupby('scheme_code')['nav_value'].pct_change()
+    return nav_df.dropna(subset=['return']), row_counts
+
+def build_return_matrix(returns_df, nifty_returns, scheme_codes):
+    """Pivot long-form returns into a (date x scheme) matrix on the Nifty calendar.
+
+    Returns the scheme return matrix (NaN where a scheme has no return on that
+    date) and the aligned Nifty return vector.
+    """
+    matrix = returns_df.pivot(index='nav_date', columns='scheme_code', values='return')
+    matrix = matrix.reindex(index=nifty_returns.index, columns=scheme_codes)
+    return matrix.to_numpy(dtype=float), nifty_returns.to_numpy(dtype=float)
+
+def compute_metrics_matrix(scheme_matrix, market_returns):
+    """Compute alpha, beta, Sharpe, Sortino and std-dev for every column at once.
+
+    `scheme_matrix` is a (dates x schemes) array of returns with NaN for missing
+    observations; `market_returns` is the matching Nifty return vector. The
+    statistics use the same definitions as the original per-scheme loop
+    (population std-dev, sample covariance over population variance for beta).
+    Returns a dict of metric arrays plus the aligned observation count per scheme.
+    """
+    mask = ~np.isnan(scheme_matrix)
+    n = mask.sum(axis=0).astype(float)
+    safe_n = np.where(n > 0, n, np.nan)
+
+    r = np.where(mask, scheme_matrix, 0.0)
+    m = np.where(mask, market_returns[:, None], 0.0)
+
+    mean_r = r.sum(axis=0) / safe_n
+    mean_m = m.sum(axis=0) / safe_n
+    dev_r = np.where(mask, r - mean_r, 0.0)
+    dev_m = np.where(mask, m - mean_m, 0.0)
+
+    std_dev = np.sqrt((dev_r ** 2).sum(axis=0) / safe_n) * np.sqrt(252)
+    var_m = (dev_m ** 2).sum(axis=0) / safe_n
+    cov_rm = (dev_r * dev_m).sum(axis=0) / np.where(n > 1, n - 1, np.nan)
+
+    down = mask & (scheme_matrix < 0)
+    n_down = down.sum(axis=0).astype(float)
+    safe_n_down = np.where(n_down > 0, n_down, np.nan)
+    d = np.where(down, scheme_matrix, 0.0)
+    mean_d = d.sum(axis=0) / safe_n_down
+    downside_std = np.sqrt((np.where(down, d - mean_d, 0.0) ** 2).sum(axis=0) / safe_n_down) * np.sqrt(252)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = cov_rm / var_m
+        excess_annual = (mean_r - RISK_FREE_RATE) * 252
+        sharpe = np.where(std_dev > 0, excess_annual / std_dev, np.nan)
+        sortino = np.where(downside_std > 0, excess_annual / downside_std, np.nan)
+
+    alpha = mean_r * 252 - (RISK_FREE_RATE * 252 + beta * (mean_m * 252 - RISK_FREE_RATE * 252))
+
+    return {
+        'alpha': alpha,
+        'beta': beta,
+        'sharpe_ratio': sharpe,
+        'sortino_ratio': sortino,
+        'std_dev': std_dev,
+        'observations': n,
+    }
+
+def iter_return_blocks(returns_df, nifty_returns, scheme_codes, chunk_size=CHUNK_SIZE):
+    """Yield (codes, scheme_matrix, market_returns) blocks of at most `chunk_size` schemes"""
+    for start in range(0, len(scheme_codes), chunk_size):
+        chunk = scheme_codes[start:start + chunk_size]
+        chunk_returns = returns_df[returns_df['scheme_code'].isin(chunk)]
+        scheme_matrix, market_returns = build_return_matrix(chunk_returns, nifty_returns, chunk)
+        yield chunk, scheme_matrix, market_returns
+
+def _metric_frames(returns_df, row_counts, market_returns, scheme_codes, chunk_size):
+    eligible = [code for code in scheme_codes if row_counts.get(code, 0) >= MIN_OBSERVATIONS]
+    for chunk, scheme_matrix, aligned_market in iter_return_blocks(returns_df, market_returns, eligible, chunk_size):
+        metrics = compute_metrics_matrix(scheme_matrix, aligned_market)
+        yield pd.DataFrame(metrics, index=pd.Index(chunk, name='scheme_code'))
+
+def _eligible_metrics(frames):
+    if not frames:
+        return pd.DataFrame(columns=METRIC_COLUMNS + ['observations'])
+    result = pd.concat(frames)
+    return result[result['observations'] >= MIN_OBSERVATIONS]
+
+def compute_all_metrics(nav_df, nifty_returns, scheme_codes, chunk_size=CHUNK_SIZE):
+    """Batch engine: metrics for every scheme from one long NAV DataFrame.
+
+    Schemes are processed in column blocks of `chunk_size` so the dense return
+    matrix stays bounded. Returns a DataFrame indexed by scheme_code holding
+    only schemes with enough history.
+    """
+    returns_df, row_counts = nav_returns(nav_df)
+    return _eligible_metrics(list(_metric_frames(returns_df, row_counts, nifty_returns, scheme_codes, chunk_size)))
+
+def compute_grouped_metrics(nav_df, benchmark_returns, groups, chunk_size=CHUNK_SIZE):
+    """compute_all_metrics with each group of schemes measured against its own benchmark.
+
+    `groups` maps benchmark names (keys of `benchmark_returns`) to scheme
+    codes. NAV returns are computed once; every group is then aligned to its
+    benchmark's calendar and run through the same matrix blocks.
+    """
+    returns_df, row_counts = nav_returns(nav_df)
+    frames = []
+    for index_name, codes in groups.items():
+        frames.extend(_metric_frames(returns_df, row_counts, benchmark_returns[index_name], codes, chunk_size))
+    return _eligible_metrics(frames)
+
+def sufficient_stats_matrix(scheme_matrix, market_returns):
+    """Running sums per column from which every metric can be derived.
+
+    n, Σr, Σr², Σm, Σm², Σr·m over aligned observations, plus the count, sum
+    and sum of squares of negative scheme returns for the downside deviation.
+    """
+    mask = ~np.isnan(scheme_matrix)
+    r = np.where(mask, scheme_matrix, 0.0)
+    m = np.where(mask, market_returns[:, None], 0.0)
+    d = np.where(r < 0, r, 0.0)
+    return {
+        'n': mask.sum(axis=0),
+        'sum_r': r.sum(axis=0),
+        'sum_r2': (r ** 2).sum(axis=0),
+        'sum_m': m.sum(axis=0),
+        'sum_m2': (m ** 2).sum(axis=0),
+        'sum_rm': (r * m).sum(axis=0),
+        'n_down': (r < 0).sum(axis=0),
+        'sum_d': d.sum(axis=0),
+        'sum_d2': (d ** 2).sum(axis=0),
+    }
+
+def metrics_from_stats(stats):
+    """Derive metrics from running sums (arrays or scalars), same definitions as the batch engine"""
+    n = np.asarray(stats['n'], dtype=float)
+    n_down = np.asarray(stats['n_down'], dtype=float)
 
-        if len(nav_rows) < 20:
-            print(f"  Skipped: Not enough NAV data")
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_r = stats['sum_r'] / n
+        mean_m = stats['sum_m'] / n
+        var_r = np.maximum(stats['sum_r2'] / n - mean_r ** 2, 0.0)
+        var_m = np.maximum(stats['sum_m2'] / n - mean_m ** 2, 0.0)
+        cov_rm = (stats['sum_rm'] - stats['sum_r'] * stats['sum_m'] / n) / (n - 1)
+        mean_d = stats['sum_d'] / n_down
+        var_d = np.maximum(stats['sum_d2'] / n_down - mean_d ** 2, 0.0)
+
+        std_dev = np.sqrt(var_r) * np.sqrt(252)
+        downside_std = np.sqrt(var_d) * np.sqrt(252)
+        beta = cov_rm / var_m
+        excess_annual = (mean_r - RISK_FREE_RATE) * 252
+        sharpe = np.where(std_dev > 0, excess_annual / std_dev, np.nan)
+        sortino = np.where(downside_std > 0, excess_annual / downside_std, np.nan)
+        alpha = mean_r * 252 - (RISK_FREE_RATE * 252 + beta * (mean_m * 252 - RISK_FREE_RATE * 252))
+
+    return {
+        'alpha': alpha,
+        'beta': beta,
+        'sharpe_ratio': sharpe,
+        'sortino_ratio': sortino,
+        'std_dev': std_dev,
+        'observations': n,
+    }
+
+def metrics_to_rows(metrics_df):
+    """Convert a metrics DataFrame into DB parameter tuples (NaN -> None)"""
+    rows = []
+    for scheme_code, values in zip(metrics_df.index, metrics_df[METRIC_COLUMNS].to_numpy()):
+        rows.append((scheme_code,) + tuple(
+            None if np.isnan(value) else float(value) for value in values
+        ))
+    return rows
+
+def calculate_scheme_metrics(nav_rows, nifty_df):
+    """Reference per-scheme computation (the original loop body).
+
+    Kept for parity checks against the batch engine. Returns a metrics dict,
+    or None if the scheme is skipped.
+    """
+    if len(nav_rows) < MIN_OBSERVATIONS:
+        return None
+
+    nav_df = pd.DataFrame(nav_rows, columns=['nav_date', 'nav_value'])
+    nav_df['nav_date'] = pd.to_datetime(nav_df['nav_date'])
+    nav_df['nav_value'] = nav_df['nav_value'].astype(float)
+    nav_df = nav_df[nav_df['nav_value'].notnull() & (nav_df['nav_value'] != 0)]
+
+    nav_df['return'] = nav_df['nav_value'].pct_change()
+    nav_df.dropna(inplace=True)
+
+    # Merge NAV and Nifty data on date
+    merged_df = pd.merge(
+        nav_df[['nav_date', 'return']],
+        nifty_df[['date', 'return']],
+        left_on='nav_date',
+        right_on='date',
+        how='inner',
+        suffixes=('_scheme', '_nifty')
+    ).dropna()
+
+    if len(merged_df) < MIN_OBSERVATIONS:
+        return None
+
+    # Extract aligned returns
+    scheme_returns = merged_df['return_scheme'].reset_index(drop=True)
+    market_returns = merged_df['return_nifty'].reset_index(drop=True)
+    excess_returns = scheme_returns - RISK_FREE_RATE
+
+    std_dev = np.std(scheme_returns) * np.sqrt(252)
+    downside_std = np.std(scheme_returns[scheme_returns < 0]) * np.sqrt(252)
+    beta = np.cov(scheme_returns, market_returns)[0][1] / np.var(market_returns)
+
+    sharpe = (excess_returns.mean() * 252) / std_dev if std_dev > 0 else None
+    sortino = (excess_returns.mean() * 252) / downside_std if downside_std > 0 else None
+
+    scheme_annual_return = scheme_returns.mean() * 252
+    market_annual_return = market_returns.mean() * 252
+    alpha = scheme_annual_return - (RISK_FREE_RATE * 252 + beta * (market_annual_return - RISK_FREE_RATE * 252))
+
+    return {
+        'alpha': float(alpha),
+        'beta': float(beta),
+        'sharpe_ratio': float(sharpe) if sharpe is not None else None,
+        'sortino_ratio': float(sortino) if sortino is not None else None,
+        'std_dev': float(std_dev),
+    }
+
+def check_parity(nav_df, nifty_returns, scheme_codes, rtol=1e-9, atol=1e-12):
+    """Compare the batch engine with the per-scheme reference.
+
+    Returns a list of (scheme_code, metric, reference, batch) mismatches;
+    an empty list means the two implementations agree.
+    """
+    batch = compute_all_metrics(nav_df, nifty_returns, scheme_codes)
+    nifty_df = nifty_returns.rename('return').rename_axis('date').reset_index()
+
+    mismatches = []
+    for scheme_code, group in nav_df.groupby('scheme_code'):
+        if scheme_code not in scheme_codes:
             continue
+        nav_rows = group[['nav_date', 'nav_value']].to_numpy().tolist()
+        reference = calculate_scheme_metrics(nav_rows, nifty_df)
+        in_batch = scheme_code in batch.index
 
-        nav_df = pd.DataFrame(nav_rows)
-        nav_df['nav_date'] = pd.to_datetime(nav_df['nav_date'])
-        nav_df['nav_value'] = nav_df['nav_value'].astype(float)
-        nav_df = nav_df[nav_df['nav_value'].notnull() & (nav_df['nav_value'] != 0)]
-
-        nav_df['return'] = nav_df['nav_value'].pct_change()
-        nav_df.dropna(inplace=True)
-
-        # Merge NAV and Nifty data on date
-        merged_df = pd.merge(
-            nav_df[['nav_date', 'return']],
-            nifty_df[['date', 'return']],
-            left_on='nav_date',
-            right_on='date',
-            how='inner',
-            suffixes=('_scheme', '_nifty')
-        ).dropna()
-
-        if len(merged_df) < 20:
-            print(f"  Skipped: Not enough overlapping NAV & Nifty data ({len(merged_df)} rows)")
+        if reference is None or not in_batch:
+            if reference is not None or in_batch:
+                mismatches.append((scheme_code, 'presence', reference is not None, in_batch))
             continue
 
-        # Extract aligned returns
-        scheme_returns = merged_df['return_scheme'].reset_index(drop=True)
-        market_returns = merged_df['return_nifty'].reset_index(drop=True)
-        excess_returns = scheme_returns - RISK_FREE_RATE
+        for metric in METRIC_COLUMNS:
+            expected = reference[metric]
+            actual = batch.at[scheme_code, metric]
+            if expected is None:
+                if not np.isnan(actual):
+                    mismatches.append((scheme_code, metric, expected, actual))
+            elif not np.isclose(expected, actual, rtol=rtol, atol=atol, equal_nan=True):
+                mismatches.append((scheme_code, metric, expected, actual))
+    return mismatches
 
-        std_dev = np.std(scheme_returns) * np.sqrt(252)
-        downside_std = np.std(scheme_returns[scheme_returns < 0]) * np.sqrt(252)
+def calculate_and_store_metrics(mode="full", workers=None, chunk_size=None, timings=None):
+    """Recompute scheme_metrics.
 
-        try:
-            beta = np.cov(scheme_returns, market_returns)[0][1] / np.var(market_returns)
-        except Exception as e:
-            print(f"  Skipped: Failed to calculate beta ({e})")
-            continue
+    mode="full" rebuilds every scheme from its whole history and reseeds the
+    running-sum state; mode="parallel" does the same rebuild across `workers`
+    processes in chunks of `chunk_size` schemes (see parallel_metrics.py);
+    mode="incremental" folds only NAVs added since the last run into that
+    state (see metrics_state.py) and falls back to a full rebuild when no
+    state exists yet. Each scheme is measured against the benchmark
+    benchmark_map assigns it; every benchmark series is loaded once and its
+    schemes are computed as one group. If a `timings` dict is passed it
+    receives the seconds spent in each stage ('load', 'compute', 'store', 'summary').
+    """
+    import metrics_state
 
-        sharpe = (excess_returns.mean() * 252) / std_dev if std_dev > 0 else None
-        sortino = (excess_returns.mean() * 252) / downside_std if downside_std > 0 else None
+    if mode == "incremental":
+        return metrics_state.update_metrics_incremental(timings)
 
-        scheme_annual_return = scheme_returns.mean() * 252
-        market_annual_return = market_returns.mean() * 252
-        alpha = scheme_annual_return - (RISK_FREE_RATE * 252 + beta * (market_annual_return - RISK_FREE_RATE * 252))
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    clock = StageTimer(timings)
 
-        # Convert to native Python floats
-        alpha = float(alpha) if alpha is not None else None
-        beta = float(beta) if beta is not None else None
-        sharpe = float(sharpe) if sharpe is not None else None
-        sortino = float(sortino) if sortino is not None else None
-        std_dev = float(std_dev) if std_dev is not None else None
+    # Get all scheme codes, grouped by benchmark
+    cursor.execute("SELECT DISTINCT scheme_code FROM mutual_funds")
+    scheme_codes = [row[0] for row in cursor.fetchall()]
+    assignment = benchmark_map.load_assignment(cursor)
+    groups = benchmark_map.group_codes(assignment, scheme_codes)
 
-        # Insert into DB
-        cursor.execute("""
-            INSERT INTO scheme_metrics 
-                (scheme_code, alpha, beta, sharpe_ratio, sortino_ratio, std_dev)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE 
-                alpha=VALUES(alpha),
-                beta=VALUES(beta),
-                sharpe_ratio=VALUES(sharpe_ratio),
-                sortino_ratio=VALUES(sortino_ratio),
-                std_dev=VALUES(std_dev),
-                calculated_on=CURRENT_TIMESTAMP
-        """, (scheme_code, alpha, beta, sharpe, sortino, std_dev))
-        conn.commit()
-
-        print(f"  ✔ Metrics saved.")
+    # Fetch every benchmark series once (for efficiency)
+    benchmark_returns = load_benchmark_returns(cursor, groups)
+
+    # Fetch NAV history for every scheme in one pass
+    nav_df = load_nav_history(cursor, scheme_codes)
+    print(f"Loaded {len(nav_df)} NAV rows for {len(scheme_codes)} schemes "
+          f"against {len(groups)} benchmarks")
+    clock.lap("load")
+
+    if mode == "parallel":
+        import parallel_metrics
+        workers = workers or parallel_metrics.default_workers()
+        chunk_size = chunk_size or parallel_metrics.PARALLEL_CHUNK_SIZE
+        print(f"Computing metrics with {workers} workers, {chunk_size} schemes per chunk")
+        compute_started = time.perf_counter()
+        metrics_df, state_df, chunk_timings = parallel_metrics.compute_metrics_parallel(
+            nav_df, benchmark_returns, groups, workers, chunk_size)
+        parallel_metrics.print_timings(chunk_timings, time.perf_counter() - compute_started)
+    else:
+        metrics_df = compute_grouped_metrics(nav_df, benchmark_returns, groups)
+        state_df = metrics_state.compute_grouped_state(nav_df, benchmark_returns, groups)
+    rows = metrics_to_rows(metrics_df)
+    clock.lap("compute")
+
+    # Single bulk upsert
+    if rows:
+        cursor.executemany(UPSERT_METRICS_SQL, rows)
+
+    # Seed the running sums used by incremental mode, with the benchmark they were taken against
+    metrics_state.store_state(cursor, state_df, replace=True)
+    benchmark_map.store_scheme_benchmarks(cursor, assignment, replace=True)
+    conn.commit()
 
     cursor.close()
     conn.close()
-    print("\n✅ All available scheme metrics calculated and stored.")
+    clock.lap("store")
+    skipped = len(scheme_codes) - len(rows)
+    print(f"\n✅ Metrics stored for {len(rows)} schemes ({skipped} skipped) "
+          f"in {time.perf_counter() - started:.1f}s.")
+    scheme_summary.refresh()
+    clock.lap("summary")
+    publish(METRICS_UPDATED)
+
+def verify_metrics_parity():
+    """Run the batch engine and the per-scheme reference on live data and report differences"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT scheme_code FROM mutual_funds")
+    scheme_codes = [row[0] for row in cursor.fetchall()]
+    groups = benchmark_map.group_codes(benchmark_map.load_assignment(cursor), scheme_codes)
+    benchmark_returns = load_benchmark_returns(cursor, groups)
+    nav_df = load_nav_history(cursor, scheme_codes)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    mismatches = []
+    for index_name, codes in groups.items():
+        group_df = nav_df[nav_df['scheme_code'].isin(codes)]
+        mismatches.extend(check_parity(group_df, benchmark_returns[index_name], codes))
+    for scheme_code, metric, expected, actual in mismatches[:20]:
+        print(f"  ✘ {scheme_code} {metric}: reference={expected} batch={actual}")
+    if mismatches:
+        print(f"Parity check failed: {len(mismatches)} mismatches")
+        return False
+    print(f"Parity check passed for {len(scheme_codes)} schemes")
+    return True
 
 if __name__ == "__main__":
-    calculate_and_store_metrics()
+    parser = argparse.ArgumentParser(description="Compute scheme risk metrics")
+    parser.add_argument("--verify", action="store_true", help="compare the batch engine with the per-scheme reference")
+    parser.add_argument("--verify-incremental", action="store_true", help="compare stored running sums with a full rebuild")
+    parser.add_argument("--incremental", action="store_true", help="fold in only NAVs added since the last run")
+    parser.add_argument("--parallel", action="store_true", help="full rebuild across a process pool")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="schemes per worker task")
+    args = parser.parse_args()
+
+    if args.verify:
+        sys.exit(0 if verify_metrics_parity() else 1)
+    if args.verify_incremental:
+        import metrics_state
+        sys.exit(0 if metrics_state.check_incremental_consistency() else 1)
+    mode = "incremental" if args.incremental else "parallel" if args.parallel else "full"
+    # Recorded in job_runs so running web processes pick up the new metrics; the
+    # pipeline lock keeps this from racing the worker's incremental fold
+    from jobs import exclusive_run
+    with exclusive_run("metrics") as run:
+        try:
+            timings = {}
+            try:
+                calculate_and_store_metrics(mode=mode, workers=args.workers, chunk_size=args.chunk_size, timings=timings)
+            finally:
+                run.record_stages(timings)
+            run.finish("success")
+        except Exception:
+            run.finish("failed", error=traceback.format_exc())
+            raise
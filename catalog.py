@@ -0,0 +1,81 @@
+"""In-memory AMC / scheme catalog.
+
+The catalog is rebuilt from `mutual_funds` at startup and whenever the daily
+update commits; readers always see a complete snapshot because a refresh
+builds a new Catalog and swaps the module-level reference in one assignment.
+"""
+import hashlib
+import threading
+from datetime import datetime
+
+from db import get_db_connection
+
+
+class Catalog:
+    """Immutable snapshot of AMC names, per-AMC scheme lists and name -> code map"""
+
+    def __init__(self, rows, last_modified=None):
+        self.amcs = []
+        self.schemes_by_amc = {}
+        self.code_by_name = {}
+        digest = hashlib.sha1()
+
+        for scheme_code, scheme_name, amc_name in rows:
+            if amc_name not in self.schemes_by_amc:
+                self.amcs.append(amc_name)
+                self.schemes_by_amc[amc_name] = []
+            self.schemes_by_amc[amc_name].append(scheme_name)
+            self.code_by_name[scheme_name] = scheme_code
+            digest.update(f"{scheme_code}|{scheme_name}|{amc_name}\n".encode())
+
+        self.etag = digest.hexdigest()[:16]
+        self.last_modified = last_modified or datetime.now()
+        self.built_at = datetime.now()
+
+
+_catalog = None
+_build_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "builds": 0}
+
+
+def build_catalog():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT scheme_code, scheme_name, amc_name FROM mutual_funds")
+        rows = cursor.fetchall()
+        cursor.execute("SELECT MAX(last_updated) FROM mutual_funds")
+        last_modified = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.close()
+    return Catalog(rows, last_modified)
+
+
+def refresh_catalog():
+    """Build a fresh snapshot and atomically replace the current one"""
+    global _catalog
+    with _build_lock:
+        catalog = build_catalog()
+        _catalog = catalog
+        _stats["builds"] += 1
+    print(f"Catalog rebuilt: {len(catalog.amcs)} AMCs, {len(catalog.code_by_name)} schemes")
+    return catalog
+
+
+def get_catalog():
+    catalog = _catalog
+    if catalog is not None:
+        _stats["hits"] += 1
+        return catalog
+    _stats["misses"] += 1
+    return refresh_catalog()
+
+
+def catalog_stats():
+    catalog = _catalog
+    return dict(
+        _stats,
+        built_at=catalog.built_at.isoformat() if catalog else None,
+        etag=catalog.etag if catalog else None,
+    )
@@ -0,0 +1,320 @@
+"""Data-quality checks for the daily NAVAll.txt batch.
+
+validate_batch() checks the whole parsed batch against each scheme's previous
+NAV (the current `mutual_funds` row) in one vectorized pass:
+
+    parse_error   NAV or date text did not parse ("N.A.", "-", blank ...)
+    non_positive  NAV <= 0
+    return_outlier
+                  |z| > Z_THRESHOLD, where z is the return since the previous
+                  NAV scaled by the scheme's own daily mean / volatility from
+                  scheme_metric_state (FALLBACK_DAILY_STD for schemes without
+                  enough history) and the number of business days in between
+
+Suspect rows go to `nav_quarantine` and are not written to `historical_nav`,
+so neither metrics mode ever sees them; `mutual_funds` keeps the previous NAV
+and date for those schemes, so the next day is again checked against the last
+good value. A quarantined row that turns out to be genuine can be released
+into the history with `python data_quality.py --release <id> ...`.
+"""
+import argparse
+import os
+import traceback
+from collections import Counter, namedtuple
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+
+from db import get_db_connection, is_missing_table
+from events import DATA_UPDATED, publish
+import nav_store
+import scheme_summary
+
+Z_THRESHOLD = float(os.environ.get("MF_NAV_Z_THRESHOLD", "10"))
+
+# Daily return volatility floor, so near-constant liquid/overnight NAVs are not flagged on rounding
+MIN_DAILY_STD = 0.002
+FALLBACK_DAILY_STD = 0.02
+MIN_STATS_OBSERVATIONS = 60
+
+# Records per vectorized pass when validate_stream() checks a streamed batch
+STREAM_BATCH = 5000
+
+PARSE_ERROR = "parse_error"
+NON_POSITIVE = "non_positive"
+RETURN_OUTLIER = "return_outlier"
+
+INSERT_QUARANTINE_SQL = """
+    INSERT INTO nav_quarantine
+    (scheme_code, nav_date, nav_value, raw_value, previous_nav, previous_date,
+     zscore, reason, status, detected_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'quarantined', %s)
+"""
+
+UPSERT_HISTORY_SQL = """
+    INSERT INTO historical_nav
+    (scheme_code, nav_date, nav_value)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE nav_value = VALUES(nav_value)
+"""
+
+# Previous NAV / date and daily return statistics, arrays aligned on sorted scheme codes
+Reference = namedtuple('Reference', ['codes', 'navs', 'dates', 'timestamps', 'mean', 'std'])
+
+# records: what goes into mutual_funds; skip_history: scheme codes kept out of historical_nav
+QualityReport = namedtuple('QualityReport', ['records', 'skip_history', 'quarantine', 'counts'])
+
+
+def create_quarantine_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS nav_quarantine (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            scheme_code INT NOT NULL,
+            nav_date DATE,
+            nav_value DOUBLE,
+            raw_value VARCHAR(255),
+            previous_nav DOUBLE,
+            previous_date DATE,
+            zscore DOUBLE,
+            reason VARCHAR(32) NOT NULL,
+            status VARCHAR(16) NOT NULL,
+            detected_at DATETIME NOT NULL
+        )
+    """)
+
+
+def ensure_quarantine_table():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        create_quarantine_table(cursor)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def build_reference(nav_rows, stat_rows=()):
+    """Reference from (scheme_code, nav, last_updated) and (scheme_code, n, sum_r, sum_r2) rows"""
+    nav_rows = sorted(nav_rows, key=lambda row: int(row[0]))
+    codes = np.array([int(row[0]) for row in nav_rows], dtype=np.int64)
+    navs = np.array([float(row[1]) if row[1] is not None else np.nan for row in nav_rows])
+    timestamps = [row[2] for row in nav_rows]
+    dates = np.array([ts.date() if isinstance(ts, datetime) else ts for ts in timestamps], dtype='datetime64[D]')
+
+    mean = np.zeros(len(codes))
+    std = np.full(len(codes), FALLBACK_DAILY_STD)
+    stat_rows = [row for row in stat_rows if row[1] and row[1] >= MIN_STATS_OBSERVATIONS]
+    if stat_rows and len(codes):
+        stat_codes = np.array([int(row[0]) for row in stat_rows], dtype=np.int64)
+        n, sum_r, sum_r2 = (np.array([float(row[i]) for row in stat_rows]) for i in (1, 2, 3))
+        idx = np.minimum(np.searchsorted(codes, stat_codes), len(codes) - 1)
+        found = codes[idx] == stat_codes
+        scheme_mean = sum_r / n
+        scheme_std = np.sqrt(np.maximum(sum_r2 / n - scheme_mean ** 2, 0.0) * n / np.maximum(n - 1, 1))
+        mean[idx[found]] = scheme_mean[found]
+        std[idx[found]] = scheme_std[found]
+    return Reference(codes, navs, dates, timestamps, mean, np.maximum(std, MIN_DAILY_STD))
+
+
+def load_reference(cursor):
+    """Previous NAVs from the live mutual_funds table, volatility from the metrics running sums"""
+    from metrics_state import create_state_table
+    cursor.execute("SELECT scheme_code, net_asset_value, last_updated FROM mutual_funds")
+    nav_rows = cursor.fetchall()
+    create_state_table(cursor)
+    cursor.execute("SELECT scheme_code, n, sum_r, sum_r2 FROM scheme_metric_state")
+    return build_reference(nav_rows, cursor.fetchall())
+
+
+def validate_batch(records, reference, rejects=()):
+    """Split one day's AmfiRecords into what is stored and what is quarantined.
+
+    `rejects` are the parser's (record, raw_value, reason) rows. Quarantined
+    schemes with a previous NAV are kept in mutual_funds at that NAV and date;
+    all of them are left out of historical_nav.
+    """
+    if not len(reference.codes):
+        # First load: nothing to compare against, only the per-row checks apply
+        reference = build_reference([(-1, None, None)])
+    count = len(records)
+    codes = np.fromiter((int(r.scheme_code) for r in records), np.int64, count)
+    navs = np.fromiter((r.net_asset_value for r in records), float, count)
+    dates = np.array([r.nav_date.date() for r in records], dtype='datetime64[D]')
+
+    idx = np.minimum(np.searchsorted(reference.codes, codes), len(reference.codes) - 1)
+    found = reference.codes[idx] == codes
+    previous_nav = np.where(found, reference.navs[idx], np.nan)
+    previous_date = reference.dates[idx]
+    with np.errstate(invalid='ignore'):
+        comparable = found & (previous_nav > 0) & (previous_date < dates)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gap = np.maximum(np.busday_count(np.where(comparable, previous_date, dates), dates), 1)
+        returns = navs / previous_nav - 1
+        mean, std = reference.mean[idx], reference.std[idx]
+        z = (returns - mean * gap) / (std * np.sqrt(gap))
+
+    non_positive = navs <= 0
+    outlier = comparable & ~non_positive & (np.abs(z) > Z_THRESHOLD)
+    suspect = non_positive | outlier
+
+    detected_at = datetime.now()
+    records = list(records)
+    skip_history = set()
+    quarantine = []
+    counts = Counter()
+    for i in np.flatnonzero(suspect).tolist():
+        record = records[i]
+        reason = NON_POSITIVE if non_positive[i] else RETURN_OUTLIER
+        counts[reason] += 1
+        skip_history.add(record.scheme_code)
+        quarantine.append((
+            int(codes[i]), record.nav_date.date(), float(navs[i]), None,
+            float(previous_nav[i]) if found[i] else None,
+            previous_date[i].astype(object) if found[i] else None,
+            round(float(z[i]), 4) if comparable[i] else None,
+            reason, detected_at,
+        ))
+        if found[i] and previous_nav[i] > 0:
+            records[i] = record._replace(net_asset_value=float(previous_nav[i]),
+                                         nav_date=reference.timestamps[idx[i]])
+
+    for record, raw_value, reason in rejects:
+        code = int(record.scheme_code)
+        counts[reason] += 1
+        skip_history.add(record.scheme_code)
+        quarantine.append((
+            code, record.nav_date.date() if record.nav_date else None, record.net_asset_value,
+            raw_value[:255], None, None, None, reason, detected_at,
+        ))
+        # Keep the scheme listed at its last good NAV instead of dropping it from the catalog
+        j = min(int(np.searchsorted(reference.codes, code)), len(reference.codes) - 1)
+        if reference.codes[j] == code and reference.navs[j] > 0:
+            records.append(record._replace(net_asset_value=float(reference.navs[j]),
+                                           nav_date=reference.timestamps[j]))
+
+    return QualityReport(records, skip_history, quarantine, dict(counts))
+
+
+def validate_stream(records, reference, rejects, batch_size=STREAM_BATCH):
+    """validate_batch() over an iterable of records, STREAM_BATCH at a time, as it is consumed.
+
+    Returns (records to store, report). The records are a generator, so the
+    parsed file is never held whole; `report` (records=None) fills in as it
+    is consumed and holds every code of a batch in skip_history before that
+    batch's first record is yielded. `rejects` is the parser's growing list:
+    rejects added since the previous batch are validated with it.
+    """
+    report = QualityReport(None, set(), [], Counter())
+
+    def validated():
+        iterator = iter(records)
+        seen = 0
+        while True:
+            batch = list(islice(iterator, batch_size))
+            new_rejects = rejects[seen:]
+            seen += len(new_rejects)
+            if not batch and not new_rejects:
+                return
+            result = validate_batch(batch, reference, new_rejects)
+            report.skip_history.update(result.skip_history)
+            report.quarantine.extend(result.quarantine)
+            report.counts.update(result.counts)
+            yield from result.records
+
+    return validated(), report
+
+
+def store_quarantine(cursor, rows):
+    create_quarantine_table(cursor)
+    if rows:
+        cursor.executemany(INSERT_QUARANTINE_SQL, rows)
+
+
+def recent_quarantine(limit=50):
+    """Latest quarantined rows, newest first (for /admin/quarantine)"""
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT id, scheme_code, nav_date, nav_value, raw_value, previous_nav, previous_date,
+                   zscore, reason, status, detected_at
+            FROM nav_quarantine ORDER BY id DESC LIMIT %s
+        """, (int(limit),))
+        rows = cursor.fetchall()
+    except Exception as e:
+        # Created by the worker / migrate_indexes.py; before that nothing has been quarantined
+        if not is_missing_table(e):
+            raise
+        rows = []
+    finally:
+        cursor.close()
+        conn.close()
+
+    for row in rows:
+        for key in ('nav_date', 'previous_date', 'detected_at'):
+            if row[key] is not None:
+                row[key] = row[key].isoformat(sep=' ', timespec='seconds') if isinstance(row[key], datetime) \
+                    else row[key].isoformat()
+    return rows
+
+
+def release(ids):
+    """Move quarantined NAVs into historical_nav (their schemes' metrics state is rebuilt).
+
+    The derived summary table and NAV store are refreshed like after an
+    ingest, so the released NAVs are visible to every reader.
+    """
+    from metrics_state import invalidate_metric_state
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        create_quarantine_table(cursor)
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"""
+            SELECT id, scheme_code, nav_date, nav_value FROM nav_quarantine
+            WHERE id IN ({placeholders}) AND status = 'quarantined'
+              AND nav_date IS NOT NULL AND nav_value IS NOT NULL
+        """, tuple(ids))
+        rows = cursor.fetchall()
+        if rows:
+            cursor.executemany(UPSERT_HISTORY_SQL, [(code, nav_date, nav) for _, code, nav_date, nav in rows])
+            cursor.executemany("UPDATE nav_quarantine SET status = 'released' WHERE id = %s",
+                               [(row[0],) for row in rows])
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    if rows:
+        invalidate_metric_state(sorted({row[1] for row in rows}))
+        scheme_summary.refresh()
+        nav_store.rebuild()
+        publish(DATA_UPDATED)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or release quarantined NAV rows")
+    parser.add_argument("--release", type=int, nargs="+", metavar="ID", help="quarantine ids to release")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.release:
+        # Recorded in job_runs so web processes notice the new history and refresh their caches;
+        # under the pipeline lock so released rows never land mid-ingest
+        from jobs import exclusive_run
+        with exclusive_run("quarantine_release") as run:
+            try:
+                released = release(args.release)
+                run.finish("success")
+            except Exception:
+                run.finish("failed", error=traceback.format_exc())
+                raise
+        print(f"Released {released} rows into historical_nav")
+    else:
+        for row in recent_quarantine(args.limit):
+            print(f"{row['id']:>6} {row['scheme_code']:>8} {row['nav_date'] or '-':<10} "
+                  f"{row['reason']:<15} {row['status']:<11} nav={row['nav_value']} prev={row['previous_nav']} "
+                  f"z={row['zscore']} {row['raw_value'] or ''}")
@@ -1,124 +1,285 @@
 import requests
-import re
+import time
+from collections import namedtuple
 from datetime import datetime
-import mysql.connector
+from itertools import islice
+from db import get_db_connection, create_staging_table, swap_tables
+from events import DATA_UPDATED, publish
+import nav_store
+import scheme_summary
+from data_quality import PARSE_ERROR, NON_POSITIVE, load_reference, validate_stream, store_quarantine
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="kakabapa12",
-        database="mf_database"
-    )
+AMFI_URL = "https://www.amfiindia.com/spages/NAVAll.txt"
+
+# Rows per executemany round trip
+BATCH_SIZE = 1000
+
+STAGING_TABLE = "mutual_funds_staging"
+
+INSERT_FUND_SQL = """
+    INSERT INTO {table}
+    (scheme_code, isin_growth, isin_div_reinvestment,
+     scheme_name, net_asset_value, amc_name, last_updated)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+UPSERT_HISTORY_SQL = """
+    INSERT INTO historical_nav
+    (scheme_code, nav_date, nav_value)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE nav_value = VALUES(nav_value)
+"""
+
+# Field order matches INSERT_FUND_SQL, so records are passed to executemany as-is
+AmfiRecord = namedtuple('AmfiRecord', [
+    'scheme_code', 'isin_growth', 'isin_div_reinvestment', 'scheme_name',
+    'net_asset_value', 'amc_name', 'nav_date',
+])
+
+# NAVAll.txt section lines; anything else without a ';' is an AMC name
+AMC_PREFIX = 'Mutual Fund Name:'
+CATEGORY_PREFIXES = ('Open Ended Schemes', 'Close Ended Schemes', 'Interval Fund Schemes')
+
+NAV_DATE_FORMAT = '%d-%b-%Y'
 
 def fetch_amfi_data():
-    url = "https://www.amfiindia.com/spages/NAVAll.txt"
+    """Stream NAVAll.txt from AMFI; returns an iterator of decoded lines"""
     try:
-        response = requests.get(url, timeout=10)
+        response = requests.get(AMFI_URL, timeout=10, stream=True)
         response.raise_for_status()
-        return response.text
+        response.encoding = response.encoding or 'utf-8'
+        return response.iter_lines(decode_unicode=True)
     except Exception as e:
         print(f"Error fetching AMFI data: {e}")
         return None
 
-def parse_amfi_data(raw_data):
-    schemes = []
-    current_amc = None
-    
-    for line in raw_data.split('\n'):
-        amc_match = re.match(r'Mutual Fund Name:\s*(.+)', line)
-        if amc_match:
-            current_amc = amc_match.group(1).strip()
-            continue
-        
-        if not line or ';' not in line or current_amc is None:
-            continue
-        
-        parts = line.split(';')
-        if len(parts) >= 6:
-            scheme = {
-                'scheme_code': parts[0].strip(),
-                'scheme_name': parts[1].strip(),
-                'isin_growth': parts[2].strip() if parts[2].strip() else None,
-                'isin_div_reinvestment': parts[3].strip() if parts[3].strip() else None,
-                'net_asset_value': float(parts[4].strip()),
-                'amc_name': current_amc,
-                'date': parts[5].strip() if len(parts) > 5 else datetime.now().strftime('%d-%b-%Y')
-            }
-            schemes.append(scheme)
-    return schemes
-
-def update_database():
+class AmfiParser:
+    """Streaming NAVAll.txt parser.
+
+    NAVAll.txt is a flat sequence of sections: a scheme category line
+    ("Open Ended Schemes(...)"), an AMC name line, then ';'-separated scheme
+    rows (Scheme Code;ISIN Growth;ISIN Div Reinvestment;Scheme Name;NAV;Date).
+    parse() walks it once, classifying lines with str.startswith, and yields an
+    AmfiRecord per valid row. Nearly every row shares the same date, so parsed
+    dates are cached by their text. Rows whose NAV is not a number ("N.A.",
+    "-", blank, NaN or negative) or whose date does not parse are counted in
+    `rejected`, kept in `rejects` as (record, raw "nav;date" text, reason) for
+    the quarantine and skipped; a 0.0 NAV (written-off segregated portfolios)
+    is passed on to data_quality.validate_stream().
+    """
+    __slots__ = ('current_amc', 'rows', 'rejected', 'rejects', '_dates')
+
+    def __init__(self):
+        self.current_amc = None
+        self.rows = 0
+        self.rejected = 0
+        self.rejects = []
+        self._dates = {}
+
+    def parse_date(self, text):
+        """NAVAll.txt date text -> datetime (None if it does not parse), cached per distinct string"""
+        try:
+            return self._dates[text]
+        except KeyError:
+            pass
+        try:
+            as_of = datetime.strptime(text, NAV_DATE_FORMAT)
+        except ValueError:
+            as_of = None
+        self._dates[text] = as_of
+        return as_of
+
+    def parse(self, lines):
+        """Yield AmfiRecords from the raw text or any iterable of lines"""
+        if isinstance(lines, str):
+            lines = lines.split('\n')
+
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+
+            if ';' not in line:
+                if line.startswith(AMC_PREFIX):
+                    self.current_amc = line[len(AMC_PREFIX):].strip()
+                elif not line.startswith(CATEGORY_PREFIXES):
+                    self.current_amc = line
+                continue
+
+            parts = line.split(';')
+            # Skips the column header row and anything before the first AMC line
+            if len(parts) < 6 or self.current_amc is None or not parts[0].isdigit():
+                continue
+
+            self.rows += 1
+            try:
+                nav = float(parts[4])
+            except ValueError:
+                nav = None
+            as_of = self.parse_date(parts[5].strip())
+            record = AmfiRecord(
+                parts[0],
+                parts[1].strip() or None,
+                parts[2].strip() or None,
+                parts[3].strip(),
+                nav,
+                self.current_amc,
+                as_of,
+            )
+            if nav is None or not nav >= 0 or as_of is None:
+                self.rejected += 1
+                reason = NON_POSITIVE if nav is not None and nav < 0 and as_of is not None else PARSE_ERROR
+                self.rejects.append((record._replace(net_asset_value=nav if nav == nav else None),
+                                     f"{parts[4]};{parts[5]}", reason))
+                continue
+
+            yield record
+
+def parse_amfi_data(lines):
+    """Parse NAVAll.txt content line by line, yielding one AmfiRecord per scheme.
+
+    Accepts either the raw text or any iterable of lines, so the HTTP response
+    can be consumed without holding it in memory.
+    """
+    return AmfiParser().parse(lines)
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def ingest_schemes(conn, schemes, batch_size=BATCH_SIZE, skip_history=frozenset()):
+    """Bulk-load parsed schemes into a staging copy of mutual_funds and swap it in.
+
+    Rows are written with batched executemany calls into `mutual_funds_staging`
+    and `historical_nav` (except for scheme codes in `skip_history`, i.e.
+    quarantined NAVs); the staging table then replaces `mutual_funds` with an
+    atomic rename so readers never see an empty table. Returns the number of
+    schemes loaded (0 means nothing was swapped).
+    """
+    cursor = conn.cursor()
+    try:
+        create_staging_table(cursor, 'mutual_funds', STAGING_TABLE)
+        insert_fund_sql = INSERT_FUND_SQL.format(table=STAGING_TABLE)
+
+        total = 0
+        for batch in _batched(schemes, batch_size):
+            fund_rows = []
+            history_rows = []
+            for scheme in batch:
+                fund_rows.append(scheme)
+                if scheme.scheme_code not in skip_history:
+                    history_rows.append((scheme.scheme_code, scheme.nav_date.date(), scheme.net_asset_value))
+
+            cursor.executemany(insert_fund_sql, fund_rows)
+            if history_rows:
+                cursor.executemany(UPSERT_HISTORY_SQL, history_rows)
+            total += len(batch)
+
+        if total == 0:
+            conn.rollback()
+            cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+            return 0
+
+        conn.commit()
+        swap_tables(cursor, 'mutual_funds', STAGING_TABLE)
+        conn.commit()
+        return total
+    finally:
+        cursor.close()
+
+def _timed(iterable, timings, stage):
+    """Yield from `iterable`, adding the time spent waiting on it to timings[stage]"""
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timings[stage] += time.perf_counter() - started
+            return
+        timings[stage] += time.perf_counter() - started
+        yield item
+
+def update_database(timings=None):
+    """Fetch NAVAll.txt, validate the batch and ingest it.
+
+    Fetching, parsing, validation and the staging inserts are streamed
+    together: data_quality.validate_stream() checks the parsed records a batch
+    at a time on their way into ingest_schemes(), and suspect rows are
+    quarantined. If a `timings` dict is passed it receives the seconds spent
+    in each ('fetch', 'parse', 'validate', 'ingest').
+    """
     print(f"\nStarting data update at {datetime.now()}")
-    
-    raw_data = fetch_amfi_data()
-    if not raw_data:
-        return False
-    
-    schemes = parse_amfi_data(raw_data)
-    if not schemes:
-        print("No valid scheme data found")
-        return False
-    
+    spent = {'fetch': 0.0, 'parse': 0.0, 'validate': 0.0, 'ingest': 0.0}
+
     conn = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        
+
         # Check if we already updated today
         cursor.execute("SELECT DATE(MAX(last_updated)) FROM mutual_funds LIMIT 1")
         last_update_date = cursor.fetchone()[0]
-        
+        cursor.close()
+
         current_date = datetime.now().date()
         if last_update_date and last_update_date == current_date:
             print("Data already updated today")
             return True
-            
-        # Update data
-        cursor.execute("TRUNCATE TABLE mutual_funds")
-        
-        for scheme in schemes:
-            # Current NAV
-            cursor.execute("""
-                INSERT INTO mutual_funds 
-                (scheme_code, isin_growth, isin_div_reinvestment, 
-                 scheme_name, net_asset_value, amc_name, last_updated)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                scheme['scheme_code'],
-                scheme['isin_growth'],
-                scheme['isin_div_reinvestment'],
-                scheme['scheme_name'],
-                scheme['net_asset_value'],
-                scheme['amc_name'],
-                datetime.strptime(scheme['date'], '%d-%b-%Y') if scheme.get('date') else datetime.now()
-            ))
-            
-            # Historical NAV
-            cursor.execute("""
-                INSERT INTO historical_nav 
-                (scheme_code, nav_date, nav_value)
-                VALUES (%s, %s, %s)
-                ON DUPLICATE KEY UPDATE nav_value = VALUES(nav_value)
-            """, (
-                scheme['scheme_code'],
-                datetime.strptime(scheme['date'], '%d-%b-%Y').date() if scheme.get('date') else datetime.now().date(),
-                scheme['net_asset_value']
-            ))
-        
-        conn.commit()
-        print(f"Successfully updated {len(schemes)} schemes")
+
+        started = time.perf_counter()
+        lines = fetch_amfi_data()
+        spent['fetch'] += time.perf_counter() - started
+        if lines is None:
+            return False
+
+        started = time.perf_counter()
+        cursor = conn.cursor()
+        reference = load_reference(cursor)
+        cursor.close()
+        reference_time = time.perf_counter() - started
+
+        # Each wrapper's time includes the stages it pulls from; split them afterwards
+        parser = AmfiParser()
+        fetch_before = spent['fetch']
+        parsed = _timed(parser.parse(_timed(lines, spent, 'fetch')), spent, 'parse')
+        records, report = validate_stream(parsed, reference, parser.rejects)
+
+        started = time.perf_counter()
+        count = ingest_schemes(conn, _timed(records, spent, 'validate'), skip_history=report.skip_history)
+        if count:
+            cursor = conn.cursor()
+            store_quarantine(cursor, report.quarantine)
+            conn.commit()
+            cursor.close()
+        spent['ingest'] = time.perf_counter() - started - spent['validate']
+        spent['validate'] += reference_time - spent['parse']
+        spent['parse'] -= spent['fetch'] - fetch_before
+        if not count:
+            print("No valid scheme data found")
+            return False
+
+        print(f"Successfully updated {count} schemes ({len(report.quarantine)} rows quarantined: "
+              f"{dict(report.counts)})")
+        scheme_summary.refresh()
+        nav_store.rebuild()
+        publish(DATA_UPDATED)
         return True
-        
+
     except Exception as e:
         print(f"Database error: {e}")
         if conn:
             conn.rollback()
         return False
     finally:
+        if timings is not None:
+            timings.update(spent)
         if conn and conn.is_connected():
-            cursor.close()
             conn.close()
 
 if __name__ == "__main__":
-    update_database()
\ No newline at end of file
+    update_database()
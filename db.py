@@ -0,0 +1,455 @@
+"""Shared database access: a bounded connection pool for MySQL or SQLite.
+
+Every module gets connections from `get_db_connection()`. Calling `close()` on
+the returned connection hands it back to the pool instead of tearing down the
+TCP session. Set MF_DB_BACKEND=sqlite (and MF_SQLITE_PATH) to run against a
+local SQLite file instead of MySQL; queries keep the MySQL `%s` placeholder
+style and are translated on the fly.
+"""
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from instrumentation import QUERY_LATENCY
+
+DB_BACKEND = os.environ.get("MF_DB_BACKEND", "mysql")
+
+DB_CONFIG = {
+    "host": os.environ.get("MF_DB_HOST", "localhost"),
+    "user": os.environ.get("MF_DB_USER", "root"),
+    "password": os.environ.get("MF_DB_PASSWORD", "kakabapa12"),
+    "database": os.environ.get("MF_DB_NAME", "mf_database"),
+    "connection_timeout": int(os.environ.get("MF_DB_CONNECT_TIMEOUT", "10")),
+}
+
+SQLITE_PATH = os.environ.get("MF_SQLITE_PATH", "mf_database.sqlite3")
+
+POOL_SIZE = int(os.environ.get("MF_DB_POOL_SIZE", "5"))
+POOL_TIMEOUT = float(os.environ.get("MF_DB_POOL_TIMEOUT", "10"))
+
+# Hot read queries used by the web app; executed through prepared cursors on MySQL
+QUERIES = {
+    "last_update": "SELECT MAX(last_updated) AS last_update FROM mutual_funds",
+    "scheme_summary": "SELECT * FROM scheme_summary WHERE scheme_code = %s",
+    "nifty_recent": """
+        SELECT date, close
+        FROM nifty50_data
+        ORDER BY date DESC
+        LIMIT 30
+    """,
+}
+
+# Schema for the SQLite stand-in (mirrors the MySQL tables)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mutual_funds (
+    scheme_code INTEGER PRIMARY KEY,
+    isin_growth TEXT,
+    isin_div_reinvestment TEXT,
+    scheme_name TEXT,
+    net_asset_value DECIMAL(15, 4),
+    amc_name TEXT,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS historical_nav (
+    scheme_code INTEGER NOT NULL,
+    nav_date DATE NOT NULL,
+    nav_value DECIMAL(15, 4),
+    PRIMARY KEY (scheme_code, nav_date)
+);
+CREATE TABLE IF NOT EXISTS nifty50_data (
+    date DATE PRIMARY KEY,
+    close DECIMAL(10, 2),
+    open DECIMAL(10, 2),
+    high DECIMAL(10, 2),
+    low DECIMAL(10, 2),
+    volume BIGINT
+);
+CREATE TABLE IF NOT EXISTS scheme_metrics (
+    scheme_code INTEGER PRIMARY KEY,
+    alpha DOUBLE,
+    beta DOUBLE,
+    sharpe_ratio DOUBLE,
+    sortino_ratio DOUBLE,
+    std_dev DOUBLE,
+    calculated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS scheme_summary (
+    scheme_code INTEGER PRIMARY KEY,
+    scheme_name TEXT,
+    amc_name TEXT,
+    isin_growth TEXT,
+    isin_div_reinvestment TEXT,
+    net_asset_value DECIMAL(15, 4),
+    last_updated TIMESTAMP,
+    alpha DOUBLE,
+    beta DOUBLE,
+    sharpe_ratio DOUBLE,
+    sortino_ratio DOUBLE,
+    std_dev DOUBLE,
+    metrics_calculated_on TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_mutual_funds_amc_name ON mutual_funds (amc_name);
+CREATE INDEX IF NOT EXISTS idx_mutual_funds_scheme_name ON mutual_funds (scheme_name);
+"""
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the pool timeout"""
+
+
+def _translate_sql(sql):
+    """Rewrite MySQL-flavoured SQL for SQLite"""
+    sql = sql.replace("%s", "?")
+    sql = re.sub(r"ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET", sql, flags=re.I)
+    sql = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sql)
+    sql = re.sub(r"^\s*TRUNCATE TABLE", "DELETE FROM", sql, flags=re.I)
+    sql = re.sub(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY", "INTEGER PRIMARY KEY AUTOINCREMENT", sql, flags=re.I)
+    return sql
+
+
+_ISO_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}( \d{2}:\d{2}:\d{2}(\.\d+)?)?$")
+
+
+def _parse_sqlite_value(value):
+    """Expression columns (MAX(date), DATE(...)) lose their declared type in SQLite"""
+    if isinstance(value, str) and _ISO_DATETIME.match(value):
+        if len(value) == 10:
+            return date.fromisoformat(value)
+        return datetime.fromisoformat(value)
+    return value
+
+
+class _Cursor:
+    """Cursor adapter: SQL translation for SQLite and dict rows for prepared cursors"""
+
+    def __init__(self, cursor, dictionary=False, translate=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+        self._translate = translate
+
+    def execute(self, sql, params=()):
+        if self._translate:
+            sql = _translate_sql(sql)
+        self._cursor.execute(sql, tuple(params or ()))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        if self._translate:
+            sql = _translate_sql(sql)
+        self._cursor.executemany(sql, seq_of_params)
+        return self
+
+    def _convert(self, row):
+        if row is None:
+            return row
+        if self._translate:
+            row = tuple(_parse_sqlite_value(value) for value in row)
+        if not self._dictionary:
+            return row
+        columns = [col[0] for col in self._cursor.description]
+        return dict(zip(columns, row))
+
+    def fetchone(self):
+        return self._convert(self._cursor.fetchone())
+
+    def fetchmany(self, size=1000):
+        return [self._convert(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._convert(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class PooledConnection:
+    """Connection handle whose close() returns the connection to its pool"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._closed = False
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def cursor(self, dictionary=False, prepared=False):
+        if self._pool.backend == "sqlite":
+            return _Cursor(self._raw.cursor(), dictionary=dictionary, translate=True)
+        if prepared:
+            return _Cursor(self._raw.cursor(prepared=True), dictionary=dictionary)
+        return self._raw.cursor(dictionary=dictionary)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def is_connected(self):
+        return not self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool.release(self._raw)
+
+    def __del__(self):
+        # Safety net for handlers that raise before closing their connection
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Bounded pool: at most `size` live connections, callers wait up to `timeout`"""
+
+    def __init__(self, backend=DB_BACKEND, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.backend = backend
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._acquired = 0
+
+    def _connect(self):
+        if self.backend == "sqlite":
+            conn = sqlite3.connect(
+                SQLITE_PATH,
+                timeout=self.timeout,
+                check_same_thread=False,
+                detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            )
+            conn.executescript(SQLITE_SCHEMA)
+            return conn
+        import mysql.connector
+        return mysql.connector.connect(**DB_CONFIG)
+
+    def _alive(self, raw):
+        if self.backend == "sqlite":
+            return True
+        try:
+            raw.ping(reconnect=True, attempts=1)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        raw = None
+        with self._lock:
+            if self._idle.empty() and self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        else:
+            try:
+                raw = self._idle.get_nowait()
+            except queue.Empty:
+                started = time.perf_counter()
+                try:
+                    raw = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolTimeout(f"No database connection free after {self.timeout}s")
+                finally:
+                    with self._lock:
+                        self._waits += 1
+                        self._wait_time += time.perf_counter() - started
+            if not self._alive(raw):
+                # Drop the dead connection; if the replacement fails too, give its slot back
+                self._discard(raw)
+                try:
+                    raw = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        try:
+            raw.rollback()
+        except Exception:
+            pass
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(raw)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "wait_time": round(self._wait_time, 6),
+            }
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        while True:
+            try:
+                raw = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(raw)
+            with self._lock:
+                self._created -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def configure_pool(backend=None, size=None, timeout=None, sqlite_path=None):
+    """Replace the process-wide pool (used by scripts, benchmarks and the SQLite stand-in)"""
+    global _pool, DB_BACKEND, SQLITE_PATH
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        if backend:
+            DB_BACKEND = backend
+        if sqlite_path:
+            SQLITE_PATH = sqlite_path
+        _pool = ConnectionPool(
+            backend=DB_BACKEND,
+            size=size or POOL_SIZE,
+            timeout=timeout or POOL_TIMEOUT,
+        )
+    return _pool
+
+
+def get_db_connection():
+    return get_pool().acquire()
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+def run_query(name, params=(), dictionary=True, fetch="all"):
+    """Execute one of the named hot QUERIES on a pooled, prepared cursor (timed per query name)"""
+    started = time.perf_counter()
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=dictionary, prepared=True)
+    try:
+        cursor.execute(QUERIES[name], params)
+        return cursor.fetchone() if fetch == "one" else cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+        QUERY_LATENCY.observe(time.perf_counter() - started, name)
+
+
+def is_missing_table(error):
+    """True for the driver's "table doesn't exist" error (MySQL 1146, SQLite "no such table")"""
+    return getattr(error, "errno", None) == 1146 or "no such table" in str(error)
+
+
+def create_staging_table(cursor, table, staging):
+    """(Re)create an empty copy of `table` named `staging`"""
+    cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+    if get_pool().backend == "sqlite":
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+        ddl = cursor.fetchone()[0]
+        # After a rename SQLite stores the name quoted ("table")
+        ddl = re.sub(rf"(TABLE\s+(IF NOT EXISTS\s+)?)[\"`]?{table}\b[\"`]?", rf"\g<1>{staging}", ddl, count=1)
+        cursor.execute(ddl)
+    else:
+        cursor.execute(f"CREATE TABLE {staging} LIKE {table}")
+
+
+def swap_tables(cursor, table, staging):
+    """Atomically replace `table` with `staging` and drop the old copy"""
+    old = f"{table}_old"
+    cursor.execute(f"DROP TABLE IF EXISTS {old}")
+    if get_pool().backend == "sqlite":
+        # SQLite DDL is transactional; indexes go with the dropped table, so recreate them
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+            (table,),
+        )
+        index_ddl = [row[0] for row in cursor.fetchall()]
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {old}")
+        cursor.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+        cursor.execute(f"DROP TABLE {old}")
+        for ddl in index_ddl:
+            cursor.execute(ddl)
+        cursor.execute("COMMIT")
+    else:
+        cursor.execute(f"RENAME TABLE {table} TO {old}, {staging} TO {table}")
+        cursor.execute(f"DROP TABLE {old}")
+
+
+# SQLite hands back TIMESTAMP / DATE columns as datetime objects only when
+# the converters are registered; keep parity with mysql.connector types.
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()[:10]))
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=" "))
+sqlite3.register_adapter(Decimal, float)
@@ -0,0 +1,23 @@
+"""Minimal in-process publish/subscribe used to invalidate caches after data changes"""
+from collections import defaultdict
+
+# Published by data_updater.update_database() after a successful commit
+DATA_UPDATED = "data_updated"
+
+# Published after calculate_and_store_metrics() has written scheme_metrics
+METRICS_UPDATED = "metrics_updated"
+
+_listeners = defaultdict(list)
+
+
+def subscribe(event, callback):
+    if callback not in _listeners[event]:
+        _listeners[event].append(callback)
+
+
+def publish(event):
+    for callback in list(_listeners[event]):
+        try:
+            callback()
+        except Exception as e:
+            print(f"Error in {event} listener {callback.__name__}: {e}")
@@ -0,0 +1,320 @@
+"""Scheme vs. Nifty 50 history for charting.
+
+Serves aligned NAV / Nifty series for a date range from a single join (or the
+memory-mapped NAV store when enabled) together with the scheme's own benchmark
+from benchmark_map (its last close on or before each date), downsamples long
+ranges with Largest-Triangle-Three-Buckets so the browser never gets thousands
+of points, and keeps recent responses in an LRU that is cleared by the daily
+update.
+Named ranges (1M ... 5Y) count back from the scheme's latest NAV.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from db import get_db_connection
+import benchmark_map
+import nav_store
+
+RANGES = {
+    '1M': 30,
+    '3M': 91,
+    '6M': 182,
+    '1Y': 365,
+    '3Y': 3 * 365,
+    '5Y': 5 * 365,
+    'max': None,
+}
+DEFAULT_RANGE = '1M'
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 2000
+
+CACHE_SIZE = 512
+
+LATEST_NAV_SQL = "SELECT MAX(nav_date) FROM historical_nav WHERE scheme_code = %s"
+
+def parse_range(range_key=None, start=None, end=None):
+    """Resolve request parameters into (start_date, end_date, days).
+
+    Explicit start/end dates win; otherwise `days` is the length of the named
+    range, counted back from the scheme's latest NAV (None for 'max').
+    """
+    if start or end:
+        start_date = datetime.strptime(start, '%Y-%m-%d').date() if start else None
+        end_date = datetime.strptime(end, '%Y-%m-%d').date() if end else None
+        if start_date and end_date and start_date > end_date:
+            raise ValueError("start must not be after end")
+        return start_date, end_date, None
+
+    range_key = range_key or DEFAULT_RANGE
+    if range_key not in RANGES:
+        raise ValueError(f"range must be one of {', '.join(RANGES)}")
+    return None, None, RANGES[range_key]
+
+def lttb(x, y, threshold):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling"""
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = length - 1
+
+    # Interior points split into threshold - 2 buckets
+    edges = np.linspace(1, length - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_start, next_stop = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else length)
+        next_stop = max(next_stop, next_start + 1)
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        keep[i + 1] = a
+    return keep
+
+_nifty_closes = None
+_nifty_lock = threading.Lock()
+_index_closes = {}
+
+def _nifty_series():
+    """All Nifty closes as (datetime64[D] array, float array), loaded once per data version"""
+    global _nifty_closes
+    with _nifty_lock:
+        if _nifty_closes is None:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT date, close FROM nifty50_data ORDER BY date ASC")
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+                conn.close()
+            _nifty_closes = (
+                np.array([row[0] for row in rows], dtype='datetime64[D]'),
+                np.array([float(row[1]) for row in rows], dtype=float),
+            )
+        return _nifty_closes
+
+def _index_series(index_name):
+    """(datetime64[D] array, float array) of an index_prices benchmark, loaded once per data version"""
+    with _nifty_lock:
+        series = _index_closes.get(index_name)
+    if series is None:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT date, close FROM index_prices WHERE index_name = %s ORDER BY date ASC",
+                           (index_name,))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        series = (
+            np.array([row[0] for row in rows], dtype='datetime64[D]'),
+            np.array([float(row[1]) for row in rows], dtype=float),
+        )
+        with _nifty_lock:
+            _index_closes[index_name] = series
+    return series
+
+def benchmark_closes(scheme_code, dates, closes):
+    """(benchmark name, closes aligned to `dates`) for the scheme's mapped benchmark.
+
+    Nifty 50 schemes reuse the aligned Nifty closes; other benchmarks carry
+    their last close on or before each date (NaN before the series starts).
+    """
+    index_name = benchmark_map.scheme_benchmark(scheme_code)
+    if index_name == benchmark_map.DEFAULT_BENCHMARK:
+        return index_name, closes
+    index_dates, index_closes = _index_series(index_name)
+    idx = np.searchsorted(index_dates, dates, side='right') - 1
+    aligned = np.where(idx >= 0, index_closes[np.maximum(idx, 0)], np.nan) if len(index_dates) \
+        else np.full(len(dates), np.nan)
+    return index_name, aligned
+
+def latest_nav_date(scheme_code):
+    """Most recent NAV date for a scheme, or None"""
+    store = nav_store.get_nav_store()
+    if store is not None:
+        nav_dates, _ = store.series(scheme_code)
+        return nav_dates[-1].astype(date) if len(nav_dates) else None
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(LATEST_NAV_SQL, (scheme_code,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+    return row[0] if row else None
+
+def aligned_history_query(scheme_code, start=None, end=None):
+    """(sql, params) joining a scheme's NAVs to Nifty closes over [start, end]"""
+    conditions = ["h.scheme_code = %s", "h.nav_value IS NOT NULL"]
+    params = [scheme_code]
+    if start:
+        conditions.append("h.nav_date >= %s")
+        params.append(start)
+    if end:
+        conditions.append("h.nav_date <= %s")
+        params.append(end)
+    return f"""
+        SELECT h.nav_date, h.nav_value, n.close
+        FROM historical_nav h
+        JOIN nifty50_data n ON n.date = h.nav_date
+        WHERE {' AND '.join(conditions)}
+        ORDER BY h.nav_date ASC
+    """, params
+
+def aligned_arrays(rows):
+    """(nav_date, nav_value, close) rows -> (dates, navs, closes) arrays"""
+    return (
+        np.array([row[0] for row in rows], dtype='datetime64[D]'),
+        np.array([float(row[1]) for row in rows], dtype=float),
+        np.array([float(row[2]) for row in rows], dtype=float),
+    )
+
+def load_aligned_history(scheme_code, start=None, end=None):
+    """(dates, navs, closes) for dates on which both the scheme and Nifty have a value"""
+    store = nav_store.get_nav_store()
+    if store is not None:
+        nav_dates, navs = store.series(scheme_code)
+        keep = ~np.isnan(navs)
+        if start:
+            keep &= nav_dates >= np.datetime64(start, 'D')
+        if end:
+            keep &= nav_dates <= np.datetime64(end, 'D')
+        nav_dates, navs = nav_dates[keep], navs[keep]
+        nifty_dates, closes = _nifty_series()
+        common, nav_idx, nifty_idx = np.intersect1d(nav_dates, nifty_dates,
+                                                    assume_unique=True, return_indices=True)
+        return common, navs[nav_idx], closes[nifty_idx]
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(*aligned_history_query(scheme_code, start, end))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return aligned_arrays(rows)
+
+def history_payload(dates, navs, closes, points=DEFAULT_POINTS, benchmark=None):
+    """JSON-ready payload; series are newest-first like the original endpoint.
+
+    `benchmark` is a (name, closes aligned to `dates`) pair from benchmark_closes().
+    """
+    index_name, index_closes = benchmark or (benchmark_map.DEFAULT_BENCHMARK, closes)
+    total = len(dates)
+    if total > points:
+        keep = lttb(dates.astype(np.int64), navs, points)
+        dates, navs, closes, index_closes = dates[keep], navs[keep], closes[keep], index_closes[keep]
+
+    labels = np.datetime_as_string(dates[::-1], unit='D').tolist()
+    nifty50 = [{'date': d, 'close': v} for d, v in zip(labels, closes[::-1].tolist())]
+    if index_closes is closes:
+        series = nifty50
+    else:
+        series = [{'date': d, 'close': None if v != v else v} for d, v in zip(labels, index_closes[::-1].tolist())]
+    return {
+        'scheme': [{'date': d, 'nav': v} for d, v in zip(labels, navs[::-1].tolist())],
+        'nifty50': nifty50,
+        'benchmark': {'index': index_name, 'series': series},
+        'total_points': total,
+        'returned_points': len(labels),
+    }
+
+def build_history(scheme_code, start=None, end=None, points=DEFAULT_POINTS):
+    dates, navs, closes = load_aligned_history(scheme_code, start, end)
+    return history_payload(dates, navs, closes, points, benchmark_closes(scheme_code, dates, closes))
+
+class LRUCache:
+    """Small thread-safe LRU with hit/miss counters"""
+
+    def __init__(self, capacity=CACHE_SIZE):
+        self.capacity = capacity
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "capacity": self.capacity,
+                    "hits": self.hits, "misses": self.misses}
+
+_cache = LRUCache()
+
+def parse_request(scheme_code, range_key=None, start=None, end=None, points=None):
+    """(cache key, start_date, end_date, days, points) for the request parameters"""
+    points = min(max(int(points or DEFAULT_POINTS), 3), MAX_POINTS)
+    start_date, end_date, days = parse_range(range_key, start, end)
+    range_key = None if (start or end) else (range_key or DEFAULT_RANGE)
+    return (str(scheme_code), range_key, start_date, end_date, points), start_date, end_date, days, points
+
+def cached(key):
+    """Cached payload for a parse_request() key, or None"""
+    return _cache.get(key)
+
+def remember(key, payload):
+    """Label a freshly built payload with its range and cache it"""
+    payload['range'] = key[1] or 'custom'
+    _cache.put(key, payload)
+    return payload
+
+def get_history(scheme_code, range_key=None, start=None, end=None, points=None):
+    """Cached history lookup keyed by (scheme, range, start, end, points)"""
+    key, start_date, end_date, days, points = parse_request(scheme_code, range_key, start, end, points)
+
+    payload = cached(key)
+    if payload is None:
+        if days:
+            latest = latest_nav_date(scheme_code)
+            start_date = latest - timedelta(days=days) if latest else None
+        payload = remember(key, build_history(scheme_code, start_date, end_date, points))
+    return payload
+
+def invalidate():
+    """Drop cached responses and the benchmark series after new data is loaded"""
+    global _nifty_closes
+    with _nifty_lock:
+        _nifty_closes = None
+        _index_closes.clear()
+    _cache.clear()
+
+def cache_stats():
+    return _cache.stats()
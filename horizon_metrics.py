@@ -0,0 +1,278 @@
+"""Trailing 1Y/3Y/5Y metrics and rolling 252-day beta/Sharpe series.
+
+Horizons are computed in a single backwards pass over the aligned return
+matrix from calculate_metrics, each scheme against its benchmark_map benchmark:
+the last 5 years of the benchmark's trading days are split
+at the 1Y and 3Y boundaries, running sums are taken once per segment and then
+accumulated, so each longer horizon reuses the shorter one's sums instead of
+re-reading its window. Rolling series use prefix (cumulative) sums, making
+every window an O(1) difference.
+
+/get_metrics reads the scheme's NAVs through returns.get_series (NAV store or
+one indexed query, LRU-cached) and keeps each scheme's rolling series and each
+benchmark's returns in LRUs cleared by the daily update.
+"""
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from db import get_db_connection, is_missing_table
+import benchmark_map
+from history import LRUCache
+from returns import get_series
+from calculate_metrics import (
+    MIN_OBSERVATIONS, METRIC_COLUMNS,
+    load_index_returns, load_benchmark_returns, load_nav_history, nav_returns, iter_return_blocks,
+    sufficient_stats_matrix, metrics_from_stats,
+)
+
+# Trailing windows in benchmark trading days
+HORIZONS = {'1Y': 252, '3Y': 756, '5Y': 1260}
+
+# Fraction of a window a scheme must have returns for to get that horizon
+MIN_COVERAGE = 0.8
+
+ROLLING_WINDOW = 252
+
+_benchmark_cache = LRUCache(capacity=32)
+_rolling_cache = LRUCache(capacity=2048)
+
+UPSERT_HORIZON_SQL = """
+    INSERT INTO scheme_metrics_horizon
+        (scheme_code, horizon, alpha, beta, sharpe_ratio, sortino_ratio, std_dev, observations)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        alpha=VALUES(alpha),
+        beta=VALUES(beta),
+        sharpe_ratio=VALUES(sharpe_ratio),
+        sortino_ratio=VALUES(sortino_ratio),
+        std_dev=VALUES(std_dev),
+        observations=VALUES(observations),
+        calculated_on=CURRENT_TIMESTAMP
+"""
+
+def create_horizon_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scheme_metrics_horizon (
+            scheme_code INT NOT NULL,
+            horizon VARCHAR(4) NOT NULL,
+            alpha DOUBLE,
+            beta DOUBLE,
+            sharpe_ratio DOUBLE,
+            sortino_ratio DOUBLE,
+            std_dev DOUBLE,
+            observations INT,
+            calculated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (scheme_code, horizon)
+        )
+    """)
+
+def horizon_metrics_matrix(scheme_matrix, market_returns, horizons=HORIZONS):
+    """Metrics for each trailing window over every column of a (dates x schemes) matrix.
+
+    Returns {horizon: metrics dict of arrays}. Windows are trailing row counts
+    ending at the last row; schemes below the coverage threshold get NaN.
+    """
+    total_rows = len(market_returns)
+    windows = sorted(horizons.items(), key=lambda item: item[1])
+
+    results = {}
+    accumulated = None
+    segment_end = total_rows
+    for horizon, window in windows:
+        segment_start = max(total_rows - window, 0)
+        segment = sufficient_stats_matrix(scheme_matrix[segment_start:segment_end],
+                                          market_returns[segment_start:segment_end])
+        if accumulated is None:
+            accumulated = segment
+        else:
+            accumulated = {key: accumulated[key] + segment[key] for key in accumulated}
+        segment_end = segment_start
+
+        metrics = metrics_from_stats(accumulated)
+        required = max(MIN_OBSERVATIONS, MIN_COVERAGE * min(window, total_rows))
+        insufficient = metrics['observations'] < required
+        results[horizon] = {
+            key: (np.where(insufficient, np.nan, value) if key != 'observations' else value)
+            for key, value in metrics.items()
+        }
+    return results
+
+def rolling_metrics(scheme_returns, market_returns, window=ROLLING_WINDOW):
+    """Rolling beta and Sharpe over aligned 1-D return arrays using prefix sums.
+
+    Element i covers observations (i - window, i]; the first window - 1
+    entries are NaN.
+    """
+    r = np.asarray(scheme_returns, dtype=float)
+    m = np.asarray(market_returns, dtype=float)
+    beta = np.full(len(r), np.nan)
+    sharpe = np.full(len(r), np.nan)
+    if len(r) < window:
+        return beta, sharpe
+
+    def windowed(values):
+        prefix = np.concatenate(([0.0], np.cumsum(values)))
+        return prefix[window:] - prefix[:-window]
+
+    stats = {
+        'n': np.full(len(r) - window + 1, window),
+        'sum_r': windowed(r),
+        'sum_r2': windowed(r * r),
+        'sum_m': windowed(m),
+        'sum_m2': windowed(m * m),
+        'sum_rm': windowed(r * m),
+        'n_down': windowed(r < 0),
+        'sum_d': windowed(np.where(r < 0, r, 0.0)),
+        'sum_d2': windowed(np.where(r < 0, r * r, 0.0)),
+    }
+    metrics = metrics_from_stats(stats)
+    beta[window - 1:] = metrics['beta']
+    sharpe[window - 1:] = metrics['sharpe_ratio']
+    return beta, sharpe
+
+def calculate_and_store_horizon_metrics():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    create_horizon_table(cursor)
+
+    cursor.execute("SELECT DISTINCT scheme_code FROM mutual_funds")
+    scheme_codes = [row[0] for row in cursor.fetchall()]
+    groups = benchmark_map.group_codes(benchmark_map.load_assignment(cursor), scheme_codes)
+    longest = max(HORIZONS.values())
+    benchmark_returns = {name: returns.iloc[-longest:]
+                         for name, returns in load_benchmark_returns(cursor, groups).items() if not returns.empty}
+    if not benchmark_returns:
+        print("No benchmark data - horizon metrics skipped")
+        cursor.close()
+        conn.close()
+        return
+
+    # A small margin before the window gives each scheme a base NAV for its first return
+    since = (min(returns.index.min() for returns in benchmark_returns.values()) - timedelta(days=30)).date()
+    nav_df = load_nav_history(cursor, scheme_codes, since=since)
+    returns_df, _ = nav_returns(nav_df)
+    with_returns = set(returns_df['scheme_code'])
+    codes = [code for code in scheme_codes if code in with_returns]
+
+    blocks = (
+        block
+        for index_name, group in groups.items() if index_name in benchmark_returns
+        for block in iter_return_blocks(returns_df, benchmark_returns[index_name],
+                                        [code for code in group if code in with_returns])
+    )
+    rows = []
+    for chunk, scheme_matrix, market_returns in blocks:
+        for horizon, metrics in horizon_metrics_matrix(scheme_matrix, market_returns).items():
+            values = np.column_stack([metrics[col] for col in METRIC_COLUMNS])
+            for scheme_code, row, observations in zip(chunk, values, metrics['observations']):
+                if np.isnan(row).all():
+                    continue
+                rows.append((scheme_code, horizon) + tuple(
+                    None if np.isnan(value) else float(value) for value in row
+                ) + (int(observations),))
+
+    cursor.execute("DELETE FROM scheme_metrics_horizon")
+    if rows:
+        cursor.executemany(UPSERT_HORIZON_SQL, rows)
+    conn.commit()
+    cursor.close()
+    conn.close()
+    print(f"✅ Horizon metrics stored: {len(rows)} rows for {len(codes)} schemes "
+          f"in {time.perf_counter() - started:.1f}s.")
+
+def _clean(value):
+    return None if value is None or (isinstance(value, float) and np.isnan(value)) else value
+
+def _benchmark_arrays(index_name):
+    """(day numbers, daily returns) of a benchmark, cached until the next data update"""
+    cached = _benchmark_cache.get(index_name)
+    if cached is None:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            market_returns = load_index_returns(cursor, index_name)
+        finally:
+            cursor.close()
+            conn.close()
+        cached = (market_returns.index.to_numpy(dtype='datetime64[D]').astype(np.int64),
+                  market_returns.to_numpy(dtype=float))
+        _benchmark_cache.put(index_name, cached)
+    return cached
+
+def rolling_series(scheme_code, index_name, window=ROLLING_WINDOW):
+    """Rolling beta/Sharpe of one scheme against `index_name` on their common dates (JSON-ready, cached)"""
+    key = (scheme_code, index_name, window)
+    rolling = _rolling_cache.get(key)
+    if rolling is not None:
+        return rolling
+
+    rolling = {'window': window, 'dates': [], 'beta': [], 'sharpe': []}
+    series = get_series(scheme_code)
+    if len(series) > 1:
+        market_days, market_returns = _benchmark_arrays(index_name)
+        scheme_returns = series.navs[1:] / series.navs[:-1] - 1
+        days, scheme_index, market_index = np.intersect1d(
+            series.days[1:], market_days, assume_unique=True, return_indices=True)
+        beta, sharpe = rolling_metrics(scheme_returns[scheme_index], market_returns[market_index], window)
+        valid = ~np.isnan(beta)
+        rolling['dates'] = np.datetime_as_string(days[valid].astype('datetime64[D]')).tolist()
+        rolling['beta'] = [_clean(float(v)) for v in beta[valid]]
+        rolling['sharpe'] = [_clean(float(v)) for v in sharpe[valid]]
+    _rolling_cache.put(key, rolling)
+    return rolling
+
+def get_scheme_horizon_metrics(scheme_code, window=ROLLING_WINDOW):
+    """Horizon metrics plus rolling beta/Sharpe series for one scheme (JSON-ready)"""
+    try:
+        code = int(scheme_code)
+    except ValueError:
+        raise ValueError(f"Invalid scheme code: {scheme_code!r}")
+    index_name = benchmark_map.scheme_benchmark(code)
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("""
+                SELECT horizon, alpha, beta, sharpe_ratio, sortino_ratio, std_dev, observations
+                FROM scheme_metrics_horizon WHERE scheme_code = %s
+            """, (code,))
+            horizons = {row.pop('horizon'): row for row in cursor.fetchall()}
+        except Exception as e:
+            # The worker creates the table on its first horizon run
+            if not is_missing_table(e):
+                raise
+            horizons = {}
+
+        cursor.execute("""
+            SELECT alpha, beta, sharpe_ratio, sortino_ratio, std_dev
+            FROM scheme_metrics WHERE scheme_code = %s
+        """, (code,))
+        all_history = cursor.fetchone()
+        if all_history:
+            horizons['ALL'] = all_history
+    finally:
+        cursor.close()
+        conn.close()
+
+    return {
+        'scheme_code': scheme_code,
+        'benchmark': index_name,
+        'horizons': {
+            name: {key: _clean(float(value)) if value is not None else None for key, value in values.items()}
+            for name, values in horizons.items()
+        },
+        'rolling': rolling_series(code, index_name, window),
+    }
+
+def invalidate():
+    _benchmark_cache.clear()
+    _rolling_cache.clear()
+
+def cache_stats():
+    return _rolling_cache.stats()
+
+if __name__ == "__main__":
+    calculate_and_store_horizon_metrics()
@@ -0,0 +1,204 @@
+"""Response compression and HTTP caching.
+
+- Static files are read, fingerprinted (content hash) and pre-compressed
+  (gzip, plus brotli when the optional `brotli` package is installed) once at
+  startup. url_for('static', ...) adds ?v=<hash>; a request carrying the
+  current hash is served with a year-long immutable Cache-Control, anything
+  else must revalidate against the ETag.
+- Other responses (JSON, HTML) above MIN_COMPRESS_SIZE are compressed on the
+  fly for clients that accept it.
+- Data endpoints wrapped in @conditional get a weak ETag derived from the
+  data version (last ingest timestamp + jobs.data_version(), which moves on
+  every successful run whatever order runs finish in) and the request URL,
+  so a revalidation is answered 304 before the view runs.
+  The version is re-read whenever DATA_UPDATED / METRICS_UPDATED fire.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from functools import wraps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from werkzeug.http import parse_accept_header
+
+from db import run_query
+import jobs
+
+MIN_COMPRESS_SIZE = int(os.environ.get("MF_COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/javascript", "text/javascript",
+    "text/html", "text/css", "text/plain", "image/svg+xml",
+}
+
+
+def accepted_encoding(header):
+    """'br', 'gzip' or None, from an Accept-Encoding header value"""
+    accept = parse_accept_header(header)
+    if brotli is not None and accept["br"]:
+        return "br"
+    if accept["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding, static=False):
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if static else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if static else GZIP_LEVEL, mtime=0)
+
+
+class StaticAsset:
+    """One static file: identity bytes, fingerprint and smaller pre-compressed variants"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.body = f.read()
+        self.mtime = os.path.getmtime(path)
+        self.fingerprint = hashlib.sha256(self.body).hexdigest()[:12]
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.encoded = {}
+        if self.mimetype in COMPRESSIBLE_TYPES and len(self.body) >= MIN_COMPRESS_SIZE:
+            for encoding in ("gzip", "br") if brotli is not None else ("gzip",):
+                data = compress(self.body, encoding, static=True)
+                if len(data) < len(self.body):
+                    self.encoded[encoding] = data
+
+
+def load_static_assets(folder):
+    assets = {}
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            assets[os.path.relpath(path, folder).replace(os.sep, "/")] = StaticAsset(path)
+    return assets
+
+
+class DataVersion:
+    """Token and Last-Modified for data responses; cheap to read, re-read after each update"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.token = None
+        self.last_modified = None
+
+    def refresh(self):
+        last_update = run_query("last_update", fetch="one")["last_update"]
+        runs, finished_at = jobs.data_version()
+        with self._lock:
+            self.last_modified = last_update
+            self.token = hashlib.sha1(f"{last_update}|{runs}|{finished_at}".encode()).hexdigest()[:16]
+
+    def current(self):
+        if self.token is None:
+            self.refresh()
+        return self.token, self.last_modified
+
+
+data_version = DataVersion()
+
+
+def refresh_data_version():
+    """DATA_UPDATED / METRICS_UPDATED listener (errors are reported, not raised)"""
+    try:
+        data_version.refresh()
+    except Exception as e:
+        print(f"Data version refresh failed: {e}")
+
+
+def data_etag(full_path):
+    """(weak ETag value, Last-Modified) for a data URL ('/path?query') at the current data version"""
+    token, last_modified = data_version.current()
+    return hashlib.sha1(f"{token}|{full_path}".encode()).hexdigest()[:20], last_modified
+
+
+def conditional(view):
+    """Weak-ETag a data view by (data version, URL) and answer matching revalidations with 304"""
+    from flask import request, make_response
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag, last_modified = data_etag(request.full_path)
+        if request.if_none_match.contains_weak(etag):
+            response = make_response("", 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
+
+    return wrapper
+
+
+def init_app(app):
+    """Serve fingerprinted, pre-compressed static files and compress dynamic responses"""
+    from flask import request, send_from_directory
+
+    assets = load_static_assets(app.static_folder)
+    app.extensions["static_assets"] = assets
+
+    @app.url_defaults
+    def _fingerprint_static(endpoint, values):
+        if endpoint == "static" and "v" not in values:
+            asset = assets.get(values.get("filename"))
+            if asset is not None:
+                values["v"] = asset.fingerprint
+
+    def serve_static(filename):
+        asset = assets.get(filename)
+        if asset is None:
+            # Added after startup: plain file serving until the next restart
+            return send_from_directory(app.static_folder, filename)
+        encoding = accepted_encoding(request.headers.get("Accept-Encoding"))
+        body = asset.encoded.get(encoding)
+        response = app.response_class(body if body is not None else asset.body, mimetype=asset.mimetype)
+        if body is not None:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        response.set_etag(asset.fingerprint + (f"-{encoding}" if body is not None else ""))
+        response.last_modified = asset.mtime
+        if request.args.get("v") == asset.fingerprint:
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    app.view_functions["static"] = serve_static
+
+    @app.after_request
+    def _compress(response):
+        if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES
+                or "no-transform" in response.headers.get("Cache-Control", "")):
+            return response
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = accepted_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The compressed body is a different representation of the same resource
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,190 @@
+"""Request, query and pipeline-stage instrumentation exposed in Prometheus text format.
+
+Latency histograms are kept in process (one per route and per named hot
+query) and rendered by /metrics together with the values of registered
+collectors - callables returning gauge samples that are read at scrape time,
+such as pool usage or the stage timings the worker stored in job_runs.
+
+StageTimer splits a long function into named stages for a `timings` dict,
+the convention update_database() already uses.
+
+With MF_PROFILING=1 a request carrying `?_profile=1` is sampled by a
+SamplingProfiler and answered with its folded stacks (flamegraph.pl /
+speedscope input) instead of the normal body.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+PROFILING_ENABLED = os.environ.get("MF_PROFILING", "0") == "1"
+PROFILE_INTERVAL = float(os.environ.get("MF_PROFILE_INTERVAL", "0.005"))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help, labelnames, buckets):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, counts[:], total, count) for labels, (counts, total, count) in self._series.items())
+        for labels, counts, total, count in series:
+            pairs = list(zip(self.labelnames, labels))
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts + [count]):
+                lines.append(f"{self.name}_bucket{_labels(pairs + [('le', _number(bound))])} {bucket_count}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {count}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "mf_http_request_duration_seconds", "Flask request latency by route",
+    ("route", "method", "status"), REQUEST_BUCKETS)
+QUERY_LATENCY = Histogram(
+    "mf_db_query_duration_seconds", "Named hot query latency (db.run_query), including pool wait",
+    ("query",), QUERY_BUCKETS)
+
+_histograms = [REQUEST_LATENCY, QUERY_LATENCY]
+_collectors = []
+
+
+def register_collector(collector):
+    """`collector()` returns [(name, help, [(labels dict, value), ...]), ...] gauges, read on every scrape"""
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def render():
+    """All metrics in Prometheus text exposition format"""
+    lines = []
+    for histogram in _histograms:
+        lines.extend(histogram.render())
+    for collector in _collectors:
+        try:
+            families = collector()
+        except Exception as e:
+            lines.append(f"# collector {collector.__name__} failed: {_escape(e)}")
+            continue
+        for name, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                if value is not None:
+                    lines.append(f"{name}{_labels(sorted(labels.items()))} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Adds the seconds since the previous lap to timings[stage]"""
+
+    def __init__(self, timings=None):
+        self.timings = {} if timings is None else timings
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + now - self._last
+        self._last = now
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def init_app(app):
+    """Time every request by route and enable the per-request profiler hook"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.instrumentation_started = time.perf_counter()
+        if PROFILING_ENABLED and request.args.get("_profile") == "1":
+            g.profiler = SamplingProfiler(threading.get_ident()).start()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("instrumentation_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        REQUEST_LATENCY.observe(elapsed, route, request.method, str(response.status_code))
+
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+        profiler.stop()
+        header = f"# {request.method} {request.full_path} -> {response.status_code} in {elapsed * 1000:.1f}ms, " \
+                 f"{profiler.samples} samples every {profiler.interval * 1000:g}ms\n"
+        return app.response_class(header + profiler.folded(), mimetype="text/plain")
@@ -0,0 +1,285 @@
+"""Pipeline run bookkeeping shared by the worker and the web app.
+
+The worker records every pipeline run in `job_runs` (status, start/finish and
+a per-stage duration map) and holds a pipeline lock while it runs, so only one
+instance ingests at a time however many workers or hosts are started: MySQL's
+GET_LOCK on the MySQL backend, an fcntl file lock otherwise. CLIs that write
+the same tables (metrics, backfill, snapshot import, quarantine release,
+benchmark overrides) take the same lock through exclusive_run(). Web processes
+only read `job_runs` (no DDL on their request paths: the table is created by
+the worker, migrate_indexes.py and the first JobRun, and readers treat a
+missing table as no runs); DataVersionPoller lets them notice a finished run
+and fire DATA_UPDATED listeners in their own process.
+"""
+import fcntl
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import db
+from db import get_db_connection, is_missing_table
+from events import DATA_UPDATED, publish
+
+PIPELINE_LOCK = "mf_pipeline"
+LOCK_FILE = os.environ.get("MF_WORKER_LOCK_FILE", os.path.join(tempfile.gettempdir(), "mf_pipeline.lock"))
+
+# How often web processes look for a newer successful run (seconds)
+POLL_INTERVAL = float(os.environ.get("MF_DATA_POLL_INTERVAL", "30"))
+
+
+def create_jobs_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            job VARCHAR(64) NOT NULL,
+            status VARCHAR(16) NOT NULL,
+            host VARCHAR(255),
+            pid INT,
+            started_at DATETIME NOT NULL,
+            finished_at DATETIME,
+            duration_seconds DOUBLE,
+            stages TEXT,
+            error TEXT
+        )
+    """)
+
+
+def ensure_jobs_table():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        create_jobs_table(cursor)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class JobRun:
+    """One row in job_runs; stage() times a block and persists the running totals"""
+
+    def __init__(self, job):
+        self.job = job
+        self.stages = {}
+        self.started = time.perf_counter()
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            create_jobs_table(cursor)
+            cursor.execute("""
+                INSERT INTO job_runs (job, status, host, pid, started_at, stages)
+                VALUES (%s, 'running', %s, %s, %s, '{}')
+            """, (job, socket.gethostname(), os.getpid(), datetime.now()))
+            self.id = cursor.lastrowid
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _update(self, sql, params):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def record(self, stage, seconds):
+        self.record_stages({stage: seconds})
+
+    def record_stages(self, timings, prefix=""):
+        """Add a {stage: seconds} dict (e.g. from update_database) in one update"""
+        for stage, seconds in timings.items():
+            key = prefix + stage
+            self.stages[key] = round(self.stages.get(key, 0.0) + seconds, 3)
+        self._update("UPDATE job_runs SET stages = %s WHERE id = %s", (json.dumps(self.stages), self.id))
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def finish(self, status="success", error=None):
+        self._update("""
+            UPDATE job_runs
+            SET status = %s, finished_at = %s, duration_seconds = %s, stages = %s, error = %s
+            WHERE id = %s
+        """, (status, datetime.now(), round(time.perf_counter() - self.started, 3),
+              json.dumps(self.stages), error[:2000] if error else None, self.id))
+
+
+@contextmanager
+def pipeline_lock(name=PIPELINE_LOCK):
+    """Non-blocking exclusive lock; yields True if acquired, False if another instance holds it"""
+    if db.DB_BACKEND == "mysql":
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (name,))
+            acquired = cursor.fetchone()[0] == 1
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (name,))
+                    cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+        return
+
+    with open(LOCK_FILE, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def exclusive_run(job):
+    """JobRun for a CLI that writes the worker's tables, under the pipeline lock.
+
+    Exits instead of waiting when the worker (or another CLI) holds the lock, so
+    a manual run never interleaves its writes with the nightly pipeline.
+    """
+    with pipeline_lock() as acquired:
+        if not acquired:
+            raise SystemExit(f"{job}: the pipeline is running in another process - try again when it finishes")
+        yield JobRun(job)
+
+
+def recent_runs(limit=20):
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT id, job, status, host, pid, started_at, finished_at, duration_seconds, stages, error
+            FROM job_runs ORDER BY id DESC LIMIT %s
+        """, (int(limit),))
+        runs = cursor.fetchall()
+    except Exception as e:
+        if not is_missing_table(e):
+            raise
+        runs = []
+    finally:
+        cursor.close()
+        conn.close()
+
+    for run in runs:
+        run['stages'] = json.loads(run['stages']) if run['stages'] else {}
+        for key in ('started_at', 'finished_at'):
+            if isinstance(run[key], datetime):
+                run[key] = run[key].isoformat(sep=' ', timespec='seconds')
+    return runs
+
+
+def latest_finished_runs():
+    """Most recent finished run of each job"""
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT r.job, r.status, r.finished_at, r.duration_seconds, r.stages
+            FROM job_runs r
+            JOIN (SELECT job, MAX(id) AS id FROM job_runs WHERE finished_at IS NOT NULL GROUP BY job) l
+              ON l.id = r.id
+        """)
+        return cursor.fetchall()
+    except Exception as e:
+        if not is_missing_table(e):
+            raise
+        return []
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def pipeline_metrics():
+    """Gauges for /metrics from the last finished run of each job (the runs happen in the worker)"""
+    durations, stages, success, finished = [], [], [], []
+    for run in latest_finished_runs():
+        job = {"job": run['job']}
+        durations.append((job, run['duration_seconds']))
+        success.append((job, 1 if run['status'] == 'success' else 0))
+        if isinstance(run['finished_at'], datetime):
+            finished.append((job, round(run['finished_at'].timestamp(), 3)))
+        for stage, seconds in (json.loads(run['stages']) if run['stages'] else {}).items():
+            stages.append(({"job": run['job'], "stage": stage}, seconds))
+    return [
+        ("mf_pipeline_last_run_duration_seconds", "Duration of the last finished run", durations),
+        ("mf_pipeline_last_run_stage_seconds", "Per-stage duration of the last finished run", stages),
+        ("mf_pipeline_last_run_success", "1 if the last finished run succeeded", success),
+        ("mf_pipeline_last_run_finished_timestamp_seconds", "When the last run finished (Unix time)", finished),
+    ]
+
+
+def data_version():
+    """(successful runs, last success finish time): changes whenever any run succeeds.
+
+    Ordered by finish, not by id: a short run (e.g. benchmark_map.py --set) can
+    start after the nightly pipeline and finish first, and MAX(id) would then
+    hide the pipeline's later success. The count moves on every success even
+    when two finish within the same second.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*), MAX(finished_at) FROM job_runs WHERE status = 'success'")
+        row = cursor.fetchone()
+    except Exception as e:
+        if not is_missing_table(e):
+            raise
+        row = None
+    finally:
+        cursor.close()
+        conn.close()
+    return tuple(row) if row else (0, None)
+
+
+class DataVersionPoller:
+    """Publishes DATA_UPDATED in this process when a newer successful run appears.
+
+    check() is cheap to call on every request: it queries at most once per
+    `interval` seconds and never waits on another thread's query.
+    """
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.version = None
+        self._seen = False
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def check(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.interval or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            version = data_version()
+            if self._seen and version != self.version:
+                print(f"Pipeline run finished at {version[1]} - refreshing caches")
+                # Rebuild in the background so the request that noticed it is not held up
+                threading.Thread(target=publish, args=(DATA_UPDATED,), daemon=True).start()
+            self.version = version
+            self._seen = True
+        except Exception as e:
+            print(f"Data version check failed: {e}")
+        finally:
+            self._lock.release()
@@ -1,16 +1,11 @@
 import pandas as pd
-import mysql.connector
+from db import get_db_connection
 
 # Load dataset
 df = pd.read_csv("cleaned_dataset.csv")
 
 # Connect to MySQL
-conn = mysql.connector.connect(
-    host="localhost",
-    user="root",
-    password="kakabapa12",
-    database="mf_database"
-)
+conn = get_db_connection()
 cursor = conn.cursor()
 
 # Insert data into MySQL
@@ -1,20 +1,46 @@
+import argparse
+import time
 import pandas as pd
-import mysql.connector
+from db import get_db_connection
 from datetime import datetime
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="kakabapa12",
-        database="mf_database"
-    )
+CSV_PATH = "Nifty 50 Historical Data.csv"
+
+# Benchmark stored in the legacy nifty50_data table (used by the metrics and charts)
+NIFTY_50 = "NIFTY 50"
+
+# Rows per executemany round trip
+BATCH_SIZE = 1000
+
+PRICE_COLUMNS = ['close', 'open', 'high', 'low', 'volume']
+
+UPSERT_NIFTY50_SQL = """
+    INSERT INTO nifty50_data (date, close, open, high, low, volume)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        close = VALUES(close),
+        open = VALUES(open),
+        high = VALUES(high),
+        low = VALUES(low),
+        volume = VALUES(volume)
+"""
+
+UPSERT_INDEX_PRICES_SQL = """
+    INSERT INTO index_prices (index_name, date, close, open, high, low, volume)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        close = VALUES(close),
+        open = VALUES(open),
+        high = VALUES(high),
+        low = VALUES(low),
+        volume = VALUES(volume)
+"""
 
 def create_nifty50_table():
-    """Create the nifty50_data table if it doesn't exist"""
+    """Create the nifty50_data and index_prices tables if they don't exist"""
     conn = get_db_connection()
     cursor = conn.cursor()
-    
+
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS nifty50_data (
             date DATE PRIMARY KEY,
@@ -25,7 +51,19 @@ def create_nifty50_table():
             volume BIGINT
         )
     """)
-    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS index_prices (
+            index_name VARCHAR(64) NOT NULL,
+            date DATE NOT NULL,
+            close DECIMAL(12, 2),
+            open DECIMAL(12, 2),
+            high DECIMAL(12, 2),
+            low DECIMAL(12, 2),
+            volume BIGINT,
+            PRIMARY KEY (index_name, date)
+        )
+    """)
+
     conn.commit()
     cursor.close()
     conn.close()
@@ -41,92 +79,125 @@ def clean_and_convert_data(df):
         'Low': 'low',
         'Vol.': 'volume'
     })
-    
-    # Convert date column (handle different date formats)
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    
+
+    # Investing.com exports use MM/DD/YYYY; fall back to inference for other formats
+    dates = pd.to_datetime(df['date'], format='%m/%d/%Y', errors='coerce')
+    if dates.isna().all():
+        dates = pd.to_datetime(df['date'], errors='coerce')
+    df['date'] = dates
+
     # Clean and convert numeric columns
     numeric_cols = ['close', 'open', 'high', 'low']
     for col in numeric_cols:
         # Remove commas and convert to float
-        if df[col].dtype == object:
-            df[col] = df[col].str.replace(',', '').astype(float)
-    
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col].str.replace(',', ''), errors='coerce')
+
     # Clean volume column (handle 'K' for thousands and 'M' for millions)
     if 'volume' in df.columns:
         df['volume'] = df['volume'].replace('-', '0')  # Handle missing values
         df['volume'] = df['volume'].astype(str).str.replace(',', '')
-        
+
         # Convert K (thousands) and M (millions) to actual numbers
-        multiplier = df['volume'].str.extract(r'([KM])', expand=False)
-        numbers = pd.to_numeric(df['volume'].str.replace(r'[KM]', ''), errors='coerce')
-        
-        df['volume'] = numbers * multiplier.map({'K': 1e3, 'M': 1e6}).fillna(1)
-        df['volume'] = df['volume'].fillna(0).astype(int)
-    
+        multiplier = df['volume'].str.extract(r'([KMB])', expand=False)
+        numbers = pd.to_numeric(df['volume'].str.replace(r'[KMB]', '', regex=True), errors='coerce')
+
+        df['volume'] = numbers * multiplier.map({'K': 1e3, 'M': 1e6, 'B': 1e9}).fillna(1)
+        df['volume'] = df['volume'].fillna(0).astype('int64')
+
     # Drop rows with missing essential data
     df = df.dropna(subset=['date', 'close'])
-    
-    return df
 
-def load_nifty50_data(csv_path):
-    """Load and process Nifty50 data from CSV to MySQL"""
-    # Read CSV file
+    return df.drop_duplicates(subset='date', keep='first').sort_values('date')
+
+def to_rows(df, index_name=None):
+    """Cleaned frame -> DB parameter tuples (Python scalars, NaN -> None) without iterrows"""
+    columns = [df['date'].dt.date.tolist()]
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            values = df[col].astype(object)
+            columns.append(values.where(df[col].notna(), None).tolist())
+        else:
+            columns.append([None] * len(df))
+    if index_name is not None:
+        columns.insert(0, [index_name] * len(df))
+    return list(zip(*columns))
+
+def latest_loaded_date(cursor, index_name):
+    """Most recent date already stored for this index, or None"""
+    if index_name == NIFTY_50:
+        cursor.execute("SELECT MAX(date) FROM nifty50_data")
+    else:
+        cursor.execute("SELECT MAX(date) FROM index_prices WHERE index_name = %s", (index_name,))
+    return cursor.fetchone()[0]
+
+def load_index_prices(csv_path, index_name=NIFTY_50, incremental=False, batch_size=BATCH_SIZE):
+    """Load one index's price history from CSV with batched executemany upserts.
+
+    Every index goes into index_prices; NIFTY 50 is also written to
+    nifty50_data, the benchmark table the rest of the app reads. With
+    `incremental=True` only dates after the latest stored date are loaded.
+    Returns the number of rows written.
+    """
+    started = time.perf_counter()
     try:
         df = pd.read_csv(csv_path)
     except Exception as e:
         print(f"Error reading CSV file: {e}")
-        return
-    
-    # Clean and convert data
+        return 0
+    read_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
     df = clean_and_convert_data(df)
-    
+    clean_seconds = time.perf_counter() - started
+
     if df.empty:
         print("No valid data found after cleaning")
-        return
-    
-    # Connect to database
+        return 0
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    
-    # Insert data
-    success_count = 0
-    for _, row in df.iterrows():
-        try:
-            cursor.execute("""
-                INSERT INTO nifty50_data (date, close, open, high, low, volume)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE 
-                    close = VALUES(close),
-                    open = VALUES(open),
-                    high = VALUES(high),
-                    low = VALUES(low),
-                    volume = VALUES(volume)
-            """, (
-                row['date'].to_pydatetime().date(),
-                row['close'],
-                row.get('open', None),
-                row.get('high', None),
-                row.get('low', None),
-                row.get('volume', None)
-            ))
-            success_count += 1
-        except Exception as e:
-            print(f"Error inserting data for {row['date']}: {e}")
-    
-    conn.commit()
-    print(f"Successfully loaded {success_count} out of {len(df)} records")
-    
-    cursor.close()
-    conn.close()
+    try:
+        if incremental:
+            latest = latest_loaded_date(cursor, index_name)
+            if latest is not None:
+                df = df[df['date'] > pd.Timestamp(latest)]
+                print(f"Incremental: {len(df)} rows newer than {latest}")
+
+        started = time.perf_counter()
+        index_rows = to_rows(df, index_name)
+        legacy_rows = to_rows(df) if index_name == NIFTY_50 else []
+        for start in range(0, len(index_rows), batch_size):
+            cursor.executemany(UPSERT_INDEX_PRICES_SQL, index_rows[start:start + batch_size])
+            if legacy_rows:
+                cursor.executemany(UPSERT_NIFTY50_SQL, legacy_rows[start:start + batch_size])
+        conn.commit()
+        insert_seconds = time.perf_counter() - started
+    finally:
+        cursor.close()
+        conn.close()
+
+    total = read_seconds + clean_seconds + insert_seconds
+    print(f"Loaded {len(index_rows)} {index_name} rows: read {read_seconds:.2f}s, clean {clean_seconds:.2f}s, "
+          f"insert {insert_seconds:.2f}s ({len(index_rows) / insert_seconds if insert_seconds else 0:,.0f} rows/s), "
+          f"total {total:.2f}s")
+    return len(index_rows)
+
+def load_nifty50_data(csv_path, incremental=False):
+    """Load and process Nifty50 data from CSV to MySQL"""
+    return load_index_prices(csv_path, NIFTY_50, incremental=incremental)
 
 if __name__ == "__main__":
-    # Path to your Nifty50 CSV file
-    CSV_PATH = "Nifty 50 Historical Data.csv"
-    
-    print("Creating nifty50_data table if it doesn't exist...")
+    parser = argparse.ArgumentParser(description="Load benchmark index prices from an Investing.com-style CSV")
+    parser.add_argument("csv_path", nargs="?", default=CSV_PATH)
+    parser.add_argument("--index", default=NIFTY_50, help="index name, e.g. 'NIFTY NEXT 50' (default: NIFTY 50)")
+    parser.add_argument("--incremental", action="store_true", help="only load dates newer than those stored")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    print("Creating nifty50_data / index_prices tables if they don't exist...")
     create_nifty50_table()
-    
-    print(f"Loading data from {CSV_PATH}...")
-    load_nifty50_data(CSV_PATH)
-    print("Data loading completed.")
\ No newline at end of file
+
+    print(f"Loading {args.index} data from {args.csv_path}...")
+    load_index_prices(args.csv_path, args.index, args.incremental, args.batch_size)
+    print("Data loading completed.")
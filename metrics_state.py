@@ -0,0 +1,320 @@
+"""Incremental scheme metrics from running sufficient statistics.
+
+For every scheme `scheme_metric_state` keeps n, Σr, Σr², Σm, Σm², Σr·m and
+the downside sums over its aligned (scheme, benchmark) daily returns, plus the
+last NAV seen. The nightly update then only folds in NAV rows added since the
+previous run - O(1) work per new row - instead of re-reading full histories.
+
+State only advances up to the latest date of the scheme's benchmark: a NAV
+newer than that stays pending until the benchmark close is loaded, so
+incremental and full results stay identical. Schemes whose benchmark changed
+since their state was built (see benchmark_map) are reseeded from full
+history. A full rebuild (calculate_and_store_metrics with mode="full")
+reseeds the table, and check_incremental_consistency() compares the two modes.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from db import get_db_connection
+import benchmark_map
+import scheme_summary
+from events import METRICS_UPDATED, publish
+from instrumentation import StageTimer
+from calculate_metrics import (
+    MIN_OBSERVATIONS, METRIC_COLUMNS, UPSERT_METRICS_SQL,
+    load_benchmark_returns, load_nav_history, nav_returns, iter_return_blocks,
+    sufficient_stats_matrix, metrics_from_stats, compute_grouped_metrics, metrics_to_rows,
+)
+
+STAT_COLUMNS = ['n', 'sum_r', 'sum_r2', 'sum_m', 'sum_m2', 'sum_rm', 'n_down', 'sum_d', 'sum_d2']
+STATE_COLUMNS = ['nav_rows'] + STAT_COLUMNS + ['last_row_date', 'last_valid_nav']
+
+UPSERT_STATE_SQL = """
+    INSERT INTO scheme_metric_state
+        (scheme_code, nav_rows, n, sum_r, sum_r2, sum_m, sum_m2, sum_rm,
+         n_down, sum_d, sum_d2, last_row_date, last_valid_nav)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        nav_rows=VALUES(nav_rows), n=VALUES(n),
+        sum_r=VALUES(sum_r), sum_r2=VALUES(sum_r2),
+        sum_m=VALUES(sum_m), sum_m2=VALUES(sum_m2), sum_rm=VALUES(sum_rm),
+        n_down=VALUES(n_down), sum_d=VALUES(sum_d), sum_d2=VALUES(sum_d2),
+        last_row_date=VALUES(last_row_date), last_valid_nav=VALUES(last_valid_nav)
+"""
+
+def create_state_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scheme_metric_state (
+            scheme_code INT PRIMARY KEY,
+            nav_rows INT NOT NULL,
+            n INT NOT NULL,
+            sum_r DOUBLE NOT NULL,
+            sum_r2 DOUBLE NOT NULL,
+            sum_m DOUBLE NOT NULL,
+            sum_m2 DOUBLE NOT NULL,
+            sum_rm DOUBLE NOT NULL,
+            n_down INT NOT NULL,
+            sum_d DOUBLE NOT NULL,
+            sum_d2 DOUBLE NOT NULL,
+            last_row_date DATE,
+            last_valid_nav DOUBLE
+        )
+    """)
+
+def compute_state(nav_df, nifty_returns, scheme_codes):
+    """Running sums for every scheme from full history (rows up to the last benchmark date)"""
+    if nifty_returns.empty or nav_df.empty:
+        return pd.DataFrame(columns=STATE_COLUMNS)
+
+    cutoff = nifty_returns.index.max()
+    nav_df = nav_df[nav_df['scheme_code'].isin(scheme_codes)].copy()
+    nav_df['nav_date'] = pd.to_datetime(nav_df['nav_date'])
+    nav_df['nav_value'] = nav_df['nav_value'].astype(float)
+    nav_df = nav_df[nav_df['nav_date'] <= cutoff].sort_values(['scheme_code', 'nav_date'])
+
+    grouped = nav_df.groupby('scheme_code')
+    state = pd.DataFrame({
+        'nav_rows': grouped.size(),
+        'last_row_date': grouped['nav_date'].max(),
+    })
+    valid = nav_df[nav_df['nav_value'].notnull() & (nav_df['nav_value'] != 0)]
+    state['last_valid_nav'] = valid.groupby('scheme_code')['nav_value'].last()
+
+    returns_df, _ = nav_returns(nav_df)
+    frames = []
+    for chunk, scheme_matrix, market_returns in iter_return_blocks(returns_df, nifty_returns, list(state.index)):
+        frames.append(pd.DataFrame(sufficient_stats_matrix(scheme_matrix, market_returns),
+                                   index=pd.Index(chunk, name='scheme_code')))
+    if frames:
+        state = state.join(pd.concat(frames))
+    return state[STATE_COLUMNS]
+
+def compute_grouped_state(nav_df, benchmark_returns, groups):
+    """compute_state for each {benchmark: scheme codes} group against its own series"""
+    frames = [compute_state(nav_df, benchmark_returns[index_name], codes) for index_name, codes in groups.items()]
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames) if frames else pd.DataFrame(columns=STATE_COLUMNS)
+
+def load_state(cursor):
+    cursor.execute(f"SELECT scheme_code, {', '.join(STATE_COLUMNS)} FROM scheme_metric_state")
+    return {row[0]: dict(zip(STATE_COLUMNS, row[1:])) for row in cursor.fetchall()}
+
+def _state_rows(state):
+    """Dict-of-dicts state -> parameter tuples for UPSERT_STATE_SQL"""
+    rows = []
+    for scheme_code, s in state.items():
+        last_row_date = s['last_row_date']
+        if hasattr(last_row_date, 'date'):
+            last_row_date = last_row_date.date()
+        last_valid_nav = s['last_valid_nav']
+        if last_valid_nav is not None and np.isnan(last_valid_nav):
+            last_valid_nav = None
+        rows.append((
+            scheme_code, int(s['nav_rows']), int(s['n']),
+            float(s['sum_r']), float(s['sum_r2']), float(s['sum_m']),
+            float(s['sum_m2']), float(s['sum_rm']), int(s['n_down']),
+            float(s['sum_d']), float(s['sum_d2']),
+            last_row_date, last_valid_nav,
+        ))
+    return rows
+
+def store_state(cursor, state, replace=False):
+    """Upsert running sums; `state` is a DataFrame from compute_state() or a dict of dicts"""
+    create_state_table(cursor)
+    if replace:
+        cursor.execute("DELETE FROM scheme_metric_state")
+    if isinstance(state, pd.DataFrame):
+        state = state.to_dict(orient='index')
+    rows = _state_rows(state)
+    if rows:
+        cursor.executemany(UPSERT_STATE_SQL, rows)
+
+def fold_nav(s, nav_date, nav_value, market_returns):
+    """Add one new NAV row to a scheme's running sums (O(1))"""
+    s['nav_rows'] += 1
+    s['last_row_date'] = nav_date
+    if nav_value is None or float(nav_value) == 0:
+        return
+
+    nav = float(nav_value)
+    previous = s['last_valid_nav']
+    s['last_valid_nav'] = nav
+    if previous is None:
+        return
+
+    m = market_returns.get(nav_date)
+    if m is None:
+        return
+
+    r = nav / previous - 1
+    s['n'] += 1
+    s['sum_r'] += r
+    s['sum_r2'] += r * r
+    s['sum_m'] += m
+    s['sum_m2'] += m * m
+    s['sum_rm'] += r * m
+    if r < 0:
+        s['n_down'] += 1
+        s['sum_d'] += r
+        s['sum_d2'] += r * r
+
+def metrics_for_state(state):
+    """Metrics DataFrame (indexed by scheme_code) for schemes with enough history"""
+    if not state:
+        return pd.DataFrame(columns=METRIC_COLUMNS + ['observations'])
+    frame = pd.DataFrame.from_dict(state, orient='index')
+    stats = {col: frame[col].to_numpy(dtype=float) for col in STAT_COLUMNS}
+    metrics = pd.DataFrame(metrics_from_stats(stats), index=frame.index)
+    eligible = (frame['nav_rows'] >= MIN_OBSERVATIONS) & (metrics['observations'] >= MIN_OBSERVATIONS)
+    return metrics[eligible.to_numpy()]
+
+def update_metrics_incremental(timings=None):
+    """Fold NAVs added since the last run into the running sums and refresh metrics.
+
+    `timings`, if given, receives per-stage seconds as in calculate_and_store_metrics.
+    """
+    from calculate_metrics import calculate_and_store_metrics
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    clock = StageTimer(timings)
+
+    create_state_table(cursor)
+    cursor.execute("SELECT COUNT(*) FROM scheme_metric_state")
+    if cursor.fetchone()[0] == 0:
+        cursor.close()
+        conn.close()
+        print("No incremental state yet - running a full rebuild")
+        return calculate_and_store_metrics(mode="full", timings=timings)
+
+    cursor.execute("SELECT DISTINCT scheme_code FROM mutual_funds")
+    scheme_codes = [row[0] for row in cursor.fetchall()]
+    assignment = benchmark_map.load_assignment(cursor)
+    groups = benchmark_map.group_codes(assignment, scheme_codes)
+    benchmark_returns = load_benchmark_returns(cursor, groups)
+    markets = {name: {ts.date(): float(r) for ts, r in returns.items()}
+               for name, returns in benchmark_returns.items()}
+    cutoffs = {name: returns.index.max().date() for name, returns in benchmark_returns.items() if not returns.empty}
+    if not cutoffs:
+        cursor.close()
+        conn.close()
+        print("No benchmark data - incremental metrics skipped")
+        return
+    cutoff = max(cutoffs.values())
+
+    # Running sums taken against a different benchmark than the current one are rebuilt
+    previous = benchmark_map.load_scheme_benchmarks(cursor)
+    state = load_state(cursor)
+    changed = [code for code in state
+               if previous.get(code, benchmark_map.DEFAULT_BENCHMARK) != assignment.get(code, benchmark_map.DEFAULT_BENCHMARK)]
+    if changed:
+        cursor.executemany("DELETE FROM scheme_metric_state WHERE scheme_code = %s", [(code,) for code in changed])
+        for code in changed:
+            del state[code]
+
+    # New rows for schemes that already have state
+    cursor.execute("""
+        SELECT h.scheme_code, h.nav_date, h.nav_value
+        FROM historical_nav h
+        JOIN scheme_metric_state s ON s.scheme_code = h.scheme_code
+        WHERE h.nav_date > s.last_row_date AND h.nav_date <= %s
+        ORDER BY h.scheme_code, h.nav_date
+    """, (cutoff,))
+    new_nav_rows = cursor.fetchall()
+    clock.lap("load")
+    touched = {}
+    new_rows = 0
+    for scheme_code, nav_date, nav_value in new_nav_rows:
+        index_name = assignment.get(scheme_code, benchmark_map.DEFAULT_BENCHMARK)
+        if index_name not in cutoffs or nav_date > cutoffs[index_name]:
+            continue
+        s = state[scheme_code]
+        fold_nav(s, nav_date, nav_value, markets[index_name])
+        touched[scheme_code] = s
+        new_rows += 1
+
+    # Schemes without state (new listings, or invalidated by a backfill) are seeded from full history
+    unseeded = [code for code in scheme_codes if code not in state]
+    if unseeded:
+        nav_df = load_nav_history(cursor, unseeded, where_in=True)
+        unseeded_groups = benchmark_map.group_codes(assignment, unseeded)
+        touched.update(compute_grouped_state(nav_df, benchmark_returns, unseeded_groups).to_dict(orient='index'))
+
+    rows = metrics_to_rows(metrics_for_state(touched))
+    clock.lap("compute")
+    if rows:
+        cursor.executemany(UPSERT_METRICS_SQL, rows)
+    store_state(cursor, touched)
+    benchmark_map.store_scheme_benchmarks(
+        cursor, {code: assignment.get(code, benchmark_map.DEFAULT_BENCHMARK) for code in touched})
+    conn.commit()
+
+    cursor.close()
+    conn.close()
+    clock.lap("store")
+    print(f"\n✅ Incremental metrics: {new_rows} new NAV rows folded, {len(unseeded)} schemes seeded "
+          f"({len(changed)} on a new benchmark), "
+          f"{len(rows)} metrics updated in {time.perf_counter() - started:.1f}s.")
+    scheme_summary.refresh()
+    clock.lap("summary")
+    publish(METRICS_UPDATED)
+
+def invalidate_metric_state(scheme_codes):
+    """Drop running sums for schemes whose history changed retroactively (e.g. a backfill)"""
+    if not scheme_codes:
+        return
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    create_state_table(cursor)
+    cursor.executemany("DELETE FROM scheme_metric_state WHERE scheme_code = %s",
+                       [(code,) for code in scheme_codes])
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def check_incremental_consistency(rtol=1e-6, atol=1e-9):
+    """Compare metrics derived from the stored running sums with a full rebuild"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    create_state_table(cursor)
+    state = load_state(cursor)
+    cursor.execute("SELECT DISTINCT scheme_code FROM mutual_funds")
+    scheme_codes = [row[0] for row in cursor.fetchall()]
+    assignment = benchmark_map.load_assignment(cursor)
+    groups = benchmark_map.group_codes(assignment, scheme_codes)
+    benchmark_returns = load_benchmark_returns(cursor, groups)
+    nav_df = load_nav_history(cursor, scheme_codes)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    # A full rebuild only sees rows the incremental state could have seen
+    cutoff = nav_df['scheme_code'].map({
+        code: benchmark_returns[index_name].index.max() for index_name, codes in groups.items() for code in codes
+    })
+    nav_df = nav_df[pd.to_datetime(nav_df['nav_date']) <= cutoff]
+    full = compute_grouped_metrics(nav_df, benchmark_returns, groups)
+    incremental = metrics_for_state(state)
+
+    mismatches = []
+    for scheme_code in full.index.union(incremental.index):
+        if scheme_code not in full.index or scheme_code not in incremental.index:
+            mismatches.append((scheme_code, 'presence', scheme_code in full.index, scheme_code in incremental.index))
+            continue
+        for metric in METRIC_COLUMNS:
+            expected = full.at[scheme_code, metric]
+            actual = incremental.at[scheme_code, metric]
+            if not np.isclose(expected, actual, rtol=rtol, atol=atol, equal_nan=True):
+                mismatches.append((scheme_code, metric, expected, actual))
+
+    for scheme_code, metric, expected, actual in mismatches[:20]:
+        print(f"  ✘ {scheme_code} {metric}: full={expected} incremental={actual}")
+    if mismatches:
+        print(f"Incremental state inconsistent: {len(mismatches)} mismatches "
+              f"(run a full rebuild: python calculate_metrics.py)")
+        return False
+    print(f"Incremental state consistent with a full rebuild for {len(full)} schemes")
+    return True
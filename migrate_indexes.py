@@ -0,0 +1,93 @@
+"""Add the indexes the hot web queries rely on and build scheme_summary.
+
+    python migrate_indexes.py
+
+Safe to rerun: existing indexes (including a primary key that already covers
+the columns) are detected and skipped. Also creates `job_runs` and
+`nav_quarantine`, which the web processes read but never create.
+
+    mutual_funds (amc_name)               /get_schemes, catalog build
+    mutual_funds (scheme_name)            name lookups
+    historical_nav (scheme_code, nav_date) per-scheme history reads and upserts
+"""
+import db
+from db import get_db_connection
+from data_quality import create_quarantine_table
+from jobs import create_jobs_table
+from scheme_summary import create_summary_table, refresh_scheme_summary
+
+INDEXES = [
+    ("mutual_funds", "idx_mutual_funds_amc_name", ["amc_name"]),
+    ("mutual_funds", "idx_mutual_funds_scheme_name", ["scheme_name"]),
+    ("historical_nav", "idx_historical_nav_scheme_date", ["scheme_code", "nav_date"]),
+]
+
+# Prefix length for TEXT/BLOB columns, which MySQL cannot index whole
+TEXT_PREFIX = 255
+
+
+def existing_indexes(cursor, table):
+    """{index name: [columns in order]} for `table`"""
+    if db.DB_BACKEND == "sqlite":
+        cursor.execute(f"PRAGMA index_list({table})")
+        names = [row[1] for row in cursor.fetchall()]
+        indexes = {}
+        for name in names:
+            cursor.execute(f"PRAGMA index_info({name})")
+            indexes[name] = [row[2] for row in sorted(cursor.fetchall())]
+        return indexes
+
+    cursor.execute("""
+        SELECT index_name, column_name
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        ORDER BY index_name, seq_in_index
+    """, (table,))
+    indexes = {}
+    for name, column in cursor.fetchall():
+        indexes.setdefault(name, []).append(column)
+    return indexes
+
+
+def column_definition(cursor, table, column):
+    """Column reference for CREATE INDEX, with a prefix length for MySQL TEXT columns"""
+    if db.DB_BACKEND == "sqlite":
+        return column
+    cursor.execute("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    row = cursor.fetchone()
+    if row and row[0].lower() in ("text", "mediumtext", "longtext", "blob"):
+        return f"{column}({TEXT_PREFIX})"
+    return column
+
+
+def migrate():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        for table, name, columns in INDEXES:
+            covered = [index for index, index_columns in existing_indexes(cursor, table).items()
+                       if index_columns[:len(columns)] == columns]
+            if covered:
+                print(f"  {table} ({', '.join(columns)}): already covered by {covered[0]}")
+                continue
+            definition = ", ".join(column_definition(cursor, table, column) for column in columns)
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({definition})")
+            print(f"  {table} ({', '.join(columns)}): created {name}")
+        create_summary_table(cursor)
+        create_jobs_table(cursor)
+        create_quarantine_table(cursor)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    refresh_scheme_summary()
+
+
+if __name__ == "__main__":
+    print("Adding hot-query indexes...")
+    migrate()
+    print("Migration complete")
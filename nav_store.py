@@ -0,0 +1,203 @@
+"""Optional memory-mapped columnar store for historical NAVs.
+
+Enable by pointing MF_NAV_STORE_DIR at a writable directory. After each
+ingest the whole `historical_nav` table is written out as contiguous
+per-scheme arrays:
+
+    codes.npy    int64   sorted scheme codes
+    offsets.npy  int64   row offsets into the data arrays (len(codes) + 1)
+    dates.npy    datetime64[D]
+    navs.npy     float64 (NaN for missing NAVs)
+
+Each build goes into a fresh version directory and the `CURRENT` pointer is
+replaced atomically, so readers that already mapped the previous version keep
+a consistent view. Readers map the data arrays with mmap_mode='r' and hand out
+slices, so a scheme's history is read without copying or building dicts.
+"""
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from db import get_db_connection
+
+NAV_STORE_DIR = os.environ.get("MF_NAV_STORE_DIR")
+
+FETCH_SIZE = 50000
+
+# How often readers look for a newer version (seconds)
+RELOAD_INTERVAL = 5.0
+
+
+def enabled():
+    return bool(NAV_STORE_DIR)
+
+
+def build_nav_store(directory=None):
+    """Dump historical_nav into a new store version and publish it; returns the row count"""
+    directory = directory or NAV_STORE_DIR
+    os.makedirs(directory, exist_ok=True)
+    version = f"v{time.time_ns()}"
+    target = os.path.join(directory, version)
+    os.makedirs(target)
+    started = time.perf_counter()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM historical_nav")
+        total = cursor.fetchone()[0]
+
+        dates = np.lib.format.open_memmap(os.path.join(target, "dates.npy"), mode="w+",
+                                          dtype="datetime64[D]", shape=(total,))
+        navs = np.lib.format.open_memmap(os.path.join(target, "navs.npy"), mode="w+",
+                                         dtype=np.float64, shape=(total,))
+        codes = []
+        offsets = []
+
+        cursor.execute("""
+            SELECT scheme_code, nav_date, nav_value FROM historical_nav
+            ORDER BY scheme_code, nav_date ASC
+        """)
+        position = 0
+        previous_code = None
+        while position < total:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            rows = rows[:total - position]
+            chunk_codes, chunk_dates, chunk_navs = zip(*rows)
+            count = len(rows)
+            dates[position:position + count] = np.array(chunk_dates, dtype="datetime64[D]")
+            navs[position:position + count] = np.array(
+                [np.nan if value is None else float(value) for value in chunk_navs])
+            for i, code in enumerate(chunk_codes):
+                if code != previous_code:
+                    codes.append(int(code))
+                    offsets.append(position + i)
+                    previous_code = code
+            position += count
+        # Drain anything left if rows were added after the count
+        cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    offsets.append(position)
+    dates.flush()
+    navs.flush()
+    del dates, navs
+    np.save(os.path.join(target, "codes.npy"), np.array(codes, dtype=np.int64))
+    np.save(os.path.join(target, "offsets.npy"), np.array(offsets, dtype=np.int64))
+
+    pointer = os.path.join(directory, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+    _prune_versions(directory, keep={version})
+
+    print(f"NAV store {version}: {position} rows, {len(codes)} schemes "
+          f"in {time.perf_counter() - started:.1f}s")
+    return position
+
+
+def _prune_versions(directory, keep, retain=2):
+    versions = sorted(name for name in os.listdir(directory) if name.startswith("v"))
+    for name in versions[:-retain]:
+        if name not in keep:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def rebuild():
+    """Rebuild after an ingest if the store is enabled (errors are reported, not raised)"""
+    if not enabled():
+        return
+    try:
+        build_nav_store()
+    except Exception as e:
+        print(f"NAV store rebuild failed: {e}")
+
+
+class NavStore:
+    """Read-only view over one store version"""
+
+    def __init__(self, path):
+        self.path = path
+        self.codes = np.load(os.path.join(path, "codes.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        rows = int(self.offsets[-1])
+        # The data files may be over-allocated if the table shrank during the dump
+        self.dates = np.load(os.path.join(path, "dates.npy"), mmap_mode="r")[:rows]
+        self.navs = np.load(os.path.join(path, "navs.npy"), mmap_mode="r")[:rows]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _slice(self, scheme_code):
+        try:
+            scheme_code = int(scheme_code)
+        except (TypeError, ValueError):
+            return None
+        i = np.searchsorted(self.codes, scheme_code)
+        if i == len(self.codes) or self.codes[i] != scheme_code:
+            return None
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def series(self, scheme_code):
+        """(dates, navs) views for one scheme in ascending date order, or empty arrays"""
+        span = self._slice(scheme_code)
+        if span is None:
+            return self.dates[:0], self.navs[:0]
+        return self.dates[span], self.navs[span]
+
+    def to_frame(self, scheme_codes=None, since=None):
+        """Long DataFrame (scheme_code, nav_date, nav_value) in the shape load_nav_history returns"""
+        lengths = np.diff(self.offsets)
+        if scheme_codes is None:
+            codes = np.repeat(self.codes, lengths)
+            dates, navs = self.dates, self.navs
+        else:
+            wanted = np.isin(self.codes, np.asarray(list(scheme_codes), dtype=np.int64))
+            row_mask = np.repeat(wanted, lengths)
+            codes = np.repeat(self.codes[wanted], lengths[wanted])
+            dates, navs = self.dates[row_mask], self.navs[row_mask]
+        if since is not None:
+            keep = dates >= np.datetime64(since, "D")
+            codes, dates, navs = codes[keep], dates[keep], navs[keep]
+        return pd.DataFrame({'scheme_code': codes, 'nav_date': dates, 'nav_value': navs})
+
+
+_current = None
+_current_version = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_nav_store():
+    """The latest published store, or None when disabled or not built yet"""
+    global _current, _current_version, _checked_at
+    if not enabled():
+        return None
+    now = time.monotonic()
+    if _current is not None and now - _checked_at < RELOAD_INTERVAL:
+        return _current
+    with _lock:
+        _checked_at = now
+        try:
+            with open(os.path.join(NAV_STORE_DIR, "CURRENT")) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        if version != _current_version:
+            _current = NavStore(os.path.join(NAV_STORE_DIR, version))
+            _current_version = version
+    return _current
+
+
+if __name__ == "__main__":
+    if not enabled():
+        raise SystemExit("Set MF_NAV_STORE_DIR to build the NAV store")
+    build_nav_store()
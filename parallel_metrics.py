@@ -0,0 +1,130 @@
+"""Process-pool metrics: full rebuilds spread across CPU cores.
+
+The parent loads NAV history once, partitions each benchmark's schemes into
+chunks and ships each chunk to a ProcessPoolExecutor as compact numpy arrays
+(codes, day numbers, NAVs) with the name of its benchmark. The benchmark
+return series are handed to every worker once through the pool initializer
+instead of being pickled with each task. Workers run the same batch engine as
+the single-process path (compute_all_metrics and metrics_state.compute_state)
+and send back arrays, which the parent stitches together for one bulk upsert.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from calculate_metrics import METRIC_COLUMNS, compute_all_metrics
+
+# Schemes per task; small enough to balance uneven histories across workers
+PARALLEL_CHUNK_SIZE = 500
+
+_benchmark_returns = None
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _init_worker(benchmarks):
+    """Pool initializer: rebuild the shared benchmark series once per worker process"""
+    global _benchmark_returns
+    _benchmark_returns = {
+        name: pd.Series(values, index=pd.DatetimeIndex(dates, name='date'), name='return')
+        for name, (dates, values) in benchmarks.items()
+    }
+
+
+def _compute_chunk(chunk_id, benchmark, codes, row_codes, nav_days, nav_values):
+    """Worker task: metrics and running-sum state for one chunk of schemes sharing a benchmark"""
+    import metrics_state
+
+    started = time.perf_counter()
+    nav_df = pd.DataFrame({
+        'scheme_code': row_codes,
+        'nav_date': nav_days.astype('datetime64[D]'),
+        'nav_value': nav_values,
+    })
+    scheme_codes = codes.tolist()
+    market_returns = _benchmark_returns[benchmark]
+    metrics = compute_all_metrics(nav_df, market_returns, scheme_codes)
+    state = metrics_state.compute_state(nav_df, market_returns, scheme_codes)
+
+    result = {
+        'chunk_id': chunk_id,
+        'benchmark': benchmark,
+        'pid': os.getpid(),
+        'schemes': len(codes),
+        'rows': len(row_codes),
+        'metric_codes': metrics.index.to_numpy(dtype=np.int64),
+        'metric_values': metrics[METRIC_COLUMNS + ['observations']].to_numpy(dtype=np.float64),
+        'state_codes': state.index.to_numpy(dtype=np.int64),
+        'state': {col: state[col].to_numpy() for col in state.columns},
+    }
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def partition(nav_df, scheme_codes, chunk_size=PARALLEL_CHUNK_SIZE):
+    """Yield (codes, row_codes, nav_days, nav_values) array tuples, one per chunk of schemes"""
+    nav_df = nav_df[nav_df['scheme_code'].isin(scheme_codes)].sort_values(['scheme_code', 'nav_date'], kind='stable')
+    row_codes = nav_df['scheme_code'].to_numpy(dtype=np.int64)
+    nav_days = pd.to_datetime(nav_df['nav_date']).to_numpy().astype('datetime64[D]').astype(np.int32)
+    nav_values = nav_df['nav_value'].astype(float).to_numpy()
+
+    codes = np.unique(row_codes)
+    for start in range(0, len(codes), chunk_size):
+        chunk = codes[start:start + chunk_size]
+        lo = np.searchsorted(row_codes, chunk[0], side='left')
+        hi = np.searchsorted(row_codes, chunk[-1], side='right')
+        yield chunk, row_codes[lo:hi], nav_days[lo:hi], nav_values[lo:hi]
+
+
+def compute_metrics_parallel(nav_df, benchmark_returns, groups, workers=None, chunk_size=PARALLEL_CHUNK_SIZE):
+    """Parallel counterpart of compute_grouped_metrics + compute_grouped_state.
+
+    `groups` maps benchmark names (keys of `benchmark_returns`) to scheme
+    codes. Returns (metrics_df, state_df, timings) where timings is one dict
+    per chunk with its benchmark, size, worker pid and compute seconds.
+    """
+    import metrics_state
+
+    workers = workers or default_workers()
+    benchmarks = {
+        name: (returns.index.to_numpy(dtype='datetime64[ns]'), returns.to_numpy(dtype=np.float64))
+        for name, returns in benchmark_returns.items() if name in groups
+    }
+    tasks = [(name, arrays) for name, codes in groups.items() for arrays in partition(nav_df, codes, chunk_size)]
+
+    metric_frames, state_frames, timings = [], [], []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(benchmarks,)) as executor:
+        futures = [
+            executor.submit(_compute_chunk, chunk_id, name, *arrays)
+            for chunk_id, (name, arrays) in enumerate(tasks)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            metric_frames.append(pd.DataFrame(
+                result['metric_values'], columns=METRIC_COLUMNS + ['observations'],
+                index=pd.Index(result['metric_codes'], name='scheme_code'),
+            ))
+            state_frames.append(pd.DataFrame(result['state'], index=pd.Index(result['state_codes'], name='scheme_code')))
+            timings.append({key: result[key] for key in ('chunk_id', 'benchmark', 'pid', 'schemes', 'rows', 'seconds')})
+
+    timings.sort(key=lambda timing: timing['chunk_id'])
+    metrics_df = (pd.concat(metric_frames).sort_index() if metric_frames
+                  else pd.DataFrame(columns=METRIC_COLUMNS + ['observations']))
+    state_df = (pd.concat(state_frames).sort_index() if state_frames
+                else pd.DataFrame(columns=metrics_state.STATE_COLUMNS))
+    return metrics_df, state_df, timings
+
+
+def print_timings(timings, wall_seconds):
+    for timing in timings:
+        print(f"  chunk {timing['chunk_id']:>3}: {timing['schemes']:>5} schemes, {timing['rows']:>9} rows "
+              f"in {timing['seconds']:.2f}s (pid {timing['pid']}, {timing['benchmark']})")
+    busy = sum(timing['seconds'] for timing in timings)
+    print(f"  {len(timings)} chunks, {busy:.1f}s of worker time in {wall_seconds:.1f}s wall "
+          f"({busy / wall_seconds if wall_seconds else 0:.1f}x)")
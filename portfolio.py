@@ -0,0 +1,238 @@
+"""Portfolio analytics over user-selected baskets of schemes.
+
+Analysts POST a basket of scheme codes and weights to /portfolio and get the
+portfolio's return, volatility, Sharpe ratio, beta vs. Nifty 50, max drawdown
+and the schemes' correlation matrix. Every request is answered from one cached
+ReturnMatrix: daily returns for all schemes over the last LOOKBACK_DAYS on the
+Nifty calendar, built with the same loaders calculate_metrics.py uses and
+stored scheme-major so a basket is a single row gather. The matrix is built
+in a background thread at app startup (start_background_build) and rebuilt
+after each data update; a request that arrives before the first build waits
+for it instead of starting a second one.
+"""
+import os
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from db import get_db_connection
+from calculate_metrics import (
+    RISK_FREE_RATE, MIN_OBSERVATIONS,
+    load_nifty_returns, load_nav_history, nav_returns, build_return_matrix,
+)
+from history import RANGES
+
+# Days of history kept in the cached matrix (all schemes x trading days)
+LOOKBACK_DAYS = int(os.environ.get("MF_PORTFOLIO_LOOKBACK_DAYS", 5 * 365))
+
+MAX_HOLDINGS = 200
+
+
+class ReturnMatrix:
+    """Daily returns for every scheme, aligned to the Nifty 50 calendar.
+
+    `returns` is (schemes x dates) float32 with NaN where a scheme has no
+    return (half the memory of float64; baskets are widened after the
+    gather); `codes` is sorted so a basket maps to rows with one searchsorted.
+    """
+
+    def __init__(self, codes, dates, returns, market):
+        order = np.argsort(codes)
+        self.codes = np.asarray(codes, dtype=np.int64)[order]
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.returns = np.ascontiguousarray(np.asarray(returns, dtype=np.float32)[order])
+        self.market = np.asarray(market, dtype=float)
+        self.built_at = time.time()
+
+    def rows(self, scheme_codes):
+        """Row index per code (-1 for codes not in the matrix)"""
+        wanted = np.asarray(scheme_codes, dtype=np.int64)
+        i = np.searchsorted(self.codes, wanted)
+        i[i == len(self.codes)] = 0
+        return np.where(self.codes[i] == wanted, i, -1)
+
+    def nbytes(self):
+        return self.returns.nbytes + self.market.nbytes + self.dates.nbytes + self.codes.nbytes
+
+
+def build_return_matrix_cache(lookback_days=LOOKBACK_DAYS):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    try:
+        nifty_returns = load_nifty_returns(cursor)
+        if nifty_returns.empty:
+            raise ValueError("No Nifty 50 data loaded")
+        since = (nifty_returns.index[-1] - timedelta(days=lookback_days)).date()
+        nifty_returns = nifty_returns[nifty_returns.index >= str(since)]
+        nav_df = load_nav_history(cursor, since=since)
+    finally:
+        cursor.close()
+        conn.close()
+
+    returns_df, _ = nav_returns(nav_df)
+    codes = np.sort(returns_df['scheme_code'].astype(np.int64).unique())
+    scheme_matrix, market = build_return_matrix(returns_df, nifty_returns, codes)
+    matrix = ReturnMatrix(codes, nifty_returns.index.to_numpy(dtype='datetime64[D]'), scheme_matrix.T, market)
+    print(f"Portfolio return matrix: {len(codes)} schemes x {len(matrix.dates)} days "
+          f"({matrix.nbytes() / 1e6:.0f} MB) in {time.perf_counter() - started:.1f}s")
+    return matrix
+
+
+_matrix = None
+_build_lock = threading.Lock()
+
+
+def get_return_matrix():
+    matrix = _matrix
+    if matrix is not None:
+        return matrix
+    with _build_lock:
+        if _matrix is None:
+            _rebuild()
+        return _matrix
+
+
+def _rebuild():
+    global _matrix
+    _matrix = build_return_matrix_cache()
+
+
+def refresh():
+    """Build (or rebuild after a data update) the matrix; errors are reported, not raised"""
+    try:
+        with _build_lock:
+            _rebuild()
+    except Exception as e:
+        print(f"Portfolio return matrix build failed: {e}")
+
+
+def start_background_build():
+    """Build the matrix off the request path so the first POST /portfolio doesn't pay for it"""
+    thread = threading.Thread(target=refresh, name="portfolio-matrix", daemon=True)
+    thread.start()
+    return thread
+
+
+def matrix_stats():
+    matrix = _matrix
+    if matrix is None:
+        return {"built": False}
+    return {
+        "built": True,
+        "schemes": len(matrix.codes),
+        "days": len(matrix.dates),
+        "mb": round(matrix.nbytes() / 1e6, 1),
+        "age_seconds": round(time.time() - matrix.built_at),
+    }
+
+
+def parse_basket(payload):
+    """Request JSON -> (codes, weights); weights default to equal and are normalised to sum to 1"""
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+    holdings = payload.get("holdings")
+    if not isinstance(holdings, list) or not holdings:
+        raise ValueError("holdings must be a non-empty list of {scheme_code, weight}")
+    if len(holdings) > MAX_HOLDINGS:
+        raise ValueError(f"At most {MAX_HOLDINGS} holdings are allowed")
+
+    codes, weights = [], []
+    for holding in holdings:
+        if isinstance(holding, dict):
+            code, weight = holding.get("scheme_code"), holding.get("weight", 1)
+        else:
+            code, weight = holding, 1
+        try:
+            codes.append(int(code))
+            weights.append(float(weight))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid holding: {holding!r}")
+
+    if len(set(codes)) != len(codes):
+        raise ValueError("Each scheme may appear only once")
+    weights = np.array(weights)
+    if not np.all(np.isfinite(weights)) or np.any(weights < 0) or weights.sum() <= 0:
+        raise ValueError("weights must be non-negative numbers with a positive total")
+    return np.array(codes, dtype=np.int64), weights / weights.sum()
+
+
+def max_drawdown(returns):
+    """(drawdown, peak index, trough index) of the compounded return path"""
+    wealth = np.cumprod(1 + returns)
+    peaks = np.maximum.accumulate(np.concatenate(([1.0], wealth)))[1:]
+    drawdowns = wealth / peaks - 1
+    trough = int(np.argmin(drawdowns))
+    peak = int(np.argmax(wealth[:trough + 1])) if drawdowns[trough] < 0 else trough
+    return float(drawdowns[trough]), peak, trough
+
+
+def analyze(codes, weights, range_key=None, matrix=None):
+    """Risk/return summary of a constant-weight (daily rebalanced) basket.
+
+    Uses the dates on which every scheme in the basket and Nifty have a
+    return; schemes with no history in the window are reported in `excluded`
+    and the remaining weights are renormalised.
+    """
+    matrix = matrix or get_return_matrix()
+    days = RANGES.get(range_key or 'max', False)
+    if days is False:
+        raise ValueError(f"range must be one of {', '.join(RANGES)}")
+
+    rows = matrix.rows(codes)
+    found = rows >= 0
+    block = matrix.returns[rows[found]].astype(float)
+    market = matrix.market
+    dates = matrix.dates
+    if days:
+        recent = dates > dates[-1] - np.timedelta64(days, 'D')
+        block, market, dates = block[:, recent], market[recent], dates[recent]
+
+    has_history = ~np.isnan(block).all(axis=1)
+    found[found] = has_history
+    block = block[has_history]
+    if not found.any():
+        raise ValueError("None of the schemes have NAV history in this range")
+    total = weights[found].sum()
+    if total <= 0:
+        raise ValueError("All the schemes with NAV history in this range have zero weight")
+    weights = weights[found] / total
+
+    common = ~np.isnan(block).any(axis=0) & ~np.isnan(market)
+    block, market, dates = block[:, common], market[common], dates[common]
+    n = block.shape[1]
+    if n < MIN_OBSERVATIONS:
+        raise ValueError(f"Only {n} common trading days for these schemes (need {MIN_OBSERVATIONS})")
+
+    portfolio = weights @ block
+    mean = portfolio.mean()
+    std = portfolio.std()
+    market_dev = market - market.mean()
+    beta = float(((portfolio - mean) @ market_dev) / (market_dev @ market_dev))
+    cumulative = float(np.prod(1 + portfolio) - 1)
+    drawdown, peak, trough = max_drawdown(portfolio)
+    correlation = np.corrcoef(block) if len(block) > 1 else np.ones((1, 1))
+
+    labels = np.datetime_as_string(dates[[0, -1, peak, trough]], unit='D').tolist()
+    return {
+        'schemes': codes[found].tolist(),
+        'weights': np.round(weights, 6).tolist(),
+        'excluded': codes[~found].tolist(),
+        'start': labels[0],
+        'end': labels[1],
+        'observations': int(n),
+        'cumulative_return': round(cumulative, 6),
+        'annual_return': round(float((1 + cumulative) ** (252 / n) - 1), 6),
+        'volatility': round(float(std * np.sqrt(252)), 6),
+        'sharpe_ratio': round(float((mean - RISK_FREE_RATE) / std * np.sqrt(252)), 4) if std > 0 else None,
+        'beta': round(beta, 4),
+        'max_drawdown': {'drawdown': round(drawdown, 6), 'peak': labels[2], 'trough': labels[3]},
+        'correlation': np.round(np.nan_to_num(correlation), 4).tolist(),
+    }
+
+
+def analyze_request(payload):
+    codes, weights = parse_basket(payload)
+    return analyze(codes, weights, payload.get("range"))
@@ -0,0 +1,354 @@
+"""Point-to-point, CAGR, lumpsum and SIP returns over a scheme's NAV history.
+
+/returns/<scheme_code> answers "what did this scheme return over 1M ... 10Y"
+and "what would a monthly SIP have returned" from a scheme's NAV arrays
+(day numbers + NAVs, from the NAV store or one indexed query), which are kept
+in an LRU cleared by the daily update.
+
+SIP cash flows are built for many start dates at once as padded (start x
+installment) matrices, and xirr() solves every row together with Newton steps
+kept inside a per-row bisection bracket, so the same code values one scheme's
+standard horizons or a whole universe of schemes and start dates.
+"""
+from datetime import datetime
+
+import numpy as np
+
+from db import get_db_connection
+from history import LRUCache
+import nav_store
+
+# Standard periods (days back from the latest NAV)
+PERIODS = {
+    '1M': 30,
+    '3M': 91,
+    '6M': 182,
+    '1Y': 365,
+    '3Y': 3 * 365,
+    '5Y': 5 * 365,
+    '10Y': 10 * 365,
+}
+
+# Standard SIP horizons (months of installments ending at the latest NAV)
+SIP_HORIZONS = {'1Y': 12, '3Y': 36, '5Y': 60, '10Y': 120}
+
+DEFAULT_SIP_AMOUNT = 10000.0
+DEFAULT_LUMPSUM = 100000.0
+
+# XIRR search bracket (annual rate) and tolerance
+XIRR_LOW = -0.99
+XIRR_HIGH = 10.0
+XIRR_TOL = 1e-10
+XIRR_MAX_ITER = 100
+
+
+def xirr(cashflows, years, mask=None, low=XIRR_LOW, high=XIRR_HIGH, tol=XIRR_TOL, max_iter=XIRR_MAX_ITER):
+    """Annualised internal rate of return for every row of `cashflows`.
+
+    years[i, k] is how long (in years) before row i's final cash flow flow k
+    happens, so each row's future value FV = sum(c * exp(x * years)) is
+    solved for zero in x = log(1 + rate). For investment-then-redemption flows
+    (a SIP) FV is concave and decreasing in x, so Newton converges from the
+    first step on; for other flows, steps that would leave the current
+    bracket are replaced by bisection. Rows without a sign change in
+    [low, high] come back as NaN.
+    """
+    cashflows = np.atleast_2d(np.asarray(cashflows, dtype=float))
+    years = np.atleast_2d(np.asarray(years, dtype=float))
+    if mask is not None:
+        cashflows = np.where(mask, cashflows, 0.0)
+        years = np.where(mask, years, 0.0)
+    weighted = cashflows * years
+
+    def future_value(x):
+        growth = np.exp(x[:, None] * years)
+        return (cashflows * growth).sum(axis=1), (weighted * growth).sum(axis=1)
+
+    rows = len(cashflows)
+    lo = np.full(rows, np.log1p(low))
+    hi = np.full(rows, np.log1p(high))
+    f_lo = future_value(lo)[0]
+    solvable = np.sign(f_lo) * np.sign(future_value(hi)[0]) < 0
+
+    x = np.full(rows, np.log1p(0.1))
+    for _ in range(max_iter):
+        value, slope = future_value(x)
+        same_side = np.sign(value) == np.sign(f_lo)
+        lo = np.where(same_side, x, lo)
+        hi = np.where(same_side, hi, x)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = x - value / slope
+        step = np.where(np.isfinite(step) & (step >= lo) & (step <= hi), step, (lo + hi) / 2)
+        converged = np.abs(step - x) <= tol
+        x = step
+        if converged[solvable].all():
+            break
+    return np.where(solvable, np.expm1(x), np.nan)
+
+
+def monthly_schedule(start_days, months):
+    """(starts x months) day numbers: each start's day-of-month, clamped to month end"""
+    start = np.asarray(start_days, dtype='datetime64[D]')
+    first_month = start.astype('datetime64[M]')
+    day_offset = (start - first_month.astype('datetime64[D]')).astype(np.int64)
+    month = first_month[:, None] + np.arange(months)
+    month_start = month.astype('datetime64[D]')
+    month_length = ((month + 1).astype('datetime64[D]') - month_start).astype(np.int64)
+    return (month_start + np.minimum(day_offset[:, None], month_length - 1)).astype(np.int64)
+
+
+def shift_months(day, months):
+    """Day numbers `months` (array) months before `day`, on its day of month (clamped to month end)"""
+    date = np.datetime64(int(day), 'D')
+    month = date.astype('datetime64[M]') - np.asarray(months)
+    offset = int((date - date.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64))
+    month_start = month.astype('datetime64[D]')
+    month_length = ((month + 1).astype('datetime64[D]') - month_start).astype(np.int64)
+    return (month_start + np.minimum(offset, month_length - 1)).astype(np.int64)
+
+
+def sip_cashflows(days, navs, start_days, end_day, amount=DEFAULT_SIP_AMOUNT):
+    """Monthly SIPs from each start date up to `end_day`, valued at the last NAV on or before it.
+
+    Each installment buys at the first NAV on or after its scheduled date,
+    so start dates must not be before days[0] (installments scheduled before
+    inception would all buy at the first NAV). Returns (cashflows, years,
+    mask, invested, value, installments) with one row per start: installments
+    first, the redemption value last.
+    """
+    start_days = np.asarray(start_days, dtype=np.int64)
+    end_index = np.searchsorted(days, end_day, side='right') - 1
+    end_nav_day = days[end_index]
+    months = int((end_nav_day - start_days.min()) // 28) + 2
+    scheduled = monthly_schedule(start_days.astype('datetime64[D]'), months)
+
+    index = np.searchsorted(days, scheduled)
+    mask = (scheduled <= end_nav_day) & (index <= end_index)
+    index = np.minimum(index, end_index)
+    units = np.where(mask, amount / navs[index], 0.0).sum(axis=1)
+    installments = mask.sum(axis=1)
+    invested = installments * amount
+    value = units * navs[end_index]
+
+    cashflows = np.column_stack((np.where(mask, -amount, 0.0), value))
+    flow_days = np.column_stack((days[index], np.full(len(start_days), end_nav_day)))
+    years = (end_nav_day - flow_days) / 365.0
+    mask = np.column_stack((mask, installments > 0))
+    return cashflows, years, mask, invested, value, installments
+
+
+def batch_sip_xirr(series_list, start_days, end_day, amount=DEFAULT_SIP_AMOUNT):
+    """SIP XIRR for every (scheme, start date) pair in one solve: (schemes x starts) array.
+
+    Starts before a scheme's first NAV or not before end_day give NaN.
+    """
+    start_days = np.asarray(start_days, dtype=np.int64)
+    blocks = []
+    for series in series_list:
+        block = (np.zeros((len(start_days), 1)), np.zeros((len(start_days), 1)),
+                 np.zeros((len(start_days), 1), dtype=bool))
+        valid = (start_days >= series.days[0]) & (start_days < end_day) if len(series) else None
+        if valid is not None and valid.any():
+            flows = sip_cashflows(series.days, series.navs, start_days[valid], end_day, amount)[:3]
+            block = tuple(np.zeros((len(start_days), part.shape[1]), dtype=part.dtype) for part in flows)
+            for full, part in zip(block, flows):
+                full[valid] = part
+        blocks.append(block)
+
+    width = max(block[0].shape[1] for block in blocks)
+    stacked = [
+        np.concatenate([np.pad(block[i], ((0, 0), (0, width - block[i].shape[1]))) for block in blocks])
+        for i in range(3)
+    ]
+    return xirr(*stacked).reshape(len(series_list), len(start_days))
+
+
+class SchemeSeries:
+    """One scheme's positive NAVs as ascending int64 day numbers and float64 values"""
+
+    def __init__(self, scheme_code, dates, navs):
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        navs = np.asarray(navs, dtype=float)
+        keep = np.isfinite(navs) & (navs > 0)
+        self.scheme_code = scheme_code
+        self.days = dates[keep].astype(np.int64)
+        self.navs = navs[keep]
+
+    def __len__(self):
+        return len(self.days)
+
+    def nav_on_or_before(self, day):
+        """Index of the last NAV on or before `day`, or None before inception"""
+        i = int(np.searchsorted(self.days, day, side='right')) - 1
+        return None if i < 0 else i
+
+
+def load_series(scheme_code):
+    store = nav_store.get_nav_store()
+    if store is not None:
+        dates, navs = store.series(int(scheme_code))
+        return SchemeSeries(scheme_code, dates, navs)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT nav_date, nav_value FROM historical_nav
+            WHERE scheme_code = %s AND nav_value > 0
+            ORDER BY nav_date ASC
+        """, (scheme_code,))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return SchemeSeries(scheme_code,
+                        np.array([row[0] for row in rows], dtype='datetime64[D]'),
+                        np.array([float(row[1]) for row in rows], dtype=float))
+
+
+_cache = LRUCache(capacity=2048)
+
+
+def get_series(scheme_code):
+    key = str(scheme_code)
+    series = _cache.get(key)
+    if series is None:
+        series = load_series(scheme_code)
+        _cache.put(key, series)
+    return series
+
+
+def _label(day):
+    return str(np.datetime64(int(day), 'D'))
+
+
+def _round(value, digits=6):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def lumpsum(series, start_day, end_index, amount=DEFAULT_LUMPSUM):
+    """Buy at the first NAV on or after start_day (not before inception), value at end_index; None if no NAV in between"""
+    start_index = int(np.searchsorted(series.days, start_day))
+    if start_index >= end_index:
+        return None
+    growth = series.navs[end_index] / series.navs[start_index]
+    elapsed = int(series.days[end_index] - series.days[start_index])
+    return {
+        'start': _label(series.days[start_index]),
+        'start_nav': _round(series.navs[start_index], 4),
+        'amount': amount,
+        'value': _round(amount * growth, 2),
+        'return': _round(growth - 1),
+        'cagr': _round(growth ** (365.0 / elapsed) - 1) if elapsed >= 365 else None,
+    }
+
+
+def period_returns(series, end_index):
+    """Point-to-point return (and CAGR for periods of a year or more) per standard period"""
+    end_day = series.days[end_index]
+    results = {}
+    for key, days in PERIODS.items():
+        start_index = series.nav_on_or_before(end_day - days)
+        if start_index is None:
+            results[key] = None
+            continue
+        growth = series.navs[end_index] / series.navs[start_index]
+        results[key] = {
+            'start': _label(series.days[start_index]),
+            'start_nav': _round(series.navs[start_index], 4),
+            'return': _round(growth - 1),
+            'cagr': _round(growth ** (365.0 / days) - 1) if days >= 365 else None,
+        }
+    return results
+
+
+def sip_returns(series, start_days, end_day, amount):
+    """SIP summary per start date (one vectorized XIRR solve for all of them)"""
+    cashflows, years, mask, invested, value, installments = sip_cashflows(
+        series.days, series.navs, start_days, end_day, amount)
+    rates = xirr(cashflows, years, mask)
+    return [
+        {
+            'start': _label(start),
+            'amount': amount,
+            'installments': int(count),
+            'invested': _round(paid, 2),
+            'value': _round(worth, 2),
+            'return': _round(worth / paid - 1) if paid else None,
+            'xirr': _round(rate),
+        }
+        for start, count, paid, worth, rate in zip(start_days, installments, invested, value, rates)
+    ]
+
+
+def _parse_amount(value, default, name):
+    if value in (None, ''):
+        return default
+    try:
+        amount = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    if not np.isfinite(amount) or amount <= 0:
+        raise ValueError(f"{name} must be positive")
+    return amount
+
+
+def get_returns(scheme_code, start=None, end=None, sip_amount=None, amount=None):
+    """Returns payload for /returns/<scheme_code>.
+
+    Standard periods and SIP horizons end at `end` (YYYY-MM-DD, default the
+    latest NAV). With `start`, a lumpsum of `amount` and a monthly SIP of
+    `sip_amount` from that date are added under 'custom'.
+    """
+    sip_amount = _parse_amount(sip_amount, DEFAULT_SIP_AMOUNT, 'sip_amount')
+    amount = _parse_amount(amount, DEFAULT_LUMPSUM, 'amount')
+    try:
+        start_day = np.datetime64(datetime.strptime(start, '%Y-%m-%d').date(), 'D').astype(np.int64) if start else None
+        end_day = np.datetime64(datetime.strptime(end, '%Y-%m-%d').date(), 'D').astype(np.int64) if end else None
+    except ValueError:
+        raise ValueError("start and end must be YYYY-MM-DD dates")
+
+    series = get_series(scheme_code)
+    if not len(series):
+        raise LookupError(f"No NAV history for scheme {scheme_code}")
+    end_index = series.nav_on_or_before(series.days[-1] if end_day is None else end_day)
+    if end_index is None:
+        raise ValueError("end is before the scheme's first NAV")
+    as_of = series.days[end_index]
+    if start_day is not None and start_day >= as_of:
+        raise ValueError("start must be before the valuation date")
+    if start_day is not None and start_day < series.days[0]:
+        raise ValueError(f"start is before the scheme's first NAV ({_label(series.days[0])})")
+
+    # Standard SIP horizons: monthly installments ending in the valuation month
+    keys = list(SIP_HORIZONS)
+    horizon_starts = shift_months(as_of, np.array([SIP_HORIZONS[key] - 1 for key in keys]))
+    eligible = horizon_starts >= series.days[0]
+    sip = dict.fromkeys(keys)
+    if eligible.any():
+        summaries = sip_returns(series, horizon_starts[eligible], as_of, sip_amount)
+        sip.update(zip([key for key, ok in zip(keys, eligible) if ok], summaries))
+
+    payload = {
+        'scheme_code': int(scheme_code),
+        'as_of': _label(as_of),
+        'nav': _round(series.navs[end_index], 4),
+        'inception': _label(series.days[0]),
+        'periods': period_returns(series, end_index),
+        'since_inception': lumpsum(series, series.days[0], end_index, amount),
+        'sip': sip,
+    }
+    if start_day is not None:
+        payload['custom'] = {
+            'lumpsum': lumpsum(series, start_day, end_index, amount),
+            'sip': sip_returns(series, np.array([start_day]), as_of, sip_amount)[0],
+        }
+    return payload
+
+
+def invalidate():
+    _cache.clear()
+
+
+def cache_stats():
+    return _cache.stats()
@@ -0,0 +1,89 @@
+"""Denormalized per-scheme summary behind the scheme details page.
+
+`scheme_summary` holds everything /scheme-details renders - master data, latest
+NAV and the risk metrics - keyed by scheme_code, so the page is a single
+primary-key lookup. It is rebuilt from mutual_funds + scheme_metrics after
+each ingest and each metrics run, into a staging copy that is swapped in, so
+readers never see a partial table.
+"""
+import time
+
+from db import get_db_connection, create_staging_table, swap_tables
+
+STAGING_TABLE = "scheme_summary_staging"
+
+SUMMARY_COLUMNS = [
+    'scheme_code', 'scheme_name', 'amc_name', 'isin_growth', 'isin_div_reinvestment',
+    'net_asset_value', 'last_updated',
+    'alpha', 'beta', 'sharpe_ratio', 'sortino_ratio', 'std_dev', 'metrics_calculated_on',
+]
+
+
+def create_summary_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scheme_summary (
+            scheme_code INT PRIMARY KEY,
+            scheme_name VARCHAR(255),
+            amc_name VARCHAR(255),
+            isin_growth VARCHAR(20),
+            isin_div_reinvestment VARCHAR(20),
+            net_asset_value DECIMAL(15, 4),
+            last_updated TIMESTAMP NULL,
+            alpha DOUBLE,
+            beta DOUBLE,
+            sharpe_ratio DOUBLE,
+            sortino_ratio DOUBLE,
+            std_dev DOUBLE,
+            metrics_calculated_on TIMESTAMP NULL
+        )
+    """)
+
+
+def refresh_scheme_summary():
+    """Rebuild scheme_summary from mutual_funds and scheme_metrics; returns the row count"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    try:
+        create_summary_table(cursor)
+        create_staging_table(cursor, 'scheme_summary', STAGING_TABLE)
+        cursor.execute(f"""
+            INSERT INTO {STAGING_TABLE} ({', '.join(SUMMARY_COLUMNS)})
+            SELECT m.scheme_code, m.scheme_name, m.amc_name, m.isin_growth, m.isin_div_reinvestment,
+                   m.net_asset_value, m.last_updated,
+                   s.alpha, s.beta, s.sharpe_ratio, s.sortino_ratio, s.std_dev, s.calculated_on
+            FROM mutual_funds m
+            LEFT JOIN scheme_metrics s ON s.scheme_code = m.scheme_code
+        """)
+        count = cursor.rowcount
+        conn.commit()
+        swap_tables(cursor, 'scheme_summary', STAGING_TABLE)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    print(f"Scheme summary refreshed: {count} schemes in {time.perf_counter() - started:.1f}s")
+    return count
+
+
+def split_summary(row):
+    """(details, metrics) dicts in the shape scheme_details.html expects; metrics is {} if never computed"""
+    metric_columns = ['alpha', 'beta', 'sharpe_ratio', 'sortino_ratio', 'std_dev']
+    details = {key: value for key, value in row.items() if key not in metric_columns}
+    metrics = {key: row[key] for key in metric_columns} if row['metrics_calculated_on'] else {}
+    return details, metrics
+
+
+def refresh():
+    """Refresh after an ingest or metrics run (errors are reported, not raised)"""
+    try:
+        refresh_scheme_summary()
+    except Exception as e:
+        print(f"Scheme summary refresh failed: {e}")
+
+
+if __name__ == "__main__":
+    refresh_scheme_summary()
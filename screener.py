@@ -0,0 +1,206 @@
+"""Cross-scheme screener over the stored risk metrics.
+
+/screener filters and ranks schemes by alpha, beta, Sharpe, Sortino and
+std. dev. ("top 20 Sharpe in this AMC", "beta <= 0.8 and Sortino >= 1").
+Every query is answered from a ScreenerSnapshot: `scheme_metrics` joined with
+`mutual_funds`, held as one float64 column per metric plus, per metric, the
+row order sorted by value. A range filter is two searchsorted calls on the
+sorted column and a sort is a walk of the presorted order, so MySQL is not
+involved. Like the catalog, a refresh builds a new snapshot and swaps the
+module-level reference; it is rebuilt whenever metrics are recomputed.
+"""
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from db import get_db_connection
+from calculate_metrics import METRIC_COLUMNS
+
+DEFAULT_SORT = "-sharpe_ratio"
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 500
+
+
+class ScreenerSnapshot:
+    """Immutable columnar copy of (scheme_code, scheme_name, amc_name, *METRIC_COLUMNS) rows.
+
+    For each metric `ascending[metric]` / `descending[metric]` are row indices
+    ordered by value with the schemes lacking that metric (NaN) last, and
+    `sorted_values[metric]` is the column in ascending order without NaNs.
+    """
+
+    def __init__(self, rows):
+        rows = list(rows)
+        self.codes = np.array([row[0] for row in rows], dtype=np.int64)
+        self.names = [row[1] for row in rows]
+        amc_names = [row[2] for row in rows]
+        self.amcs = sorted(set(amc_names))
+        amc_ids = {amc: i for i, amc in enumerate(self.amcs)}
+        self.amc_ids = np.array([amc_ids[amc] for amc in amc_names], dtype=np.int32)
+
+        self.values = {}
+        self.ascending = {}
+        self.descending = {}
+        self.sorted_values = {}
+        for i, metric in enumerate(METRIC_COLUMNS):
+            column = np.array([row[3 + i] for row in rows], dtype=np.float64)
+            column[~np.isfinite(column)] = np.nan
+            order = np.argsort(column, kind="stable")  # NaNs sort last
+            valid = int(np.count_nonzero(~np.isnan(column)))
+            self.values[metric] = column
+            self.ascending[metric] = order
+            self.descending[metric] = np.concatenate((order[:valid][::-1], order[valid:]))
+            self.sorted_values[metric] = column[order[:valid]]
+        self.built_at = datetime.now()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _range_rows(self, metric, low, high):
+        """Rows with low <= metric <= high (either bound may be None)"""
+        sorted_values = self.sorted_values[metric]
+        lo = 0 if low is None else np.searchsorted(sorted_values, low, side="left")
+        hi = len(sorted_values) if high is None else np.searchsorted(sorted_values, high, side="right")
+        return self.ascending[metric][lo:hi]
+
+    def _result(self, row):
+        result = {
+            "scheme_code": int(self.codes[row]),
+            "scheme_name": self.names[row],
+            "amc_name": self.amcs[self.amc_ids[row]],
+        }
+        for metric in METRIC_COLUMNS:
+            value = self.values[metric][row]
+            result[metric] = None if np.isnan(value) else round(float(value), 6)
+        return result
+
+    def screen(self, filters=(), amc=None, sort=DEFAULT_SORT, limit=DEFAULT_LIMIT, offset=0):
+        """One page of matching schemes plus the total match count.
+
+        `filters` is a sequence of (metric, low, high) inclusive ranges;
+        `sort` is a metric name, prefixed with "-" for descending.
+        """
+        mask = None
+        if amc is not None:
+            amc_id = self.amcs.index(amc) if amc in self.amcs else -1
+            mask = self.amc_ids == amc_id
+        for metric, low, high in filters:
+            keep = np.zeros(len(self), dtype=bool)
+            keep[self._range_rows(metric, low, high)] = True
+            mask = keep if mask is None else mask & keep
+
+        metric = sort.lstrip("-")
+        order = self.descending[metric] if sort.startswith("-") else self.ascending[metric]
+        if mask is not None:
+            order = order[mask[order]]
+        return {
+            "total": len(order),
+            "results": [self._result(row) for row in order[offset:offset + limit]],
+        }
+
+
+def _parse_float(args, key):
+    value = args.get(key)
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{key} must be a number")
+
+
+def parse_screen(args):
+    """Query-string arguments -> screen() keyword arguments.
+
+    min_<metric>=x / max_<metric>=y filter (inclusive), amc= restricts to
+    one AMC, sort=[-]<metric> orders (default -sharpe_ratio), limit/offset page.
+    """
+    filters = []
+    for metric in METRIC_COLUMNS:
+        low, high = _parse_float(args, f"min_{metric}"), _parse_float(args, f"max_{metric}")
+        if low is not None or high is not None:
+            filters.append((metric, low, high))
+    unknown = [key for key in args if key.startswith(("min_", "max_")) and key[4:] not in METRIC_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown filter {unknown[0]}; metrics are {', '.join(METRIC_COLUMNS)}")
+
+    sort = args.get("sort") or DEFAULT_SORT
+    if sort.lstrip("-") not in METRIC_COLUMNS:
+        raise ValueError(f"sort must be one of {', '.join(METRIC_COLUMNS)} (prefix with - for descending)")
+
+    try:
+        limit = min(max(int(args.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        offset = max(int(args.get("offset", 0)), 0)
+    except ValueError:
+        raise ValueError("limit and offset must be integers")
+    return {"filters": filters, "amc": args.get("amc") or None, "sort": sort, "limit": limit, "offset": offset}
+
+
+_snapshot = None
+_build_lock = threading.Lock()
+_stats = {"builds": 0, "queries": 0, "build_seconds": None}
+
+
+def build_snapshot():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT s.scheme_code, m.scheme_name, m.amc_name, {', '.join('s.' + c for c in METRIC_COLUMNS)}
+            FROM scheme_metrics s
+            JOIN mutual_funds m ON m.scheme_code = s.scheme_code
+            ORDER BY s.scheme_code
+        """)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return ScreenerSnapshot(rows)
+
+
+def refresh_screener():
+    """Build a fresh snapshot and atomically replace the current one"""
+    global _snapshot
+    with _build_lock:
+        started = time.perf_counter()
+        snapshot = build_snapshot()
+        _snapshot = snapshot
+        _stats["builds"] += 1
+        _stats["build_seconds"] = round(time.perf_counter() - started, 3)
+    print(f"Screener snapshot rebuilt: {len(snapshot)} schemes")
+    return snapshot
+
+
+def refresh():
+    """Rebuild after a metrics run or data update if this process has a snapshot (errors are reported, not raised)"""
+    if _snapshot is None:
+        return
+    try:
+        refresh_screener()
+    except Exception as e:
+        print(f"Screener snapshot rebuild failed: {e}")
+
+
+def get_snapshot():
+    return _snapshot if _snapshot is not None else refresh_screener()
+
+
+def screen_request(args):
+    params = parse_screen(args)
+    snapshot = get_snapshot()
+    _stats["queries"] += 1
+    result = snapshot.screen(**params)
+    result.update(offset=params["offset"], limit=params["limit"], sort=params["sort"],
+                  as_of=snapshot.built_at.isoformat(timespec="seconds"))
+    return result
+
+
+def screener_stats():
+    snapshot = _snapshot
+    return dict(
+        _stats,
+        schemes=len(snapshot) if snapshot else 0,
+        built_at=snapshot.built_at.isoformat() if snapshot else None,
+    )
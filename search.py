@@ -0,0 +1,212 @@
+"""In-memory scheme search for the typeahead box.
+
+Every scheme is indexed by name tokens, AMC tokens, ISINs and scheme code.
+Name tokens live in a sorted vocabulary with a postings array per token, so a
+query word matches by prefix with two bisects; a word with no prefix match is
+expanded to similar vocabulary tokens by trigram overlap, which absorbs typos. A refresh builds a new SearchIndex and swaps the module-level
+reference, like the catalog, so readers never see a half-built index.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+import numpy as np
+
+from db import get_db_connection
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Minimum trigram similarity (Jaccard) for a fuzzy match
+FUZZY_THRESHOLD = 0.3
+
+# Prefix expansions looked at per query word (a single letter can match thousands of tokens)
+MAX_PREFIX_TOKENS = 2000
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _postings(mapping):
+    """{key: [doc ids]} -> (sorted keys, list of int32 arrays)"""
+    keys = sorted(mapping)
+    return keys, [np.array(sorted(set(mapping[key])), dtype=np.int32) for key in keys]
+
+
+class SearchIndex:
+    """Immutable index over (scheme_code, scheme_name, amc_name, isin_growth, isin_div_reinvestment) rows"""
+
+    def __init__(self, rows):
+        self.codes = []
+        self.names = []
+        self.amcs = []
+        self.by_key = {}
+        tokens = {}
+
+        for doc, (scheme_code, scheme_name, amc_name, isin_growth, isin_reinvest) in enumerate(rows):
+            self.codes.append(scheme_code)
+            self.names.append(scheme_name)
+            self.amcs.append(amc_name)
+            for key in (str(scheme_code), isin_growth, isin_reinvest):
+                if key and key != '-':
+                    self.by_key[key.lower()] = doc
+            for token in set(tokenize(scheme_name)) | set(tokenize(amc_name)):
+                tokens.setdefault(token, []).append(doc)
+
+        self.vocabulary, self.token_postings = _postings(tokens)
+
+        # Trigrams of the vocabulary (not of every name) for typo-tolerant word lookup
+        grams = {}
+        for token_id, token in enumerate(self.vocabulary):
+            for gram in trigrams(token):
+                grams.setdefault(gram, []).append(token_id)
+        gram_keys, gram_postings = _postings(grams)
+        self.gram_postings = dict(zip(gram_keys, gram_postings))
+        self.gram_counts = np.array([len(trigrams(token)) for token in self.vocabulary], dtype=np.float64)
+
+        self.name_lengths = np.array([len(name or "") for name in self.names], dtype=np.float64)
+        self.built_at = datetime.now()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _fuzzy_tokens(self, word):
+        """Vocabulary ids whose trigram similarity to `word` clears FUZZY_THRESHOLD, with the similarities"""
+        query_grams = trigrams(word)
+        postings = [self.gram_postings[gram] for gram in query_grams if gram in self.gram_postings]
+        if not postings:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        overlap = np.bincount(np.concatenate(postings), minlength=len(self.vocabulary)).astype(np.float64)
+        similarity = overlap / (len(query_grams) + self.gram_counts - overlap)
+        token_ids = np.flatnonzero(similarity >= FUZZY_THRESHOLD)
+        return token_ids, similarity[token_ids]
+
+    def _word_weights(self, word):
+        """Per-doc weight for one query word: 2 exact token, 1 prefix, similarity (<1) for typos"""
+        weights = np.zeros(len(self), dtype=np.float64)
+        lo = bisect_left(self.vocabulary, word)
+        hi = bisect_left(self.vocabulary, word + "\uffff", lo, min(lo + MAX_PREFIX_TOKENS, len(self.vocabulary)))
+        if hi > lo:
+            weights[np.concatenate(self.token_postings[lo:hi])] = 1.0
+            if self.vocabulary[lo] == word:
+                weights[self.token_postings[lo]] = 2.0
+            return weights, False
+        if word.isdigit():
+            # Numbers (series, years, codes) are not typo-corrected
+            return weights, False
+
+        for token_id, similarity in zip(*self._fuzzy_tokens(word)):
+            postings = self.token_postings[token_id]
+            weights[postings] = np.maximum(weights[postings], similarity)
+        return weights, True
+
+    def _result(self, doc, score, match):
+        return {
+            "scheme_code": self.codes[doc],
+            "scheme_name": self.names[doc],
+            "amc_name": self.amcs[doc],
+            "score": round(float(score), 3),
+            "match": match,
+        }
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Ranked matches: exact code/ISIN first, then schemes matching every query word"""
+        query = (query or "").strip()
+        if not query or not len(self):
+            return []
+
+        results = []
+        seen = set()
+        doc = self.by_key.get(query.lower())
+        if doc is not None:
+            results.append(self._result(doc, 100.0, "code"))
+            seen.add(doc)
+
+        words = tokenize(query)
+        if not words:
+            return results
+
+        scores = np.zeros(len(self), dtype=np.float64)
+        matched = np.ones(len(self), dtype=bool)
+        fuzzy = False
+        for word in words:
+            weights, used_fuzzy = self._word_weights(word)
+            fuzzy |= used_fuzzy
+            scores += weights
+            matched &= weights > 0
+        match = "fuzzy" if fuzzy else "prefix"
+
+        candidates = np.flatnonzero(matched)
+        # Shorter names rank first among equal scores
+        ranked = scores - self.name_lengths * 1e-4
+        wanted = limit + len(seen)
+        if len(candidates) > wanted:
+            candidates = candidates[np.argpartition(-ranked[candidates], wanted)[:wanted]]
+        for doc in candidates[np.argsort(-ranked[candidates], kind="stable")]:
+            if len(results) >= limit:
+                break
+            if doc not in seen:
+                results.append(self._result(doc, scores[doc], match))
+                seen.add(doc)
+        return results
+
+
+_index = None
+_build_lock = threading.Lock()
+_stats = {"builds": 0, "queries": 0, "build_seconds": None}
+
+
+def build_search_index():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT scheme_code, scheme_name, amc_name, isin_growth, isin_div_reinvestment
+            FROM mutual_funds ORDER BY scheme_code
+        """)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return SearchIndex(rows)
+
+
+def refresh_search_index():
+    """Build a fresh index and atomically replace the current one"""
+    global _index
+    with _build_lock:
+        started = time.perf_counter()
+        index = build_search_index()
+        _index = index
+        _stats["builds"] += 1
+        _stats["build_seconds"] = round(time.perf_counter() - started, 3)
+    print(f"Search index rebuilt: {len(index)} schemes, {len(index.vocabulary)} tokens")
+    return index
+
+
+def get_search_index():
+    return _index if _index is not None else refresh_search_index()
+
+
+def search(query, limit=DEFAULT_LIMIT):
+    _stats["queries"] += 1
+    return get_search_index().search(query, limit)
+
+
+def search_stats():
+    index = _index
+    return dict(
+        _stats,
+        schemes=len(index) if index else 0,
+        built_at=index.built_at.isoformat() if index else None,
+    )
@@ -0,0 +1,362 @@
+"""Compact binary snapshots of the dataset for fast cold starts.
+
+    python snapshot.py export mf-full.npz
+    python snapshot.py export mf-2025-03.npz --since 2025-03-01 --until 2025-03-31
+    python snapshot.py import mf-full.npz mf-2025-03.npz
+
+A snapshot is one compressed NumPy .npz archive holding `mutual_funds`,
+`historical_nav`, `nifty50_data`, `index_prices`, `benchmark_overrides` and
+`scheme_metrics` column by column, plus a JSON manifest. `historical_nav` is stored like the NAV store
+(sorted scheme codes + row counts), with dates and NAV ticks (1e-4, exact for
+DECIMAL(15,4)) delta-encoded, so the mostly constant steps compress to almost
+nothing. With --since/--until only NAV and index price rows in that date
+range are exported (a delta); the small tables always go in whole.
+
+Import upserts the index prices, benchmark overrides (replaced as a whole) and
+history in batches, swaps `mutual_funds` in through a staging table like the
+daily ingest and upserts `scheme_metrics`; snapshots are applied in the order given, so a full
+snapshot followed by its deltas rebuilds the dataset. The run is recorded in
+job_runs, so running web processes refresh their caches.
+"""
+import argparse
+import json
+import time
+import traceback
+from datetime import date, datetime
+
+import numpy as np
+
+from db import get_db_connection, get_pool, create_staging_table, swap_tables
+from events import DATA_UPDATED, publish
+from instrumentation import StageTimer
+from benchmark_map import create_benchmark_tables
+import nav_store
+import scheme_summary
+
+# Format 2 added index_prices and benchmark_overrides; format 1 files still import
+FORMAT_VERSION = 2
+SUPPORTED_FORMATS = (1, 2)
+
+FETCH_SIZE = 50000
+INSERT_BATCH = 10000
+
+NAV_SCALE = 10000
+
+# Column kinds per table (historical_nav has its own encoding)
+TABLES = {
+    "mutual_funds": [
+        ("scheme_code", "int"), ("isin_growth", "str"), ("isin_div_reinvestment", "str"),
+        ("scheme_name", "str"), ("net_asset_value", "float"), ("amc_name", "str"),
+        ("last_updated", "datetime"),
+    ],
+    "nifty50_data": [
+        ("date", "date"), ("close", "float"), ("open", "float"), ("high", "float"),
+        ("low", "float"), ("volume", "int"),
+    ],
+    "index_prices": [
+        ("index_name", "str"), ("date", "date"), ("close", "float"), ("open", "float"),
+        ("high", "float"), ("low", "float"), ("volume", "int"),
+    ],
+    "benchmark_overrides": [
+        ("scheme_code", "int"), ("index_name", "str"),
+    ],
+    "scheme_metrics": [
+        ("scheme_code", "int"), ("alpha", "float"), ("beta", "float"), ("sharpe_ratio", "float"),
+        ("sortino_ratio", "float"), ("std_dev", "float"), ("calculated_on", "datetime"),
+    ],
+}
+
+# Tables whose rows are limited to the --since/--until range, by their `date` column
+DATED_TABLES = ("nifty50_data", "index_prices")
+
+STAGING_TABLE = "mutual_funds_snapshot"
+
+UPSERT_HISTORY_SQL = """
+    INSERT INTO historical_nav
+    (scheme_code, nav_date, nav_value)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE nav_value = VALUES(nav_value)
+"""
+
+
+def _upsert_sql(table, columns, keys):
+    updates = ", ".join(f"{col}=VALUES({col})" for col in columns if col not in keys)
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON DUPLICATE KEY UPDATE {updates}")
+
+
+def encode_column(values, kind):
+    """Python column values -> {suffix: array}; NULLs become NaN/NaT or a `null` mask"""
+    nulls = np.fromiter((value is None for value in values), bool, len(values))
+    if kind == "float":
+        return {"": np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)}
+    if kind == "date":
+        return {"": np.array(values, dtype="datetime64[D]")}
+    if kind == "datetime":
+        return {"": np.array(values, dtype="datetime64[us]")}
+    if kind == "int":
+        arrays = {"": np.array([0 if value is None else int(value) for value in values], dtype=np.int64)}
+    else:
+        arrays = {"": np.array(["" if value is None else str(value) for value in values], dtype=np.str_)}
+    if nulls.any():
+        arrays[".null"] = nulls
+    return arrays
+
+
+def decode_column(archive, name, kind):
+    """Inverse of encode_column: a list of Python values (None for NULL)"""
+    array = archive[name]
+    if kind == "float":
+        return [None if value != value else value for value in array.tolist()]
+    if kind in ("date", "datetime"):
+        values = array.astype(object).tolist()
+        return [value if isinstance(value, (date, datetime)) else None for value in values]
+    values = array.tolist()
+    if f"{name}.null" in archive.files:
+        values = [None if null else value for value, null in zip(values, archive[f"{name}.null"].tolist())]
+    return values
+
+
+def _export_table(cursor, table, where="", params=()):
+    columns = TABLES[table]
+    cursor.execute(f"SELECT {', '.join(col for col, _ in columns)} FROM {table} {where}", params)
+    rows = cursor.fetchall()
+    arrays = {}
+    for i, (col, kind) in enumerate(columns):
+        for suffix, array in encode_column([row[i] for row in rows], kind).items():
+            arrays[f"{table}/{col}{suffix}"] = array
+    return arrays, len(rows)
+
+
+def _export_history(cursor, where="", params=()):
+    """historical_nav as codes / counts / delta-encoded dates and NAV ticks"""
+    cursor.execute(f"""
+        SELECT scheme_code, nav_date, nav_value FROM historical_nav {where}
+        ORDER BY scheme_code, nav_date ASC
+    """, params)
+    codes, dates, ticks, nulls = [], [], [], []
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        chunk_codes, chunk_dates, chunk_navs = zip(*rows)
+        codes.append(np.array(chunk_codes, dtype=np.int64))
+        dates.append(np.array(chunk_dates, dtype="datetime64[D]").astype(np.int64))
+        navs = np.array([np.nan if value is None else float(value) for value in chunk_navs])
+        nulls.append(np.isnan(navs))
+        ticks.append(np.rint(np.nan_to_num(navs) * NAV_SCALE).astype(np.int64))
+
+    if not codes:
+        empty = np.zeros(0, dtype=np.int64)
+        codes, dates, ticks, nulls = [empty], [empty], [empty], [np.zeros(0, dtype=bool)]
+    codes, dates, ticks = np.concatenate(codes), np.concatenate(dates), np.concatenate(ticks)
+    nulls = np.concatenate(nulls)
+    starts = np.flatnonzero(np.diff(codes, prepend=codes[:1] - 1)) if len(codes) else np.zeros(0, dtype=np.int64)
+    arrays = {
+        "historical_nav/codes": codes[starts],
+        "historical_nav/counts": np.diff(np.append(starts, len(codes))),
+        "historical_nav/date_deltas": np.diff(dates, prepend=0).astype(np.int32),
+        "historical_nav/tick_deltas": np.diff(ticks, prepend=0),
+        "historical_nav/nulls": np.packbits(nulls),
+    }
+    date_range = [str(np.datetime64(int(dates.min()), "D")), str(np.datetime64(int(dates.max()), "D"))] \
+        if len(dates) else None
+    return arrays, len(codes), date_range
+
+
+def export_snapshot(path, since=None, until=None, timings=None):
+    """Write a full (or, with since/until, delta) snapshot to `path`; returns the manifest"""
+    clock = StageTimer(timings)
+    started = time.perf_counter()
+    conditions, params = [], []
+    if since:
+        conditions.append("{date} >= %s")
+        params.append(since)
+    if until:
+        conditions.append("{date} <= %s")
+        params.append(until)
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    arrays = {}
+    rows = {}
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        create_benchmark_tables(cursor)
+        history, rows["historical_nav"], nav_range = _export_history(
+            cursor, where.format(date="nav_date"), params)
+        arrays.update(history)
+        clock.lap("export_history")
+        for table in TABLES:
+            dated = table in DATED_TABLES
+            table_arrays, rows[table] = _export_table(
+                cursor, table, where.format(date="date") if dated else "", params if dated else ())
+            arrays.update(table_arrays)
+        clock.lap("export_tables")
+    finally:
+        cursor.close()
+        conn.close()
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "kind": "delta" if (since or until) else "full",
+        "since": since,
+        "until": until,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "source_backend": get_pool().backend,
+        "rows": rows,
+        "nav_date_range": nav_range,
+    }
+    arrays["manifest"] = np.array(json.dumps(manifest))
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    clock.lap("write")
+    print(f"Snapshot {path}: {manifest['kind']}, {rows['historical_nav']} NAV rows, "
+          f"{rows['mutual_funds']} schemes in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+
+def _history_rows(archive):
+    """Yield lists of (scheme_code, nav_date, nav_value) rows, INSERT_BATCH at a time"""
+    counts = archive["historical_nav/counts"]
+    codes = np.repeat(archive["historical_nav/codes"], counts)
+    dates = np.cumsum(archive["historical_nav/date_deltas"].astype(np.int64)).astype("datetime64[D]")
+    navs = np.cumsum(archive["historical_nav/tick_deltas"]) / NAV_SCALE
+    nulls = np.unpackbits(archive["historical_nav/nulls"], count=len(codes)).astype(bool)
+    for start in range(0, len(codes), INSERT_BATCH):
+        stop = start + INSERT_BATCH
+        chunk_navs = navs[start:stop].tolist()
+        for i in np.flatnonzero(nulls[start:stop]).tolist():
+            chunk_navs[i] = None
+        yield list(zip(codes[start:stop].tolist(), dates[start:stop].astype(object).tolist(), chunk_navs))
+
+
+def _table_rows(archive, table):
+    """Decoded rows of `table`, or None if the snapshot predates it"""
+    if f"{table}/{TABLES[table][0][0]}" not in archive.files:
+        return None
+    columns = [decode_column(archive, f"{table}/{col}", kind) for col, kind in TABLES[table]]
+    return list(zip(*columns))
+
+
+def _stale_metric_state(cursor, archive):
+    """Schemes whose imported NAVs are not newer than their incremental metrics state"""
+    from metrics_state import create_state_table
+    create_state_table(cursor)
+    cursor.execute("SELECT scheme_code, last_row_date FROM scheme_metric_state")
+    state = {code: last for code, last in cursor.fetchall() if last is not None}
+    if not state:
+        return []
+    codes = archive["historical_nav/codes"]
+    counts = archive["historical_nav/counts"]
+    dates = np.cumsum(archive["historical_nav/date_deltas"].astype(np.int64)).astype("datetime64[D]")
+    first_dates = dates[np.cumsum(counts) - counts] if len(codes) else dates[:0]
+    return [code for code, first in zip(codes.tolist(), first_dates.astype(object).tolist())
+            if code in state and first <= state[code]]
+
+
+def import_snapshot(path, timings=None):
+    """Load one snapshot file into the database; returns its manifest"""
+    clock = StageTimer(timings)
+    started = time.perf_counter()
+    with np.load(path) as archive:
+        manifest = json.loads(str(archive["manifest"]))
+        if manifest.get("format") not in SUPPORTED_FORMATS:
+            raise ValueError(f"{path}: unsupported snapshot format {manifest.get('format')}")
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            stale = _stale_metric_state(cursor, archive)
+            create_benchmark_tables(cursor)
+            # Benchmarks first: the assignment the next metrics run uses depends on them
+            for table, keys in (("nifty50_data", ("date",)), ("index_prices", ("index_name", "date"))):
+                columns = [col for col, _ in TABLES[table]]
+                prices = _table_rows(archive, table) or []
+                for start in range(0, len(prices), INSERT_BATCH):
+                    cursor.executemany(_upsert_sql(table, columns, keys), prices[start:start + INSERT_BATCH])
+            overrides = _table_rows(archive, "benchmark_overrides")
+            if overrides is not None:
+                cursor.execute("DELETE FROM benchmark_overrides")
+                if overrides:
+                    cursor.executemany(
+                        "INSERT INTO benchmark_overrides (scheme_code, index_name) VALUES (%s, %s)", overrides)
+            conn.commit()
+            clock.lap("import_benchmarks")
+
+            for batch in _history_rows(archive):
+                cursor.executemany(UPSERT_HISTORY_SQL, batch)
+                conn.commit()
+            clock.lap("import_history")
+
+            funds = _table_rows(archive, "mutual_funds")
+            if funds:
+                columns = [col for col, _ in TABLES["mutual_funds"]]
+                create_staging_table(cursor, "mutual_funds", STAGING_TABLE)
+                cursor.executemany(
+                    f"INSERT INTO {STAGING_TABLE} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                    funds)
+                conn.commit()
+                swap_tables(cursor, "mutual_funds", STAGING_TABLE)
+                conn.commit()
+
+            metrics_columns = [col for col, _ in TABLES["scheme_metrics"]]
+            metrics = _table_rows(archive, "scheme_metrics")
+            for start in range(0, len(metrics), INSERT_BATCH):
+                cursor.executemany(_upsert_sql("scheme_metrics", metrics_columns, ("scheme_code",)),
+                                   metrics[start:start + INSERT_BATCH])
+            conn.commit()
+            clock.lap("import_tables")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    if stale:
+        from metrics_state import invalidate_metric_state
+        invalidate_metric_state(stale)
+    print(f"Imported {path}: {manifest['kind']}, {manifest['rows']['historical_nav']} NAV rows, "
+          f"{manifest['rows']['mutual_funds']} schemes in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+
+def import_snapshots(paths, timings=None):
+    """Apply snapshots in order, then rebuild the derived tables and notify caches"""
+    manifests = [import_snapshot(path, timings) for path in paths]
+    clock = StageTimer(timings)
+    scheme_summary.refresh()
+    nav_store.rebuild()
+    clock.lap("derived")
+    publish(DATA_UPDATED)
+    return manifests
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import a compact dataset snapshot")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write a snapshot file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--since", help="YYYY-MM-DD: only NAV/index rows from this date (delta)")
+    export_parser.add_argument("--until", help="YYYY-MM-DD: only NAV/index rows up to this date (delta)")
+    import_parser = commands.add_parser("import", help="load snapshot files in order")
+    import_parser.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_snapshot(args.path, args.since, args.until)
+    else:
+        # Recorded in job_runs so web processes notice the new data and refresh their caches;
+        # under the pipeline lock so an import never interleaves with the worker's ingest
+        from jobs import exclusive_run
+        with exclusive_run("snapshot_import") as run:
+            timings = {}
+            try:
+                import_snapshots(args.paths, timings)
+                run.record_stages(timings)
+                run.finish("success")
+            except Exception:
+                run.record_stages(timings)
+                run.finish("failed", error=traceback.format_exc())
+                raise
@@ -33,6 +33,50 @@ function initializeAMCPage() {
     }
 }
 
+// Scheme typeahead
+function initializeSchemeSearch() {
+    const input = document.getElementById('scheme-search');
+    const results = document.getElementById('search-results');
+    if (!input || !results) return;
+    
+    let timer = null;
+    let latest = 0;
+    
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const query = this.value.trim();
+        if (!query) {
+            results.innerHTML = '';
+            return;
+        }
+        
+        timer = setTimeout(async () => {
+            const requestId = ++latest;
+            try {
+                const response = await fetch(`/search?q=${encodeURIComponent(query)}&limit=8`);
+                if (!response.ok) throw new Error('Network response was not ok');
+                
+                const data = await response.json();
+                if (requestId !== latest) return;  // a newer query is in flight
+                
+                results.innerHTML = '';
+                data.results.forEach(match => {
+                    const item = document.createElement('li');
+                    item.innerHTML = `<strong></strong><span></span>`;
+                    item.querySelector('strong').textContent = match.scheme_name;
+                    item.querySelector('span').textContent = `${match.amc_name} · ${match.scheme_code}`;
+                    item.addEventListener('click', () => {
+                        window.location.href = `/scheme-details/${encodeURIComponent(match.scheme_name)}`;
+                    });
+                    results.appendChild(item);
+                });
+            } catch (error) {
+                console.error('Error searching schemes:', error);
+            }
+        }, 150);
+    });
+}
+
 async function loadAMCs() {
     const loader = document.getElementById('amc-loader');
     const amcSelect = document.getElementById('amc-select');
@@ -120,12 +164,111 @@ function initializeSchemeDetails() {
     const schemeCode = document.getElementById('scheme-details')?.dataset.schemeCode;
     if (schemeCode) {
         fetchHistoricalNAV(schemeCode);
+        fetchHorizonMetrics(schemeCode);
+        initializeRangeSelector(schemeCode);
+    }
+}
+
+function initializeRangeSelector(schemeCode) {
+    const selector = document.getElementById('range-selector');
+    if (!selector) return;
+    
+    selector.addEventListener('click', (event) => {
+        const button = event.target.closest('.range-btn');
+        if (!button) return;
+        
+        selector.querySelectorAll('.range-btn').forEach(btn => btn.classList.remove('active'));
+        button.classList.add('active');
+        fetchHistoricalNAV(schemeCode, button.dataset.range);
+    });
+}
+
+async function fetchHorizonMetrics(schemeCode) {
+    const tableBody = document.getElementById('horizon-table-body');
+    if (!tableBody) return;
+    
+    try {
+        const response = await fetch(`/get_metrics/${schemeCode}`);
+        if (!response.ok) throw new Error('Network response was not ok');
+        
+        const data = await response.json();
+        if (data.error) throw new Error(data.error);
+        
+        renderHorizonTable(data.horizons);
+        renderRollingChart(data.rolling);
+    } catch (error) {
+        console.error('Error fetching horizon metrics:', error);
+        tableBody.innerHTML = '<tr><td colspan="6">Trailing metrics unavailable</td></tr>';
     }
 }
 
-async function fetchHistoricalNAV(schemeCode) {
+function renderHorizonTable(horizons) {
+    const tableBody = document.getElementById('horizon-table-body');
+    const order = ['1Y', '3Y', '5Y', 'ALL'];
+    const format = (value) => (value === null || value === undefined) ? 'N/A' : value.toFixed(2);
+    const rows = order.filter(horizon => horizons[horizon]);
+    
+    if (rows.length === 0) {
+        tableBody.innerHTML = '<tr><td colspan="6">No trailing metrics for this scheme</td></tr>';
+        return;
+    }
+    
+    tableBody.innerHTML = rows.map(horizon => {
+        const m = horizons[horizon];
+        return `
+            <tr>
+                <td>${horizon === 'ALL' ? 'Since inception' : horizon}</td>
+                <td>${format(m.alpha)}</td>
+                <td>${format(m.beta)}</td>
+                <td>${format(m.sharpe_ratio)}</td>
+                <td>${format(m.sortino_ratio)}</td>
+                <td>${format(m.std_dev)}</td>
+            </tr>
+        `;
+    }).join('');
+}
+
+function renderRollingChart(rolling) {
+    const canvas = document.getElementById('rollingChart');
+    if (!canvas || rolling.dates.length === 0) return;
+    
+    new Chart(canvas.getContext('2d'), {
+        type: 'line',
+        data: {
+            labels: rolling.dates,
+            datasets: [
+                {
+                    label: 'Rolling Beta',
+                    data: rolling.beta,
+                    borderColor: '#4361ee',
+                    borderWidth: 1.5,
+                    pointRadius: 0,
+                    yAxisID: 'y'
+                },
+                {
+                    label: 'Rolling Sharpe',
+                    data: rolling.sharpe,
+                    borderColor: '#f8961e',
+                    borderWidth: 1.5,
+                    pointRadius: 0,
+                    yAxisID: 'y1'
+                }
+            ]
+        },
+        options: {
+            responsive: true,
+            plugins: { legend: { position: 'top' } },
+            scales: {
+                y: { position: 'left', title: { display: true, text: 'Beta' } },
+                y1: { position: 'right', title: { display: true, text: 'Sharpe' }, grid: { drawOnChartArea: false } }
+            }
+        }
+    });
+}
+
+async function fetchHistoricalNAV(schemeCode, range = '1M') {
     try {
-        const response = await fetch(`/get_historical_nav/${schemeCode}`);
+        const response = await fetch(`/get_historical_nav/${schemeCode}?range=${encodeURIComponent(range)}`);
         if (!response.ok) throw new Error('Network response was not ok');
         
         const data = await response.json();
@@ -135,10 +278,13 @@ async function fetchHistoricalNAV(schemeCode) {
         
         // Reverse to show chronological order
         const schemeData = data.scheme.reverse();
-        const niftyData = data.nifty50.reverse();
+        // The scheme's mapped benchmark (older responses only carry Nifty 50)
+        const benchmark = data.benchmark || { index: 'NIFTY 50', series: data.nifty50 };
+        const benchmarkData = benchmark.series.slice().reverse();
+        document.querySelectorAll('.benchmark-name').forEach(el => { el.textContent = benchmark.index; });
         
-        renderComparisonChart(schemeData, niftyData);
-        calculatePerformance(schemeData, niftyData);
+        renderComparisonChart(schemeData, benchmarkData, benchmark.index);
+        calculatePerformance(schemeData, benchmarkData);
     } catch (error) {
         console.error('Error:', error);
         document.getElementById('navChart').innerHTML = `
@@ -193,7 +339,7 @@ function renderNAVChart(history) {
     });
 }
 
-function renderComparisonChart(schemeData, niftyData) {
+function renderComparisonChart(schemeData, niftyData, benchmarkName = 'Nifty 50') {
     const ctx = document.getElementById('navChart').getContext('2d');
     
     // Destroy previous chart if exists
@@ -203,7 +349,8 @@ function renderComparisonChart(schemeData, niftyData) {
     
     // Normalize both datasets to percentage change from first point
     const schemeBase = schemeData[0].nav;
-    const niftyBase = niftyData[0].close;
+    // Benchmark closes can be null before the index series starts
+    const niftyBase = (niftyData.find(item => item.close !== null) || {}).close;
     
     currentChart = new Chart(ctx, {
         type: 'line',
@@ -220,8 +367,8 @@ function renderComparisonChart(schemeData, niftyData) {
                     fill: true
                 },
                 {
-                    label: 'Nifty 50 Performance (%)',
-                    data: niftyData.map(item => ((item.close - niftyBase) / niftyBase * 100)),
+                    label: `${benchmarkName} Performance (%)`,
+                    data: niftyData.map(item => (item.close === null ? null : (item.close - niftyBase) / niftyBase * 100)),
                     borderColor: '#4CAF50',
                     backgroundColor: 'rgba(76, 175, 80, 0.1)',
                     borderWidth: 2,
@@ -267,6 +414,7 @@ function renderComparisonChart(schemeData, niftyData) {
 
 // Calculate performance metrics
 function calculatePerformance(schemeData, niftyData) {
+    niftyData = niftyData.filter(item => item.close !== null);
     if (schemeData.length < 2 || niftyData.length < 2) return;
     
     const schemeStart = schemeData[0].nav;
@@ -305,6 +453,7 @@ document.addEventListener("DOMContentLoaded", function() {
     // Initialize page based on which container exists
     if (document.getElementById('amc-select')) {
         initializeAMCPage();
+        initializeSchemeSearch();
     } else if (document.getElementById('schemes-container')) {
         initializeSchemesPage();
     } else if (document.getElementById('scheme-details')) {
@@ -0,0 +1,152 @@
+"""AmfiParser behaviour and parse timings on the bundled AMFI snapshot.
+
+    python -m pytest tests/test_parse.py                          # assertions + timings
+    python -m pytest tests/test_parse.py --benchmark-skip         # assertions only
+    python -m pytest tests/test_parse.py --benchmark-only         # timings only
+
+The timings use pytest-benchmark's `benchmark` fixture on the ~13.8k-scheme
+AMFI_NAV_data_txt.csv snapshot rendered as NAVAll.txt, against the previous
+regex/dict/strptime parser (benchmarks/bench_parse.py) for comparison.
+"""
+import csv
+from datetime import datetime
+
+import pytest
+
+from benchmarks.amfi_sample import AMFI_CSV, navall_lines
+from benchmarks.bench_parse import legacy_parse
+from data_quality import NON_POSITIVE, PARSE_ERROR
+from data_updater import AmfiParser, parse_amfi_data
+
+HEADER = "Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;Net Asset Value;Date"
+
+
+def parse(text):
+    amfi = AmfiParser()
+    return amfi, list(amfi.parse(text))
+
+
+@pytest.fixture(scope="module")
+def snapshot_lines():
+    return navall_lines()
+
+
+@pytest.fixture(scope="module")
+def snapshot_rows():
+    with open(AMFI_CSV, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_bare_amc_lines_between_category_lines():
+    amfi, records = parse("\n".join([
+        HEADER,
+        "",
+        "Open Ended Schemes(Debt Scheme - Banking and PSU Fund)",
+        "",
+        "Aditya Birla Sun Life Mutual Fund",
+        "",
+        "119551;INF209KA12Z1;INF209KA13Z9;ABSL Banking & PSU Debt Fund - DIRECT - IDCW;103.523;25-Mar-2025",
+        "",
+        "Close Ended Schemes(Income)",
+        "",
+        "Axis Mutual Fund",
+        "",
+        "120438;INF846K01EW2;;Axis Banking & PSU Debt Fund - Direct Growth;2551.1234;25-Mar-2025",
+    ]))
+    assert [r.amc_name for r in records] == ["Aditya Birla Sun Life Mutual Fund", "Axis Mutual Fund"]
+    assert amfi.rows == 2 and amfi.rejected == 0
+
+
+def test_mutual_fund_name_headers():
+    _, records = parse("\n".join([
+        "Mutual Fund Name: Axis Mutual Fund",
+        "120438;INF846K01EW2;;Axis Banking & PSU Debt Fund - Direct Growth;2551.1234;25-Mar-2025",
+    ]))
+    assert [r.amc_name for r in records] == ["Axis Mutual Fund"]
+
+
+def test_rows_before_the_first_amc_and_the_column_header_are_skipped():
+    amfi, records = parse("\n".join([
+        "120438;INF846K01EW2;;Orphan row;10.0;25-Mar-2025",
+        HEADER,
+    ]))
+    assert records == [] and amfi.rows == 0
+
+
+def test_isin_and_name_columns():
+    _, (record,) = parse("\n".join([
+        "Axis Mutual Fund",
+        "120438;INF846K01EW2;INF846K01EX0;Axis Banking & PSU Debt Fund - Direct Growth;2551.1234;25-Mar-2025",
+    ]))
+    assert record.scheme_code == "120438"
+    assert record.isin_growth == "INF846K01EW2"
+    assert record.isin_div_reinvestment == "INF846K01EX0"
+    assert record.scheme_name == "Axis Banking & PSU Debt Fund - Direct Growth"
+    assert record.net_asset_value == 2551.1234
+    assert record.nav_date == datetime(2025, 3, 25)
+
+
+def test_blank_isins_are_none():
+    _, (record,) = parse("Axis Mutual Fund\n120438;;;Axis Overnight Fund;1200.5;25-Mar-2025")
+    assert record.isin_growth is None and record.isin_div_reinvestment is None
+
+
+@pytest.mark.parametrize("nav, reason", [
+    ("N.A.", PARSE_ERROR),
+    ("-", PARSE_ERROR),
+    ("", PARSE_ERROR),
+    ("nan", PARSE_ERROR),
+    ("-12.5", NON_POSITIVE),
+])
+def test_malformed_navs_are_rejected_without_raising(nav, reason):
+    amfi, records = parse(f"Axis Mutual Fund\n120438;INF846K01EW2;;Axis Liquid Fund;{nav};25-Mar-2025")
+    assert records == []
+    assert amfi.rows == 1 and amfi.rejected == 1
+    record, raw, rejected_reason = amfi.rejects[0]
+    assert rejected_reason == reason
+    assert raw == f"{nav};25-Mar-2025"
+    assert record.scheme_code == "120438"
+
+
+def test_unparseable_date_is_rejected():
+    amfi, records = parse("Axis Mutual Fund\n120438;INF846K01EW2;;Axis Liquid Fund;10.5;2025-03-25")
+    assert records == []
+    assert amfi.rejects[0][2] == PARSE_ERROR
+
+
+def test_zero_nav_is_passed_on_to_validation():
+    _, (record,) = parse("Axis Mutual Fund\n120438;INF846K01EW2;;Segregated Portfolio 1;0;25-Mar-2025")
+    assert record.net_asset_value == 0.0
+
+
+def test_parsed_dates_are_shared():
+    _, records = parse("Axis Mutual Fund\n1;;;A;1.0;25-Mar-2025\n2;;;B;2.0;25-Mar-2025")
+    assert records[0].nav_date is records[1].nav_date
+
+
+def test_parse_amfi_data_streams_an_iterator():
+    lines = iter(["Axis Mutual Fund", "1;;;A;1.0;25-Mar-2025"])
+    assert [r.scheme_code for r in parse_amfi_data(lines)] == ["1"]
+
+
+def test_snapshot_counts(snapshot_lines, snapshot_rows):
+    amfi, records = parse(snapshot_lines)
+    with_nav = sum(1 for row in snapshot_rows if row["Net Asset Value"])
+    assert len(records) == with_nav
+    assert amfi.rejected == len(snapshot_rows) - with_nav
+    assert {r.amc_name for r in records} <= {row["AMC Name"] for row in snapshot_rows}
+
+
+def test_snapshot_parse(benchmark, snapshot_lines):
+    benchmark.group = "parse NAVAll.txt"
+    records = benchmark(lambda: list(AmfiParser().parse(iter(snapshot_lines))))
+    assert records
+
+
+def test_snapshot_parse_legacy(benchmark, snapshot_lines):
+    benchmark.group = "parse NAVAll.txt"
+    # The legacy parser only understood "Mutual Fund Name:" headers
+    lines = [line if ';' in line or not line or line.startswith('Open Ended')
+             else f"Mutual Fund Name: {line}" for line in snapshot_lines]
+    records = benchmark(lambda: list(legacy_parse(lines)))
+    assert records
@@ -0,0 +1,81 @@
+"""Background worker: runs the daily AMFI ingest + metrics pipeline.
+
+Run exactly as many of these as you like (one is enough); the pipeline lock
+in jobs.py makes sure only one of them does the work at 06:00. Web processes
+no longer schedule anything - they read run status from job_runs
+(/admin/jobs) and refresh their caches when a new run succeeds.
+
+    python worker.py            # stay up and run daily at 06:00
+    python worker.py --once     # run the pipeline now and exit
+"""
+import argparse
+import traceback
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from calculate_metrics import calculate_and_store_metrics
+from horizon_metrics import calculate_and_store_horizon_metrics
+from data_quality import ensure_quarantine_table
+from data_updater import update_database
+from jobs import JobRun, ensure_jobs_table, pipeline_lock
+
+JOB_NAME = "daily_update"
+
+
+def run_pipeline():
+    """Run the pipeline under the lock; returns the job_runs id, or None if another instance holds the lock"""
+    with pipeline_lock() as acquired:
+        if not acquired:
+            print("Pipeline already running in another worker - skipping")
+            return None
+
+        run = JobRun(JOB_NAME)
+        try:
+            timings = {}
+            ok = update_database(timings)
+            run.record_stages(timings)
+            if not ok:
+                run.finish("failed", error="update_database failed (see worker log)")
+                return run.id
+
+            timings = {}
+            with run.stage("metrics"):
+                try:
+                    calculate_and_store_metrics(mode="incremental", timings=timings)
+                finally:
+                    run.record_stages(timings, prefix="metrics_")
+            with run.stage("horizon_metrics"):
+                calculate_and_store_horizon_metrics()
+            run.finish("success")
+        except Exception:
+            run.finish("failed", error=traceback.format_exc())
+            raise
+        return run.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mutual Fund Explorer background worker")
+    parser.add_argument("--once", action="store_true", help="run the pipeline immediately and exit")
+    parser.add_argument("--hour", type=int, default=6)
+    parser.add_argument("--minute", type=int, default=0)
+    args = parser.parse_args()
+
+    # job_runs and nav_quarantine are created here (and by migrate_indexes.py) so web processes only ever read them
+    ensure_jobs_table()
+    ensure_quarantine_table()
+    if args.once:
+        run_pipeline()
+        return
+
+    scheduler = BlockingScheduler()
+    scheduler.add_job(func=run_pipeline, trigger='cron', hour=args.hour, minute=args.minute,
+                      id=JOB_NAME, max_instances=1, coalesce=True)
+    print(f"Worker started; pipeline runs daily at {args.hour:02d}:{args.minute:02d}")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+
+
+if __name__ == "__main__":
+    main()